@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark of cached calendar coders on full_events.json fixture.
+
+Usage:
+    uv run benchmark_cache_coder.py [weeks]
+
+Prints payload size, encode and decode time for fastapi_cache JsonCoder
+and CompactCoder with different compression levels, then CPU time of one
+/bulk/events cache hit. Settings are read from environment as usual,
+so the same variables as for tests are required.
+"""
+import asyncio
+import logging
+import sys
+import timeit
+from unittest.mock import patch
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from fastapi_cache.coder import Coder, JsonCoder
+from starlette.responses import JSONResponse
+
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.api.bulk.integration import decode_calendar
+from yet_another_calendar.web.api.bulk.schema import CalendarResponse
+from yet_another_calendar.web.api.modeus.schema import ModeusCalendar
+from yet_another_calendar.web.cache_coder import CompactCoder
+
+logging.basicConfig(level=logging.INFO, format="%(message)s")
+logger = logging.getLogger(__name__)
+
+ROUNDS = 50
+
+
+def build_calendar(weeks: int) -> CalendarResponse:
+    """Calendar with Modeus events of fixture repeated for every week."""
+    fixture = settings.test_parent_path / "fixtures" / "full_events.json"
+    events = ModeusCalendar.model_validate_json(fixture.read_text()).serialize_modeus_response(skip_lxp=False)
+    return CalendarResponse.model_validate({
+        "netology": {"homework": [], "webinars": []},
+        "utmn": {"modeus_events": events * weeks, "lms_events": []},
+    })
+
+
+def measure(name: str, coder: type[Coder], calendar: CalendarResponse) -> None:
+    encoded = coder.encode(calendar)
+    encode_time = timeit.timeit(lambda: coder.encode(calendar), number=ROUNDS) / ROUNDS
+    decode_time = timeit.timeit(
+        lambda: CalendarResponse.model_validate(coder.decode(encoded)), number=ROUNDS,
+    ) / ROUNDS
+    logger.info(f"{name:<12} {len(encoded):>10} B {encode_time * 1000:>10.3f} ms {decode_time * 1000:>10.3f} ms")
+
+
+def measure_hit(calendar: CalendarResponse) -> None:
+    """Validating decoded dict and FastAPI serialization against trusted path of bulk views."""
+    encoded = CompactCoder.encode(calendar)
+    field = create_model_field(name="Response_get_calendar", type_=CalendarResponse, mode="serialization")
+    loop = asyncio.new_event_loop()
+
+    def validated_hit() -> bytes:
+        hit = CalendarResponse.model_validate(CompactCoder.decode(encoded)).change_timezone("Europe/Moscow")
+        content = loop.run_until_complete(serialize_response(field=field, response_content=hit, is_coroutine=True))
+        return JSONResponse(content).body
+
+    def trusted_hit() -> bytes:
+        return decode_calendar(encoded).change_timezone("Europe/Moscow").model_dump_json(by_alias=True).encode()
+
+    for name, hit in (("validated", validated_hit), ("trusted", trusted_hit)):
+        hit_time = timeit.timeit(hit, number=ROUNDS) / ROUNDS
+        logger.info(f"{name:<12} {hit_time * 1000:>10.3f} ms per hit")
+    loop.close()
+
+
+def main(weeks: int = 1) -> None:
+    calendar = build_calendar(weeks)
+    logger.info(f"{len(calendar.utmn.modeus_events)} Modeus events")
+    logger.info(f"{'coder':<12} {'size':>12} {'encode':>13} {'decode':>13}")
+    measure("json", JsonCoder, calendar)
+    for level in (1, 6, 9):
+        with patch.object(settings, "cache_compression_level", level):
+            measure(f"compact-{level}", CompactCoder, calendar)
+    measure_hit(calendar)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1)
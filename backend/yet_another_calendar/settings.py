@@ -1,5 +1,6 @@
 import enum
 from pathlib import Path
+from typing import Literal
 from tempfile import gettempdir
 
 from environs import Env
@@ -49,14 +50,129 @@ class Settings(BaseSettings):
     redis_cookie_key: str = "MODEUS_JWT"
     redis_jwt_time_live: int = 60 * 60 * 12  # 12 hours
     redis_events_time_live: int = 60 * 60 * 24 * 14  # 2 weeks
+    # Cached calendar is still returned after its refresh_at, but sources due by refresh intervals
+    # are refreshed in background, calendars saved without refresh_at are refreshed after soft time live
+    redis_events_soft_time_live: int = 60 * 15  # 15 minutes
+    # Adaptive refresh interval per source, user and course: starts from refresh_intervals,
+    # halves when refresh finds changes and grows by refresh_interval_growth when it doesn't
+    refresh_stats_prefix: str = "refresh_stats"
+    refresh_intervals: dict[str, int] = {
+        "netology": 60 * 60,  # 1 hour
+        "lms": 60 * 60 * 3,  # 3 hours
+        "modeus": 60 * 60 * 12,  # 12 hours
+    }
+    refresh_min_interval: int = 60 * 15  # 15 minutes
+    refresh_max_interval: int = 60 * 60 * 24 * 2  # 2 days
+    refresh_interval_growth: float = 1.5
+    redis_revalidate_prefix: str = "revalidate"
+    redis_revalidate_lock_time_live: int = 60
     redis_week_live: int = 60 * 60 * 24 * 7  # 1 weeks
     redis_utmn_teachers_time_live: int = 60 * 60 * 24 * 30  # 30 days
+    # Per-entity caches of upstream responses
+    cache_layers_prefix: str = "layer"
+    redis_netology_program_time_live: int = 60 * 30  # 30 minutes
+    redis_lms_course_time_live: int = 60 * 30  # 30 minutes
+    redis_modeus_events_time_live: int = 60 * 30  # 30 minutes
     redis_prefix: str = 'FastAPI-redis'
+    redis_donor_prefix: str = "donor"
+    redis_utmn_teachers_prefix: str = "utmn_teachers"
+    # In-process L1 cache in front of Redis: max bytes per namespace
+    l1_cache_max_bytes: dict[str, int] = {
+        "calendar": 64 * 1024 * 1024,
+        "donor": 64 * 1024,
+        "utmn_teachers": 8 * 1024 * 1024,
+    }
+    l1_cache_time_live: int = 30
+    # Calendars serialized per (cached entry, timezone), entries are immutable so time live only bounds memory
+    projection_cache_max_bytes: int = 32 * 1024 * 1024
+    projection_cache_time_live: int = 60 * 10  # 10 minutes
+    # Time live of L1 entries while invalidation bus is disconnected
+    l1_cache_degraded_time_live: int = 2
+    redis_invalidation_channel: str = "invalidate"
+    invalidation_reconnect_delay: float = 1
+    invalidation_reconnect_max_delay: float = 30
+    # Coder of cached calendars: "compact" (zlib compressed) or "json" (fastapi_cache default)
+    calendar_cache_coder: Literal["json", "compact"] = "compact"
+    cache_compression_level: int = 6
+    # Bump to drop all cached entries, keys also change with schema of cached model
+    cache_schema_version: int = 1
+    redis_key_index_prefix: str = "keys"
     redis_lesson_prefix: str = "calendar"
-    redis_week_metrix_prefix: str = "metrix"
+    redis_digests_prefix: str = "digests"
+    # ICS subscription feeds: token lives while calendar app polls it, rendered feed is kept for render time live
+    redis_subscription_prefix: str = "subscription"
+    subscription_time_live: int = 60 * 60 * 24 * 90  # 90 days
+    subscription_render_time_live: int = 60 * 15  # 15 minutes
+    subscription_weeks_before: int = 1
+    subscription_weeks_after: int = 4
+    # Fire-and-forget writes are flushed as one pipeline by interval (seconds) or size
+    write_buffer_flush_interval: float = 0.2
+    write_buffer_flush_size: int = 500
+    write_buffer_max_size: int = 50000
+    # Daily HyperLogLogs of active users, kept for the longest window of user metrix
+    redis_metrix_prefix: str = "metrix"
+    redis_metrix_time_live: int = 60 * 60 * 24 * 31  # 31 days
 
+    # Retries: exponential backoff with full jitter, capped by retry_delay
     retry_tries: int = 5
-    retry_delay: int = 3
+    retry_delay: float = 3
+    retry_base_delay: float = 0.5
+    retry_max_elapsed: float = 10
+    # Retries can add at most this share on top of normal traffic
+    retry_budget_ratio: float = 0.2
+    retry_budget_max_tokens: float = 10
+
+    # Shared HTTP client pools, one per upstream
+    http_default_timeout: float = 15
+    http_keepalive_expiry: float = 30
+    http_max_keepalive_connections: int = 20
+    modeus_max_connections: int = 50
+    netology_max_connections: int = 50
+    lms_max_connections: int = 50
+    utmn_max_connections: int = 20
+
+    # Bulkheads: max in-flight and max waiting requests per upstream
+    modeus_max_in_flight: int = 20
+    modeus_max_queue: int = 200
+    netology_max_in_flight: int = 20
+    netology_max_queue: int = 200
+    lms_max_in_flight: int = 20
+    lms_max_queue: int = 500
+    utmn_max_in_flight: int = 10
+    utmn_max_queue: int = 100
+    # Background prefetch of current and next weeks for recently active users
+    prefetch_enabled: bool = True
+    prefetch_prefix: str = "prefetch"
+    prefetch_timezone: str = "Europe/Moscow"
+    prefetch_hours: list[int] = [3, 4, 5]  # off-peak hours in prefetch_timezone
+    prefetch_weeks: int = 2
+    prefetch_check_interval: int = 60 * 5
+    # At most one prefetch call per upstream per interval, and only while upstream has few interactive requests
+    prefetch_upstream_interval: float = 1
+    prefetch_max_in_flight: int = 2
+    prefetch_queue_size: int = 10000
+
+    # Circuit breakers: open when failure rate in window is reached
+    circuit_breaker_prefix: str = "circuit"
+    circuit_breaker_failure_rate: float = 0.5
+    circuit_breaker_min_calls: int = 10
+    circuit_breaker_window: int = 60
+    circuit_breaker_open_time: float = 30
+    circuit_breaker_probe_timeout: int = 30
+
+    # Coalescing of identical in-flight calls between workers
+    single_flight_prefix: str = "singleflight"
+    single_flight_lock_timeout: int = 60
+    single_flight_result_ttl: int = 10
+    single_flight_poll_interval: float = 0.2
+
+    # Bulk calendar: late or failed source is replaced by its cached or empty section
+    bulk_netology_deadline: float = 10
+    bulk_modeus_deadline: float = 10
+    bulk_lms_deadline: float = 10
+    # Range of weeks: max weeks per request and weeks fetched at the same time
+    bulk_range_max_weeks: int = 26
+    bulk_range_concurrency: int = 4
 
     netology_default_course_id: int = env.int("NETOLOGY_DEFAULT_COURSE_ID", 45526)
     netology_course_name: str = env.str(
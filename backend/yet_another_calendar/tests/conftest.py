@@ -14,6 +14,7 @@ from httpx import AsyncClient
 from redis.asyncio import ConnectionPool
 
 from yet_another_calendar.web.application import get_app
+from yet_another_calendar.web.http_clients import Upstream, http_clients
 from yet_another_calendar.web.lifespan import get_redis_pool
 from yet_another_calendar.settings import settings
 from yet_another_calendar.tests import handlers
@@ -102,7 +103,10 @@ async def modeus_client():
         base_url="https://utmn.modeus.org",
         transport=handlers.transport,
     ) as client:
-        with patch("yet_another_calendar.web.api.modeus.integration.AsyncClient.__aenter__", return_value=client):
+        with (
+            patch("yet_another_calendar.web.api.modeus.integration.AsyncClient.__aenter__", return_value=client),
+            patch.dict(http_clients.clients, {Upstream.MODEUS: client, Upstream.UTMN: client}),
+        ):
             yield client
 
 
@@ -114,7 +118,10 @@ async def modeus_bad_client():
         base_url="https://utmn.modeus.org",
         transport=handlers.bad_request_transport,
     ) as client:
-        with patch("yet_another_calendar.web.api.modeus.integration.AsyncClient.__aenter__", return_value=client):
+        with (
+            patch("yet_another_calendar.web.api.modeus.integration.AsyncClient.__aenter__", return_value=client),
+            patch.dict(http_clients.clients, {Upstream.MODEUS: client}),
+        ):
             yield client
 
 
@@ -126,7 +133,10 @@ async def netology_client():
         base_url=settings.netology_base_url,
         transport=handlers.transport,
     ) as client:
-        with patch("yet_another_calendar.web.api.netology.integration.AsyncClient.__aenter__", return_value=client):
+        with (
+            patch("yet_another_calendar.web.api.netology.integration.AsyncClient.__aenter__", return_value=client),
+            patch.dict(http_clients.clients, {Upstream.NETOLOGY: client}),
+        ):
             yield client
 
 
@@ -138,7 +148,10 @@ async def netology_bad_client():
         base_url=settings.netology_base_url,
         transport=handlers.bad_request_transport,
     ) as client:
-        with patch("yet_another_calendar.web.api.netology.integration.AsyncClient.__aenter__", return_value=client):
+        with (
+            patch("yet_another_calendar.web.api.netology.integration.AsyncClient.__aenter__", return_value=client),
+            patch.dict(http_clients.clients, {Upstream.NETOLOGY: client}),
+        ):
             yield client
 
 
@@ -150,7 +163,10 @@ async def lms_client():
         base_url=settings.lms_base_url,
         transport=handlers.lms_transport,
     ) as client:
-        with patch("yet_another_calendar.web.api.lms.integration.AsyncClient.__aenter__", return_value=client):
+        with (
+            patch("yet_another_calendar.web.api.lms.integration.AsyncClient.__aenter__", return_value=client),
+            patch.dict(http_clients.clients, {Upstream.LMS: client}),
+        ):
             yield client
 
 
@@ -162,7 +178,10 @@ async def lms_bad_client():
         base_url=settings.lms_base_url,
         transport=handlers.bad_request_transport,
     ) as client:
-        with patch("yet_another_calendar.web.api.lms.integration.AsyncClient.__aenter__", return_value=client):
+        with (
+            patch("yet_another_calendar.web.api.lms.integration.AsyncClient.__aenter__", return_value=client),
+            patch.dict(http_clients.clients, {Upstream.LMS: client}),
+        ):
             yield client
 
 
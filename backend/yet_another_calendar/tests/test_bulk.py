@@ -1,23 +1,37 @@
 """Complete bulk tests combining coverage and integration tests."""
+import asyncio
 import datetime
+import time
 import pytest
 import json
 import typing
+import uuid
+import zoneinfo
 from typing import Any
 from collections.abc import Generator
+from contextlib import ExitStack
 from copy import deepcopy
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
-from fastapi import BackgroundTasks
+from fastapi import BackgroundTasks, HTTPException
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.inmemory import InMemoryBackend
-from starlette.responses import StreamingResponse
-from icalendar.prop import vText
-
-from yet_another_calendar.web.api.bulk import integration, schema, views
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.coder import JsonCoder
+from starlette.responses import Response, StreamingResponse
+import httpx
+import icalendar
+from redis.asyncio import Redis
+
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.api.bulk import ics, integration, schema, views
 from yet_another_calendar.web.api.modeus import schema as modeus_schema
 from yet_another_calendar.web.api.lms import schema as lms_schema
 from yet_another_calendar.web.api.netology import schema as netology_schema
+from yet_another_calendar.web.cache_builder import key_index
+from yet_another_calendar.web.cache_coder import CompactCoder
+from yet_another_calendar.web.cache_layers import CacheLayer
+from yet_another_calendar.web.etag import etag_matches, format_http_date, not_modified_since
 
 
 @pytest.fixture(autouse=True)
@@ -275,221 +289,6 @@ def test_lms_events_timezone_conversion_schema_lines_45_46(bulk_fixture_content)
         assert str(lms_event.dt_end.tzinfo) == "Europe/Berlin"
 
 
-# ========================================
-# Integration Tests - create_ics_event
-# ========================================
-
-def test_create_ics_event_ok(sample_datetime) -> None:
-    """Test create_ics_event with valid data including DTSTAMP check."""
-    start = sample_datetime['start']
-    end = sample_datetime['end']
-    lesson_id = "lesson-001"
-    title = "Math Lecture"
-    description = "Algebra and Linear Equations"
-    url = "https://example.com/classroom"
-
-    event = integration.create_ics_event(title, start, end, lesson_id, description, url)
-
-    assert event['SUMMARY'] == title
-    assert event['LOCATION'] == url
-    assert event['DTSTART'].dt == start
-    assert event['DTEND'].dt == end
-    assert event['UID'] == lesson_id
-    assert event['DESCRIPTION'] == description
-    # dtstamp should be close to now (within 5 seconds)
-    dtstamp = event['DTSTAMP'].dt
-    now_aware = datetime.datetime.now(dtstamp.tzinfo)
-    assert (now_aware - dtstamp).total_seconds() < 5
-
-
-def test_create_ics_event_start_after_end(sample_datetime) -> None:
-    """Test create_ics_event with start time after end time."""
-    start = datetime.datetime(2025, 6, 5, 16, 0)
-    end = sample_datetime['invalid_end']  # ends before start
-    lesson_id = "lesson-002"
-    title = "Invalid Event"
-
-    # If your function does not handle this, you can just test the incorrect data is passed
-    event = integration.create_ics_event(title, start, end, lesson_id)
-
-    # Assert that dtstart is still after dtend (indicating incorrect input)
-    assert event['DTSTART'].dt > event['DTEND'].dt
-
-
-def test_create_ics_event_none_description_url(sample_datetime) -> None:
-    """Test create_ics_event with None description and URL using vText comparison."""
-    start = sample_datetime['start']
-    end = sample_datetime['end']
-    event = integration.create_ics_event("Title", start, end, "lesson-005", description=None, url=None)
-    assert event['DESCRIPTION'] == vText(b'None')
-    assert event['LOCATION'] == vText(b'unknown location')
-
-
-def test_create_ics_event_comprehensive(sample_datetime):
-    """Test create_ics_event with all field combinations using fixtures."""
-    start = sample_datetime['start']
-    end = sample_datetime['end']
-
-    # Test with all fields provided
-    event1 = integration.create_ics_event(
-        title="Complete Event",
-        starts_at=start,
-        ends_at=end,
-        lesson_id="lesson-001",
-        description="Full description",
-        url="https://example.com/lesson"
-    )
-
-    assert str(event1['SUMMARY']) == "Complete Event"
-    assert str(event1['DESCRIPTION']) == "Full description"
-    assert str(event1['LOCATION']) == "https://example.com/lesson"
-    assert event1['DTSTART'].dt == start
-    assert event1['DTEND'].dt == end
-    assert str(event1['UID']) == "lesson-001"
-
-    # Test with None description and url (covers lines 32, 37)
-    event2 = integration.create_ics_event(
-        title="Minimal Event",
-        starts_at=start,
-        ends_at=end,
-        lesson_id="lesson-002",
-        description=None,
-        url=None
-    )
-
-    assert str(event2['DESCRIPTION']) == "None"
-    assert str(event2['LOCATION']) == "unknown location"
-
-    # Test with empty strings
-    event3 = integration.create_ics_event(
-        title="Empty Fields Event",
-        starts_at=start,
-        ends_at=end,
-        lesson_id="lesson-003",
-        description="",
-        url=""
-    )
-
-    assert str(event3['DESCRIPTION']) == ""
-    assert str(event3['LOCATION']) == "unknown location"
-
-
-def test_create_ics_event_edge_cases(sample_datetime):
-    """Test create_ics_event edge cases for complete coverage."""
-    start = sample_datetime['start']
-    end = sample_datetime['end']
-
-    # Test with all possible parameter combinations
-    event = integration.create_ics_event(
-        title="Test Event",
-        starts_at=start,
-        ends_at=end,
-        lesson_id="test-123",
-        description="",  # Empty string description
-        url=""  # Empty string URL - covers line 32 logic
-    )
-
-    # Verify empty URL defaults to unknown location
-    assert str(event['LOCATION']) == "unknown location"
-    assert str(event['DESCRIPTION']) == ""
-    assert str(event['SUMMARY']) == "Test Event"
-    assert str(event['UID']) == "test-123"
-
-
-def test_create_ics_event_bulk_operations(sample_datetime, bulk_fixture_data):
-    """Test bulk ICS event creation using multiple fixtures."""
-    # Create multiple events using sample_datetime fixture
-    start_time = sample_datetime['start']
-    end_time = sample_datetime['end']
-
-    # Bulk event data
-    event_data = [
-        {
-            "title": "Netology: Advanced Python",
-            "starts_at": start_time,
-            "ends_at": end_time,
-            "lesson_id": "netology-001",
-            "description": "Python advanced concepts",
-            "url": "https://netology.ru/lesson1"
-        },
-        {
-            "title": "Modeus: Database Design",
-            "starts_at": start_time + datetime.timedelta(hours=2),
-            "ends_at": end_time + datetime.timedelta(hours=2),
-            "lesson_id": "modeus-002",
-            "description": "Database design principles",
-            "url": "https://modeus.utmn.ru/lesson2"
-        },
-        {
-            "title": "LMS: Software Architecture",
-            "starts_at": start_time + datetime.timedelta(hours=4),
-            "ends_at": end_time + datetime.timedelta(hours=4),
-            "lesson_id": "lms-003",
-            "description": "Software architecture patterns",
-            "url": "https://lms.utmn.ru/lesson3"
-        }
-    ]
-
-    # Create events in bulk
-    events = []
-    for data in event_data:
-        event = integration.create_ics_event(
-            title=data["title"],
-            starts_at=data["starts_at"],
-            ends_at=data["ends_at"],
-            lesson_id=data["lesson_id"],
-            description=data["description"],
-            url=data["url"]
-        )
-        events.append(event)
-
-    # Verify all events were created correctly
-    assert len(events) == 3
-
-    for i, event in enumerate(events):
-        expected = event_data[i]
-        assert str(event['SUMMARY']) == expected["title"]
-        assert event['DTSTART'].dt == expected["starts_at"]
-        assert event['DTEND'].dt == expected["ends_at"]
-        assert str(event['UID']) == expected["lesson_id"]
-        assert str(event['DESCRIPTION']) == expected["description"]
-        assert str(event['LOCATION']) == expected["url"]
-
-
-def test_create_ics_event_with_missing_fields():
-    """Test create_ics_event with various missing/None fields to cover all branches."""
-    # Test with None url and None description (covers lines 48, 56)
-    start = datetime.datetime(2025, 6, 5, 14, 0)
-    end = datetime.datetime(2025, 6, 5, 15, 0)
-
-    # This should hit the conditional branches in create_ics_event
-    event = integration.create_ics_event(
-        title="Test Event",
-        starts_at=start,
-        ends_at=end,
-        lesson_id="test-123",
-        description=None,
-        url=None
-    )
-
-    # Verify the conditional logic worked
-    assert str(event['DESCRIPTION']) == "None"
-    assert str(event['LOCATION']) == "unknown location"
-
-    # Test with empty strings
-    event2 = integration.create_ics_event(
-        title="Test Event 2",
-        starts_at=start,
-        ends_at=end,
-        lesson_id="test-456",
-        description="",
-        url=""
-    )
-
-    assert str(event2['DESCRIPTION']) == ""
-    assert str(event2['LOCATION']) == "unknown location"
-
-
 # ========================================
 # Integration Tests - export_to_ics
 # ========================================
@@ -853,11 +652,11 @@ async def test_export_to_ics(bulk_fixture_content) -> None:
 
     assert isc_calendar
 
-    async for resp in isc_calendar.body_iterator:
-        assert "BEGIN:VCALENDAR" in str(resp)
-        assert "VERSION:2.0" in str(resp)
-        assert "TZID=Europe/Moscow" in str(resp)
-        assert "SUMMARY:Netology: 2" in str(resp)
+    resp = b"".join([chunk async for chunk in isc_calendar.body_iterator])
+    assert "BEGIN:VCALENDAR" in str(resp)
+    assert "VERSION:2.0" in str(resp)
+    assert "TZID=Europe/Moscow" in str(resp)
+    assert "SUMMARY:Netology: 2" in str(resp)
 
 
 # ========================================
@@ -1065,7 +864,7 @@ def test_views_response_type_handling_logic(bulk_fixture_content):
 
 @pytest.mark.asyncio
 async def test_views_get_calendar_cached_response_type(fake_redis_pool, background_tasks: BackgroundTasks):
-    """Test views get_calendar function with different response types (lines 33-40)."""
+    """Test views get_calendar function serializes cached CalendarResponse."""
     # Mock dependencies
     body = modeus_schema.ModeusTimeBody(
         timeMin="2025-01-06T00:00:00Z",
@@ -1077,7 +876,6 @@ async def test_views_get_calendar_cached_response_type(fake_redis_pool, backgrou
         "_netology-on-rails_session": "test_session"
     })
 
-    # Test case 1: get_cached_calendar returns CalendarResponse instance
     calendar_response = schema.CalendarResponse.model_validate({
         "netology": {"homework": [], "webinars": []},
         "utmn": {"modeus_events": [], "lms_events": []}
@@ -1096,28 +894,9 @@ async def test_views_get_calendar_cached_response_type(fake_redis_pool, backgrou
             background_tasks=background_tasks,
         )
 
-        # Should call change_timezone and return CalendarResponse (line 38)
-        assert isinstance(result, schema.CalendarResponse)
-
-    # Test case 2: get_cached_calendar returns dict (cached data)
-    with patch('yet_another_calendar.web.api.bulk.integration.get_cached_calendar') as mock_cached:
-        mock_cached.return_value = {
-            "netology": {"homework": [], "webinars": []},
-            "utmn": {"modeus_events": [], "lms_events": []}
-        }
-
-        result = await views.get_calendar(
-            body=body,
-            lms_user=lms_user,
-            cookies=cookies,
-            donor_token="test_token",
-            modeus_person_id="550e8400-e29b-41d4-a716-446655440000",
-            redis=fake_redis_pool,
-            background_tasks=background_tasks,
-        )
-
-        # Should validate dict and return CalendarResponse (line 40)
-        assert isinstance(result, schema.CalendarResponse)
+        # Should call change_timezone and return serialized CalendarResponse
+        assert result.media_type == "application/json"
+        assert schema.CalendarResponse.model_validate_json(result.body).get_hash() == calendar_response.get_hash()
 
 
 @pytest.mark.asyncio
@@ -1151,9 +930,10 @@ async def test_views_refresh_calendar():
             modeus_person_id="550e8400-e29b-41d4-a716-446655440000"
         )
 
-        # Should return RefreshedCalendarResponse (line 55-57)
-        assert isinstance(result, schema.RefreshedCalendarResponse)
-        assert result.changed is True
+        # Should return serialized RefreshedCalendarResponse (line 55-57)
+        refreshed = schema.RefreshedCalendarResponse.model_validate_json(result.body)
+        assert refreshed.changed is True
+        assert result.headers["ETag"] == mock_refreshed.get_etag(schema.get_timezone("Europe/Moscow"))
 
 
 @pytest.mark.asyncio
@@ -1198,3 +978,894 @@ async def test_views_export_ics():
             # Verify change_timezone was called (line 78)
             # and export_to_ics was called (line 79)
             mock_export.assert_called_once()
+
+
+# ========================================
+# Streaming Tests
+# ========================================
+
+async def _collect_frames(stream: typing.AsyncIterator[bytes]) -> list[dict[str, Any]]:
+    return [json.loads(line) async for line in stream]
+
+
+@pytest.mark.asyncio
+async def test_stream_calendar_sends_sections_and_summary(
+    modeus_client,
+    netology_client,
+    lms_client,
+    fastapi_app,
+):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-01-06T00:00:00Z", timeMax="2025-01-12T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    person_id = "550e8400-e29b-41d4-a716-446655440000"
+    timezone = schema.get_timezone("Asia/Tokyo")
+
+    frames = await _collect_frames(integration.stream_calendar(
+        body, 45526, person_id, lms_user=lms_user, cookies=cookies,
+        modeus_jwt_token="test_token", timezone=timezone,
+    ))
+
+    sections = [frame for frame in frames if frame["type"] == "section"]
+    assert {frame["source"] for frame in sections} == {"netology", "modeus", "lms"}
+    summary = frames[-1]
+    assert summary["type"] == "summary"
+    assert summary["failed"] == []
+    for frame in sections:
+        if frame["source"] == "modeus" and frame["data"]:
+            assert frame["data"][0]["start"].endswith("+09:00")
+
+    cached = await integration.read_cached_calendar(body, 45526, person_id)
+    assert cached is not None
+    assert cached.get_hash() == summary["hash"]
+
+    cached_frames = await _collect_frames(integration.stream_calendar(
+        body, 45526, person_id, lms_user=lms_user, cookies=cookies,
+        modeus_jwt_token="test_token", timezone=timezone,
+    ))
+    assert cached_frames[-1] == summary
+    assert sorted(cached_frames[:-1], key=lambda frame: frame["source"]) == sorted(
+        sections, key=lambda frame: frame["source"],
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_calendar_reports_failed_source(
+    modeus_client,
+    lms_client,
+    fastapi_app,
+):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-01-06T00:00:00Z", timeMax="2025-01-12T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    person_id = "550e8400-e29b-41d4-a716-446655440002"
+
+    netology_error = HTTPException(detail="Netology error. Cookies expired.", status_code=401)
+    with patch("yet_another_calendar.web.api.netology.views.get_calendar", side_effect=netology_error):
+        frames = await _collect_frames(integration.stream_calendar(
+            body, 45526, person_id, lms_user=lms_user, cookies=cookies,
+            modeus_jwt_token="test_token", timezone=schema.get_timezone("UTC"),
+        ))
+
+    errors = [frame for frame in frames if frame["type"] == "error"]
+    assert errors == [{"type": "error", "source": "netology", "detail": "Netology error. Cookies expired."}]
+    assert frames[-1] == {"type": "summary", "cached_at": None, "hash": None, "failed": ["netology"]}
+    assert await integration.read_cached_calendar(body, 45526, person_id) is None
+
+
+@pytest.mark.asyncio
+async def test_views_stream_calendar():
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-01-06T00:00:00Z", timeMax="2025-01-12T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+
+    response = await views.stream_calendar(
+        body=body, lms_user=lms_user, cookies=cookies, donor_token="test_token",
+        modeus_person_id="550e8400-e29b-41d4-a716-446655440000",
+    )
+    assert isinstance(response, StreamingResponse)
+    assert response.media_type == "application/x-ndjson"
+
+    with pytest.raises(Exception) as exc_info:
+        await views.stream_calendar(
+            body=body, lms_user=lms_user, cookies=cookies, donor_token="test_token",
+            modeus_person_id="550e8400-e29b-41d4-a716-446655440000",
+            time_zone="Wrong/Zone",
+        )
+    assert exc_info.value.status_code == 400
+
+
+# ========================================
+# Degradation Tests
+# ========================================
+
+def _patch_sources(netology: Any, modeus: Any, lms: Any) -> ExitStack:
+    stack = ExitStack()
+    for target, value in (
+        ("netology.views.get_calendar", netology),
+        ("modeus.views.get_calendar", modeus),
+        ("lms.views.get_events", lms),
+    ):
+        if isinstance(value, Exception) or callable(value):
+            mock = AsyncMock(side_effect=value)
+        else:
+            mock = AsyncMock(return_value=value)
+        stack.enter_context(patch(f"yet_another_calendar.web.api.{target}", mock))
+    return stack
+
+
+async def _never_returns(*args: Any, **kwargs: Any) -> None:
+    await asyncio.sleep(10)
+
+
+@pytest.mark.asyncio
+async def test_get_calendar_degrades_late_and_failed_sources(bulk_fixture_content):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-02-03T00:00:00Z", timeMax="2025-02-09T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    person_id = "550e8400-e29b-41d4-a716-446655440003"
+    cached = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+    await integration.save_cached_calendar(body, 45526, person_id, cached)
+
+    deadlines = {source: 0.05 for source in schema.CalendarSource}
+    with (
+        patch.dict(integration.SOURCE_DEADLINES, deadlines),
+        _patch_sources(_never_returns, httpx.ConnectError("down"), []),
+    ):
+        calendar = await integration.get_calendar(
+            body, 45526, person_id, lms_user=lms_user, cookies=cookies, modeus_jwt_token="test_token",
+        )
+
+    assert calendar.sources == {
+        schema.CalendarSource.NETOLOGY: schema.SourceStatus.STALE,
+        schema.CalendarSource.MODEUS: schema.SourceStatus.STALE,
+        schema.CalendarSource.LMS: schema.SourceStatus.FRESH,
+    }
+    assert calendar.netology == cached.netology
+    assert calendar.utmn.modeus_events == cached.utmn.modeus_events
+    assert calendar.utmn.lms_events == []
+    assert not calendar.is_complete()
+
+
+@pytest.mark.asyncio
+async def test_get_cached_calendar_does_not_cache_degraded():
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-02-10T00:00:00Z", timeMax="2025-02-16T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    person_id = "550e8400-e29b-41d4-a716-446655440004"
+
+    with _patch_sources(httpx.ReadTimeout("timeout"), [], []):
+        calendar = await integration.get_cached_calendar(
+            body, 45526, person_id, lms_user=lms_user, cookies=cookies, modeus_jwt_token="test_token",
+        )
+
+    assert calendar.sources[schema.CalendarSource.NETOLOGY] == schema.SourceStatus.FAILED
+    assert calendar.netology.homework == []
+    assert await integration.read_cached_calendar(body, 45526, person_id) is None
+
+
+@pytest.mark.asyncio
+async def test_get_calendar_propagates_client_errors():
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-02-10T00:00:00Z", timeMax="2025-02-16T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    expired = HTTPException(detail="Netology error. Cookies expired.", status_code=401)
+
+    with _patch_sources(expired, [], []), pytest.raises(HTTPException) as exc_info:
+        await integration.get_calendar(
+            body, 45526, "550e8400-e29b-41d4-a716-446655440005",
+            lms_user=lms_user, cookies=cookies, modeus_jwt_token="test_token",
+        )
+    assert exc_info.value.status_code == 401
+
+
+# ========================================
+# Range Tests
+# ========================================
+
+def test_split_weeks_matches_single_week_keys():
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-01-06T00:00:00Z", timeMax="2025-01-26T00:00:00Z")
+    single_week = modeus_schema.ModeusTimeBody(timeMin="2025-01-13T00:00:00Z", timeMax="2025-01-19T00:00:00Z")
+
+    weeks = body.split_weeks()
+
+    assert len(weeks) == 3
+    assert weeks[1] == single_week
+    assert integration.get_calendar_cache_key(weeks[1], 45526, "person") == integration.get_calendar_cache_key(
+        single_week, 45526, "person",
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_calendar_range_fetches_only_missing_weeks(bulk_fixture_content):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-03-03T00:00:00Z", timeMax="2025-03-16T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    person_id = "550e8400-e29b-41d4-a716-446655440006"
+    first_week, second_week = body.split_weeks()
+    assert body.count_weeks() == 2
+    cached = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+    await integration.save_cached_calendar(first_week, 45526, person_id, cached)
+    fetched = schema.CalendarResponse.from_sections({})
+
+    with patch.object(integration, "get_calendar", AsyncMock(return_value=fetched)) as mock_get_calendar:
+        calendar = await integration.get_calendar_range(
+            body, 45526, person_id, lms_user=lms_user, cookies=cookies, modeus_jwt_token="test_token",
+        )
+
+    mock_get_calendar.assert_awaited_once()
+    assert mock_get_calendar.await_args.args[0] == second_week
+    assert calendar.utmn.modeus_events == cached.utmn.modeus_events
+    assert calendar.cached_at == min(cached.cached_at, fetched.cached_at)
+    assert await integration.read_cached_calendar(second_week, 45526, person_id) is not None
+
+
+@pytest.mark.asyncio
+async def test_get_calendar_range_too_long():
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-01-06T00:00:00Z", timeMax="2026-01-04T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+
+    with pytest.raises(HTTPException) as exc_info, \
+            patch.object(modeus_schema.ModeusTimeBody, "split_weeks") as split_weeks:
+        await integration.get_calendar_range(
+            body, 45526, "person", lms_user=lms_user, cookies=cookies, modeus_jwt_token="test_token",
+        )
+    assert exc_info.value.status_code == 400
+    split_weeks.assert_not_called()
+    assert body.count_weeks() == len(body.split_weeks()) == 52
+
+
+def test_calendar_response_merge_keeps_worst_status(bulk_fixture_content):
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+    degraded = schema.CalendarResponse.from_sections({}, {
+        **schema.all_fresh(), schema.CalendarSource.LMS: schema.SourceStatus.FAILED,
+    })
+
+    merged = schema.CalendarResponse.merge([calendar, degraded, calendar])
+
+    assert len(merged.utmn.modeus_events) == 2 * len(calendar.utmn.modeus_events)
+    assert merged.sources[schema.CalendarSource.LMS] == schema.SourceStatus.FAILED
+    assert merged.sources[schema.CalendarSource.NETOLOGY] == schema.SourceStatus.FRESH
+
+
+# ========================================
+# Stale-While-Revalidate Tests
+# ========================================
+
+def test_calendar_response_age_and_stale():
+    fresh = schema.CalendarResponse.from_sections({})
+    old = fresh.model_copy(update={
+        "cached_at": schema.now_dt_utc() - datetime.timedelta(seconds=settings.redis_events_soft_time_live + 60),
+    })
+
+    assert not fresh.is_stale()
+    assert old.is_stale()
+    assert old.model_dump()["age"] >= settings.redis_events_soft_time_live + 60
+    assert old.get_hash() == fresh.get_hash()
+
+
+@pytest.mark.asyncio
+async def test_calendar_is_stale_when_source_is_due(fake_redis_pool, bulk_fixture_content):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-06-23T00:00:00Z", timeMax="2025-06-29T00:00:00Z")
+    person_id = "550e8400-e29b-41d4-a716-446655440022"
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+    calendar.cached_at = schema.now_dt_utc()
+    await integration.save_cached_calendar(body, 45526, person_id, calendar)
+    first_due = calendar.cached_at + datetime.timedelta(seconds=min(settings.refresh_intervals.values()))
+    assert calendar.refresh_at == first_due
+
+    after_soft_time_live = calendar.cached_at + datetime.timedelta(seconds=settings.redis_events_soft_time_live + 60)
+    for _ in range(2):  # decoded and taken from L1
+        projection = await integration.read_calendar_projection(body, 45526, person_id, datetime.UTC)
+        assert projection.refresh_at == first_due
+        with patch.object(schema, "now_dt_utc", return_value=after_soft_time_live):
+            assert not projection.is_stale()
+        with patch.object(schema, "now_dt_utc", return_value=first_due):
+            assert projection.is_stale()
+
+    # Refresh of other week found no changes, so intervals grew and nothing is due yet
+    await integration.record_refresh(45526, person_id, dict.fromkeys(schema.CalendarSource, schema.SourceDelta()))
+    with patch.object(schema, "now_dt_utc", return_value=first_due), \
+            patch.object(integration, "get_calendar", AsyncMock()) as get_calendar:
+        await integration.revalidate_calendar(
+            fake_redis_pool, body, 45526, person_id,
+            lms_user=lms_user, cookies=cookies, modeus_jwt_token="test_token",
+        )
+        get_calendar.assert_not_awaited()
+        projection = await integration.read_calendar_projection(body, 45526, person_id, datetime.UTC)
+        assert not projection.is_stale()
+    assert projection.refresh_at == calendar.cached_at + datetime.timedelta(
+        seconds=min(settings.refresh_intervals.values()) * settings.refresh_interval_growth,
+    )
+
+
+@pytest.mark.asyncio
+async def test_views_get_calendar_revalidates_stale(fake_redis_pool, background_tasks: BackgroundTasks):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-01-06T00:00:00Z", timeMax="2025-01-12T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    stale = schema.CalendarResponse.from_sections({}).model_copy(update={
+        "cached_at": schema.now_dt_utc() - datetime.timedelta(days=1),
+    })
+
+    with patch.object(integration, "get_cached_calendar", AsyncMock(return_value=stale)):
+        result = await views.get_calendar(
+            body=body, lms_user=lms_user, cookies=cookies, donor_token="test_token",
+            modeus_person_id="550e8400-e29b-41d4-a716-446655440000",
+            redis=fake_redis_pool, background_tasks=background_tasks,
+        )
+
+    assert schema.CalendarResponse.model_validate_json(result.body).cached_at == stale.cached_at
+    assert [task.func for task in background_tasks.tasks] == [integration.revalidate_calendar]
+
+
+@pytest.mark.asyncio
+async def test_revalidate_calendar_is_deduplicated(fake_redis_pool):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-04-07T00:00:00Z", timeMax="2025-04-13T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    person_id = "550e8400-e29b-41d4-a716-446655440007"
+
+    async def slow_fetch(*args: Any, **kwargs: Any) -> schema.CalendarResponse:
+        await asyncio.sleep(0.05)
+        return schema.CalendarResponse.from_sections({})
+
+    with patch.object(integration, "get_calendar", AsyncMock(side_effect=slow_fetch)) as mock_get_calendar:
+        await asyncio.gather(*(
+            integration.revalidate_calendar(
+                fake_redis_pool, body, 45526, person_id,
+                lms_user=lms_user, cookies=cookies, modeus_jwt_token="test_token",
+            ) for _ in range(3)
+        ))
+
+    assert mock_get_calendar.await_count == 1
+    assert await integration.read_cached_calendar(body, 45526, person_id) is not None
+
+
+@pytest.mark.asyncio
+async def test_save_cached_calendar_indexes_key(fake_redis_pool):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-05-05T00:00:00Z", timeMax="2025-05-11T00:00:00Z")
+    person_id = "550e8400-e29b-41d4-a716-446655440008"
+
+    with patch.object(key_index, "redis_pool", fake_redis_pool):
+        await integration.save_cached_calendar(body, 45526, person_id, schema.CalendarResponse.from_sections({}))
+
+        assert await key_index.get_keys(person_id) == {
+            integration.get_calendar_cache_key(body, 45526, person_id),
+            integration.get_calendar_digests_key(body, 45526, person_id),
+        }
+
+
+@pytest.mark.asyncio
+async def test_views_drop_cached_calendar(fake_redis_pool, bulk_fixture_content):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-05-19T00:00:00Z", timeMax="2025-05-25T00:00:00Z")
+    person_id = "550e8400-e29b-41d4-a716-446655440021"
+    FastAPICache.reset()
+    FastAPICache.init(RedisBackend(Redis(connection_pool=fake_redis_pool)))
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+
+    with patch.object(key_index, "redis_pool", fake_redis_pool):
+        await integration.save_cached_calendar(body, 45526, person_id, calendar)
+        assert await integration.read_cached_calendar(body, 45526, person_id) is not None
+
+        await views.drop_cached_calendar(modeus_person_id=person_id)
+
+        assert await integration.read_cached_calendar(body, 45526, person_id) is None
+        assert await integration.read_cached_digests(body, 45526, person_id) is None
+        assert await key_index.get_keys(person_id) == set()
+
+
+@pytest.mark.asyncio
+async def test_read_cached_calendar_ignores_broken_entry():
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-05-12T00:00:00Z", timeMax="2025-05-18T00:00:00Z")
+    person_id = "550e8400-e29b-41d4-a716-446655440009"
+    key = integration.get_calendar_cache_key(body, 45526, person_id)
+
+    await FastAPICache.get_backend().set(key, b"YAC\x01broken", 60)
+
+    assert await integration.read_cached_calendar(body, 45526, person_id) is None
+
+
+def test_decode_calendar_trusted_and_old_entries(bulk_fixture_content):
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+
+    with patch.object(schema.CalendarResponse, "model_validate", wraps=schema.CalendarResponse.model_validate) as slow:
+        assert integration.decode_calendar(CompactCoder.encode(calendar)) == calendar
+        slow.assert_not_called()
+    assert integration.decode_calendar(JsonCoder.encode(calendar)) == calendar
+
+
+def test_get_timezone_is_cached_zoneinfo():
+    timezone = schema.get_timezone("america/los_angeles")
+
+    assert isinstance(timezone, zoneinfo.ZoneInfo)
+    assert str(timezone) == "America/Los_Angeles"
+    assert schema.get_timezone("America/Los_Angeles") is timezone
+
+
+@pytest.mark.asyncio
+async def test_read_calendar_projection(bulk_fixture_content):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-05-19T00:00:00Z", timeMax="2025-05-25T00:00:00Z")
+    person_id = "550e8400-e29b-41d4-a716-446655440010"
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+    moscow = schema.get_timezone("Europe/Moscow")
+    assert await integration.read_calendar_projection(body, 45526, person_id, moscow) is None
+    await integration.save_cached_calendar(body, 45526, person_id, calendar)
+
+    first = await integration.read_calendar_projection(body, 45526, person_id, moscow)
+    with patch.object(integration, "decode_calendar", wraps=integration.decode_calendar) as decode:
+        second = await integration.read_calendar_projection(body, 45526, person_id, moscow)
+        decode.assert_not_called()
+        tokyo = await integration.read_calendar_projection(body, 45526, person_id, schema.get_timezone("Asia/Tokyo"))
+        decode.assert_called_once()
+
+    expected = calendar.model_copy(deep=True).change_timezone("Europe/Moscow").model_dump_json(
+        by_alias=True, exclude={"age"},
+    )
+    assert first == second
+    assert first.payload.decode() == expected
+    assert first.cached_at == calendar.cached_at
+    assert tokyo.payload != first.payload
+    tokyo_events = schema.CalendarResponse.model_validate_json(tokyo.payload).utmn.modeus_events
+    assert [event.start_time for event in tokyo_events] == [event.start_time for event in calendar.utmn.modeus_events]
+
+
+def test_events_schema_sends_age_in_header(fastapi_app):
+    openapi = fastapi_app.openapi()
+    response = openapi["paths"]["/api/bulk/events/"]["get"]["responses"]["200"]
+    schema_name = response["content"]["application/json"]["schema"]["$ref"].rsplit("/", 1)[-1]
+
+    assert "Age" in response["headers"]
+    assert "age" not in openapi["components"]["schemas"][schema_name]["properties"]
+    assert "age" in openapi["components"]["schemas"]["CalendarResponse"]["properties"]
+
+
+@pytest.mark.asyncio
+async def test_views_get_calendar_not_modified(fake_redis_pool, bulk_fixture_content):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-05-26T00:00:00Z", timeMax="2025-06-01T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    person_id = "550e8400-e29b-41d4-a716-446655440011"
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+    await integration.save_cached_calendar(body, 45526, person_id, calendar)
+
+    async def get(time_zone: str = "Europe/Moscow", if_none_match: str | None = None) -> Response:
+        return await views.get_calendar(
+            body=body, lms_user=lms_user, cookies=cookies, donor_token="test_token", modeus_person_id=person_id,
+            redis=fake_redis_pool, background_tasks=BackgroundTasks(), calendar_id=45526,
+            time_zone=time_zone, if_none_match=if_none_match,
+        )
+
+    first = await get()
+    etag = first.headers["ETag"]
+    with patch.object(integration, "project_calendar", wraps=integration.project_calendar) as project:
+        not_modified = await get(if_none_match=f'W/"other", {etag}')
+        project.assert_not_called()
+    other_timezone = await get(time_zone="Asia/Tokyo", if_none_match=etag)
+
+    assert first.status_code == 200
+    assert not_modified.status_code == 304
+    assert not_modified.body == b""
+    assert not_modified.headers["ETag"] == etag
+    assert other_timezone.status_code == 200
+    assert other_timezone.headers["ETag"] != etag
+
+    now = schema.now_dt_utc()
+    with patch.object(schema, "now_dt_utc", return_value=now + datetime.timedelta(seconds=500)):
+        later = await get()
+        later_not_modified = await get(if_none_match=etag)
+    assert "age" not in json.loads(later.body)
+    assert int(later.headers["Age"]) >= int(first.headers["Age"]) + 500
+    assert later.headers["ETag"] == etag
+    assert later_not_modified.headers["Age"] == later.headers["Age"]
+
+
+def test_etag_matches():
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('W/"a"', '"a"')
+    assert etag_matches('"b", "a"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"b"', '"a"')
+    assert not etag_matches(None, '"a"')
+
+
+def test_calendar_delta(bulk_fixture_content):
+    previous = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+    current = previous.model_copy(deep=True)
+    removed = current.utmn.modeus_events.pop()
+    current.utmn.modeus_events[0].name = "Renamed"
+    current.netology.homework[0].id = 1
+    current.sources[schema.CalendarSource.LMS] = schema.SourceStatus.FAILED
+
+    delta = current.get_digests().get_delta(previous.get_digests())
+
+    assert delta[schema.CalendarSource.MODEUS] == schema.SourceDelta(
+        removed=[str(removed.id)], modified=[str(current.utmn.modeus_events[0].id)],
+    )
+    assert delta[schema.CalendarSource.NETOLOGY] == schema.SourceDelta(
+        added=["homework:1"], removed=[f"homework:{previous.netology.homework[0].id}"],
+    )
+    assert schema.CalendarSource.LMS not in delta
+    assert current.get_digests().get_delta(None)[schema.CalendarSource.MODEUS].added == [
+        str(event.id) for event in current.utmn.modeus_events
+    ]
+
+
+@pytest.mark.asyncio
+async def test_refresh_events_fetches_once_on_miss(bulk_fixture_content):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-06-02T00:00:00Z", timeMax="2025-06-08T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    person_id = "550e8400-e29b-41d4-a716-446655440012"
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+
+    with patch.object(integration, "get_calendar", AsyncMock(return_value=calendar)) as get_calendar:
+        refreshed = await integration.refresh_events(
+            body, lms_user, 45526, cookies, "Europe/Moscow", "test_token", person_id,
+        )
+        get_calendar.assert_awaited_once()
+        assert refreshed.changed is True
+        assert len(refreshed.delta[schema.CalendarSource.MODEUS].added) == len(calendar.utmn.modeus_events)
+
+        get_calendar.return_value = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+        with patch.object(integration, "read_cached_calendar") as read_cached_calendar:
+            refreshed = await integration.refresh_events(
+                body, lms_user, 45526, cookies, "Europe/Moscow", "test_token", person_id,
+            )
+            read_cached_calendar.assert_not_called()
+    assert refreshed.changed is False
+    assert all(source_delta.is_empty() for source_delta in refreshed.delta.values())
+
+
+def test_refresh_stats_adapt_intervals():
+    stats = schema.RefreshStats()
+    netology, modeus = schema.CalendarSource.NETOLOGY, schema.CalendarSource.MODEUS
+    initial = settings.refresh_intervals[netology.value]
+
+    stats.record({netology: schema.SourceDelta(modified=["webinar:1"]), modeus: schema.SourceDelta()})
+    assert stats.get(netology).interval == initial // 2
+    assert stats.get(modeus).interval == settings.refresh_intervals[modeus.value] * settings.refresh_interval_growth
+    for _ in range(10):
+        stats.record({netology: schema.SourceDelta(added=["webinar:2"]), modeus: schema.SourceDelta()})
+    assert stats.get(netology).interval == settings.refresh_min_interval
+    assert stats.get(modeus).interval == settings.refresh_max_interval
+    assert (stats.get(netology).checks, stats.get(netology).changes) == (11, 11)
+    assert stats.get(schema.CalendarSource.LMS).checks == 0
+
+    now = schema.now_dt_utc()
+    digests = schema.CalendarDigests(fetched_at={
+        netology: now - datetime.timedelta(seconds=settings.refresh_min_interval),
+        modeus: now - datetime.timedelta(seconds=settings.refresh_min_interval),
+    })
+    assert stats.get_due(digests, now) == [netology, schema.CalendarSource.LMS]
+    assert stats.get_due(None, now) == list(schema.CalendarSource)
+
+
+@pytest.mark.asyncio
+async def test_revalidate_calendar_fetches_due_sources(fake_redis_pool, bulk_fixture_content):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-06-09T00:00:00Z", timeMax="2025-06-15T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    person_id = "550e8400-e29b-41d4-a716-446655440016"
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+    calendar.cached_at = schema.now_dt_utc()
+    digests = calendar.get_digests()
+    netology_fetched_at = calendar.cached_at - datetime.timedelta(days=1)
+    digests.fetched_at[schema.CalendarSource.NETOLOGY] = netology_fetched_at
+    await integration.save_cached_calendar(body, 45526, person_id, calendar, digests)
+
+    with patch.object(integration.netology_views, "get_calendar", AsyncMock(return_value=calendar.netology)) as netology, \
+            patch.object(integration.modeus_views, "get_calendar", AsyncMock()) as modeus, \
+            patch.object(integration.lms_views, "get_events", AsyncMock()) as lms:
+        for _ in range(2):
+            await integration.revalidate_calendar(
+                fake_redis_pool, body, 45526, person_id,
+                lms_user=lms_user, cookies=cookies, modeus_jwt_token="test_token",
+            )
+
+    netology.assert_awaited_once()
+    modeus.assert_not_awaited()
+    lms.assert_not_awaited()
+    cached_digests = await integration.read_cached_digests(body, 45526, person_id)
+    assert cached_digests.fetched_at[schema.CalendarSource.NETOLOGY] > netology_fetched_at
+    assert cached_digests.fetched_at[schema.CalendarSource.MODEUS] == calendar.cached_at
+    stats = (await integration.read_refresh_stats(45526, person_id)).get(schema.CalendarSource.NETOLOGY)
+    assert (stats.checks, stats.changes) == (1, 0)
+    assert stats.interval > settings.refresh_intervals["netology"]
+
+
+@pytest.mark.asyncio
+async def test_refresh_sources_bypasses_warm_cache_layers(bulk_fixture_content):
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-06-16T00:00:00Z", timeMax="2025-06-22T00:00:00Z")
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    person_id = "550e8400-e29b-41d4-a716-446655440019"
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+    await integration.save_cached_calendar(body, 45526, person_id, calendar)
+    cached_digests = await integration.read_cached_digests(body, 45526, person_id)
+
+    upstream = AsyncMock(return_value=calendar.netology)
+    layered = CacheLayer(
+        "test_netology", netology_schema.SerializedEvents, expire=60, key=lambda *args: (person_id,),
+    )(upstream)
+    await layered(body, 45526, cookies)
+    upstream.reset_mock()
+
+    with patch.object(integration.netology_views, "get_calendar", layered):
+        await integration.refresh_sources(
+            body, 45526, person_id, [schema.CalendarSource.NETOLOGY], cached_digests,
+            lms_user=lms_user, cookies=cookies, modeus_jwt_token="test_token",
+        )
+    upstream.assert_awaited_once()
+
+
+def create_reference_event(title: str, starts_at: datetime.datetime, ends_at: datetime.datetime,
+                           lesson_id: Any, description: str | None = None,
+                           url: str | None = None) -> icalendar.Event:
+    """Event built with icalendar, as export_to_ics did before streaming writer."""
+    event = icalendar.Event()
+    event.add('summary', title)
+    event.add('location', url if url else 'unknown location')
+    event.add('dtstart', starts_at)
+    event.add('dtend', ends_at)
+    event.add('dtstamp', datetime.datetime.now())
+    event.add('uid', lesson_id)
+    event.add('DESCRIPTION', description)
+    return event
+
+
+def build_reference_ics(calendar: schema.CalendarResponse) -> bytes:
+    """Calendar built with icalendar components, as export_to_ics did before streaming writer."""
+    ics_calendar = icalendar.Calendar()
+    ics_calendar.add('version', '2.0')
+    ics_calendar.add('prodid', 'yet_another_calendar')
+    for webinar in calendar.netology.webinars:
+        if webinar.starts_at and webinar.ends_at:
+            ics_calendar.add_component(create_reference_event(
+                f"Netology: {webinar.block_title}", webinar.starts_at, webinar.ends_at, webinar.id,
+                webinar.title, webinar.webinar_url,
+            ))
+    for homework in calendar.netology.homework:
+        if homework.deadline:
+            dt_end = homework.deadline + datetime.timedelta(hours=18)
+            ics_calendar.add_component(create_reference_event(
+                f"Netology ДЗ: {homework.block_title}", dt_end - datetime.timedelta(hours=2), dt_end, homework.id,
+                homework.title, homework.url,
+            ))
+    for event in calendar.utmn.modeus_events:
+        ics_calendar.add_component(create_reference_event(
+            f"Modeus: {event.course_name}", event.start_time, event.end_time, event.id, event.name, event.mts_url,
+        ))
+    for lms_event in calendar.utmn.lms_events:
+        ics_calendar.add_component(create_reference_event(
+            f"LMS: {lms_event.course_name}", lms_event.dt_end - datetime.timedelta(hours=2), lms_event.dt_end,
+            lms_event.id, lms_event.name, lms_event.url,
+        ))
+    return ics_calendar.to_ical()
+
+
+@pytest.mark.parametrize("timezone_name", ["Europe/Moscow", "UTC", "America/New_York"])
+def test_export_to_ics_parity(bulk_fixture_content, timezone_name):
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content).change_timezone(timezone_name)
+    calendar.utmn.modeus_events[0].name = "Line;with, special\\chars\nand a very long description " * 3
+    calendar.utmn.modeus_events[0].description = None
+
+    chunks = list(integration.export_to_ics(calendar))
+
+    def without_dtstamp(ics_data: bytes) -> list[bytes]:
+        return [line for line in ics_data.split(b"\r\n") if not line.startswith(b"DTSTAMP:")]
+
+    assert without_dtstamp(b"".join(chunks)) == without_dtstamp(build_reference_ics(calendar))
+    assert chunks[1].startswith(b"BEGIN:VEVENT") and chunks[1].endswith(b"END:VEVENT\r\n")
+    assert chunks[-1] == b"END:VCALENDAR\r\n"
+
+
+@pytest.mark.parametrize(("description", "url"), [
+    ("Algebra and Linear Equations", "https://example.com/classroom"),
+    (None, None),
+    ("", ""),
+])
+@pytest.mark.parametrize("ends_at_key", ["end", "invalid_end"])
+def test_write_event_parity(sample_datetime, description, url, ends_at_key):
+    start, end = sample_datetime["start"], sample_datetime[ends_at_key]
+    dt_stamp = datetime.datetime.now(tz=datetime.UTC)
+
+    event = ics.write_event("Math Lecture", start, end, "lesson-001", dt_stamp, description, url)
+
+    reference = create_reference_event("Math Lecture", start, end, "lesson-001", description, url)
+    reference["DTSTAMP"].dt = dt_stamp.replace(microsecond=0)
+    assert event == reference.to_ical()
+    assert (b"LOCATION:unknown location" in event) == (not url)
+
+
+def test_not_modified_since():
+    last_modified = datetime.datetime(2025, 5, 5, 10, 0, 0, 500, tzinfo=datetime.UTC)
+
+    assert not_modified_since(format_http_date(last_modified), last_modified)
+    assert not not_modified_since(format_http_date(last_modified - datetime.timedelta(seconds=1)), last_modified)
+    assert not not_modified_since("not a date", last_modified)
+    assert not not_modified_since(None, last_modified)
+
+
+def test_subscription_body_is_rolling_weeks():
+    body = integration.get_subscription_body(datetime.date(2025, 5, 8))
+
+    assert body.time_min == datetime.datetime(2025, 4, 28, tzinfo=datetime.UTC)
+    assert body.time_max.date() == datetime.date(2025, 6, 8)
+    assert len(body.split_weeks()) == settings.subscription_weeks_before + settings.subscription_weeks_after + 1
+
+
+@pytest.mark.asyncio
+async def test_subscription_feed(fake_redis_pool, bulk_fixture_content):
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    created = await views.create_subscription(
+        lms_user=lms_user, cookies=cookies, modeus_person_id="550e8400-e29b-41d4-a716-446655440013",
+        redis=fake_redis_pool,
+    )
+    token = created.url.removesuffix(".ics").rsplit("/", 1)[-1]
+    assert created.webcal_url.startswith("webcal://")
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+
+    with patch.object(integration, "get_calendar_range", AsyncMock(return_value=calendar)) as get_calendar_range:
+        first = await views.get_subscription_feed(token=token, donor_token="test_token", redis=fake_redis_pool)
+        by_etag = await views.get_subscription_feed(
+            token=token, donor_token="test_token", redis=fake_redis_pool, if_none_match=first.headers["ETag"],
+        )
+        by_date = await views.get_subscription_feed(
+            token=token, donor_token="test_token", redis=fake_redis_pool,
+            if_modified_since=first.headers["Last-Modified"],
+        )
+        get_calendar_range.assert_awaited_once()
+        assert get_calendar_range.await_args.kwargs["cookies"] == cookies
+
+    assert first.status_code == 200
+    assert first.media_type == "text/calendar"
+    assert b"SUMMARY:Netology: 2" in first.body
+    assert by_etag.status_code == 304
+    assert by_date.status_code == 304
+
+    await views.delete_subscription(token=token, redis=fake_redis_pool)
+    with pytest.raises(HTTPException) as exc_info:
+        await views.get_subscription_feed(token=token, donor_token="test_token", redis=fake_redis_pool)
+    assert exc_info.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_subscription_feed_serves_stale_on_failure(fake_redis_pool, bulk_fixture_content):
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    created = await views.create_subscription(
+        lms_user=lms_user, cookies=cookies, modeus_person_id="550e8400-e29b-41d4-a716-446655440017",
+        redis=fake_redis_pool,
+    )
+    token = created.url.removesuffix(".ics").rsplit("/", 1)[-1]
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+    with patch.object(integration, "get_calendar_range", AsyncMock(return_value=calendar)):
+        fresh = await integration.get_subscription_feed(fake_redis_pool, token, "test_token")
+
+    later = fresh.rendered_at + datetime.timedelta(seconds=settings.subscription_render_time_live + 1)
+    with patch.object(schema, "now_dt_utc", return_value=later), \
+            patch.object(integration, "get_calendar_range", AsyncMock(side_effect=HTTPException(503))) as failed:
+        stale = await integration.get_subscription_feed(fake_redis_pool, token, "test_token")
+        failed.assert_awaited_once()
+    assert stale == fresh
+
+    async with Redis(connection_pool=fake_redis_pool) as redis:
+        await redis.delete(f"{integration.get_subscription_key(token)}:ics")
+    with patch.object(integration, "get_calendar_range", AsyncMock(side_effect=HTTPException(503))), \
+            pytest.raises(HTTPException) as exc_info:
+        await integration.get_subscription_feed(fake_redis_pool, token, "test_token")
+    assert exc_info.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_subscription_feed_serves_stale_on_degraded_calendar(fake_redis_pool, bulk_fixture_content):
+    lms_user = lms_schema.User(token="test_token", id=123)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+    created = await views.create_subscription(
+        lms_user=lms_user, cookies=cookies, modeus_person_id="550e8400-e29b-41d4-a716-446655440020",
+        redis=fake_redis_pool,
+    )
+    token = created.url.removesuffix(".ics").rsplit("/", 1)[-1]
+    feed_key = f"{integration.get_subscription_key(token)}:ics"
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+    with patch.object(integration, "get_calendar_range", AsyncMock(return_value=calendar)):
+        fresh = await integration.get_subscription_feed(fake_redis_pool, token, "test_token")
+
+    degraded = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+    degraded.netology = netology_schema.SerializedEvents(homework=[], webinars=[])
+    degraded.sources[schema.CalendarSource.NETOLOGY] = schema.SourceStatus.FAILED
+    later = fresh.rendered_at + datetime.timedelta(seconds=settings.subscription_render_time_live + 1)
+    with patch.object(schema, "now_dt_utc", return_value=later), \
+            patch.object(integration, "get_calendar_range", AsyncMock(return_value=degraded)):
+        stale = await integration.get_subscription_feed(fake_redis_pool, token, "test_token")
+    assert stale == fresh
+    async with Redis(connection_pool=fake_redis_pool) as redis:
+        assert (await redis.hget(feed_key, "etag")).decode() == fresh.etag
+
+        await redis.delete(feed_key)
+    with patch.object(integration, "get_calendar_range", AsyncMock(return_value=degraded)):
+        partial = await integration.get_subscription_feed(fake_redis_pool, token, "test_token")
+    assert b"SUMMARY:Netology" not in partial.ics
+    async with Redis(connection_pool=fake_redis_pool) as redis:
+        assert not await redis.exists(feed_key)
+
+
+@pytest.mark.asyncio
+async def test_prefetch_calendar(fake_redis_pool):
+    week = datetime.date(2025, 5, 5)
+    subscriber_id = "550e8400-e29b-41d4-a716-446655440014"
+    await integration.create_subscription(fake_redis_pool, schema.SubscriptionCredentials(
+        person_id=subscriber_id, calendar_id=1, time_zone="Europe/Moscow",
+        lms_user=lms_schema.User(token="test_token", id=123),
+        cookies=netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"}),
+    ))
+
+    with patch.object(integration.prefetcher, "redis_pool", fake_redis_pool), \
+            patch.object(integration.modeus_integration, "get_donor_token", AsyncMock(return_value="donor")), \
+            patch.object(integration, "revalidate_calendar", AsyncMock()) as revalidate_calendar:
+        await integration.prefetch_calendar(subscriber_id, week)
+        await integration.prefetch_calendar("550e8400-e29b-41d4-a716-446655440015", week)
+
+    revalidate_calendar.assert_awaited_once()
+    body = revalidate_calendar.await_args.args[1]
+    assert (body.time_min.date(), body.time_max.date()) == (week, datetime.date(2025, 5, 11))
+    assert revalidate_calendar.await_args.kwargs["modeus_jwt_token"] == "donor"
+
+
+@pytest.mark.asyncio
+async def test_prefetched_calendar_lasts_until_peak(fake_redis_pool, bulk_fixture_content):
+    week = datetime.date(2025, 5, 5)
+    person_id = "550e8400-e29b-41d4-a716-446655440018"
+    await integration.create_subscription(fake_redis_pool, schema.SubscriptionCredentials(
+        person_id=person_id, calendar_id=1, time_zone="Europe/Moscow",
+        lms_user=lms_schema.User(token="test_token", id=123),
+        cookies=netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"}),
+    ))
+    calendar = schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+
+    with patch.object(integration.prefetcher, "redis_pool", fake_redis_pool), \
+            patch.object(integration.modeus_integration, "get_donor_token", AsyncMock(return_value="donor")), \
+            patch.object(integration, "get_calendar", AsyncMock(return_value=calendar)):
+        await integration.prefetch_calendar(person_id, week)
+
+    body = modeus_schema.ModeusTimeBody.model_validate({
+        "timeMin": datetime.datetime.combine(week, datetime.time.min),
+        "timeMax": datetime.datetime.combine(week + datetime.timedelta(days=6), datetime.time.min),
+    })
+    # Sweep runs at 03:00, users come back in the morning and during the day
+    peak = time.time() + 60 * 60 * 12
+    with patch("fastapi_cache.backends.inmemory.time.time", return_value=peak):
+        cached = await integration.read_cached_calendar(body, 1, person_id)
+    assert cached is not None
+    assert cached.get_hash() == calendar.get_hash()
+
+
+@pytest.mark.asyncio
+async def test_user_metrix_windows_and_sources(fake_redis_pool):
+    today = datetime.datetime(2025, 6, 30, 12, tzinfo=datetime.UTC)
+    visits = [
+        ("first", schema.ActivitySource.EVENTS, 0),
+        ("first", schema.ActivitySource.STREAM, 0),
+        ("second", schema.ActivitySource.EVENTS, 3),
+        ("third", schema.ActivitySource.RANGE, 20),
+        ("old", schema.ActivitySource.EVENTS, 40),
+    ]
+    with patch.object(integration.write_buffer, "redis_pool", fake_redis_pool):
+        for user_id, source, days_ago in visits:
+            with patch.object(schema, "now_dt_utc", return_value=today - datetime.timedelta(days=days_ago)):
+                integration.save_user_was_there(user_id, source)
+        assert await integration.write_buffer.flush() == 5 * 7
+
+    metrix = await integration.get_user_metrix(fake_redis_pool, today.date())
+
+    assert (metrix.daily_users, metrix.weekly_users, metrix.monthly_users) == (1, 2, 3)
+    assert metrix.sources[schema.ActivitySource.EVENTS] == schema.UsersCount(
+        daily_users=1, weekly_users=2, monthly_users=2,
+    )
+    assert metrix.sources[schema.ActivitySource.RANGE].monthly_users == 1
+    assert metrix.sources[schema.ActivitySource.STREAM].weekly_users == 1
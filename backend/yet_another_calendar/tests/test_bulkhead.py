@@ -0,0 +1,54 @@
+"""Tests for per-upstream bulkheads."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from yet_another_calendar.web.bulkhead import Bulkhead
+
+
+@pytest.mark.asyncio
+async def test_bulkhead_limits_in_flight() -> None:
+    bulkhead = Bulkhead("test", max_in_flight=2, max_queue=10)
+    max_seen = 0
+
+    async def call() -> None:
+        nonlocal max_seen
+        async with bulkhead.acquire():
+            max_seen = max(max_seen, bulkhead.in_flight)
+            await asyncio.sleep(0.01)
+
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(6):
+            tg.create_task(call())
+
+    assert max_seen == 2
+    stats = bulkhead.stats()
+    assert stats.in_flight == 0
+    assert stats.queued == 0
+    assert stats.max_wait > 0
+
+
+@pytest.mark.asyncio
+async def test_bulkhead_rejects_when_queue_is_full() -> None:
+    bulkhead = Bulkhead("test", max_in_flight=1, max_queue=1)
+    release = asyncio.Event()
+
+    async def hold() -> None:
+        async with bulkhead.acquire():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    assert bulkhead.stats().queued == 1
+
+    with pytest.raises(HTTPException) as exc_info:
+        async with bulkhead.acquire():
+            pass
+    assert exc_info.value.status_code == 503
+    assert bulkhead.stats().rejected == 1
+
+    release.set()
+    await asyncio.gather(holder, waiter)
+    assert bulkhead.stats().in_flight == 0
@@ -0,0 +1,83 @@
+"""Tests for cache keys and reverse key index."""
+from unittest.mock import patch
+
+import pytest
+from redis.asyncio import ConnectionPool, Redis
+
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.api.bulk import schema as bulk_schema
+from yet_another_calendar.web.api.modeus import schema as modeus_schema
+from yet_another_calendar.web.cache_builder import KeyIndex, get_schema_version, key_builder
+
+
+async def get_calendar(body: modeus_schema.ModeusTimeBody, person_id: str) -> bulk_schema.CalendarResponse:
+    """Signature only."""
+    raise NotImplementedError
+
+
+def test_key_depends_on_values_not_repr() -> None:
+    body = modeus_schema.ModeusTimeBody(timeMin="2025-01-06T00:00:00Z", timeMax="2025-01-12T00:00:00Z")
+    same_body = modeus_schema.ModeusTimeBody.model_validate(
+        {"timeMax": "2025-01-12T00:00:00+00:00", "timeMin": "2025-01-06T00:00:00"},
+    )
+    other_body = modeus_schema.ModeusTimeBody(timeMin="2025-01-13T00:00:00Z", timeMax="2025-01-19T00:00:00Z")
+
+    key = key_builder(get_calendar, "calendar", args=(body, "person"), kwargs={})
+
+    assert key == key_builder(get_calendar, "calendar", args=(same_body, "person"), kwargs={})
+    assert key != key_builder(get_calendar, "calendar", args=(other_body, "person"), kwargs={})
+    assert key != key_builder(get_calendar, "calendar", args=(body, "other"), kwargs={})
+    assert key.startswith(f"calendar:v{settings.cache_schema_version}.")
+
+
+def test_schema_version_changes_with_setting() -> None:
+    version = get_schema_version(get_calendar)
+    get_schema_version.cache_clear()
+    try:
+        with patch.object(settings, "cache_schema_version", settings.cache_schema_version + 1):
+            assert get_schema_version(get_calendar) != version
+    finally:
+        get_schema_version.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_key_index_invalidates_user_keys(fake_redis_pool: ConnectionPool) -> None:
+    index = KeyIndex()
+    index.redis_pool = fake_redis_pool
+    async with Redis(connection_pool=fake_redis_pool) as redis:
+        await redis.set("first", 1)
+        await redis.set("second", 1)
+        await redis.set("foreign", 1)
+
+        await index.add("user", "first", "second")
+        await index.add("other", "foreign")
+
+        assert await index.get_keys("user") == {"first", "second"}
+        assert await index.invalidate("user") == 2
+        assert await index.get_keys("user") == set()
+        assert await redis.get("first") is None
+        assert await redis.get("foreign") is not None
+
+
+@pytest.mark.asyncio
+async def test_key_index_trims_expired_keys(fake_redis_pool: ConnectionPool) -> None:
+    index = KeyIndex()
+    index.redis_pool = fake_redis_pool
+
+    await index.add("user", "expired", expire=-1)
+    await index.add("user", "long", expire=100)
+    assert await index.get_keys("user") == {"long"}
+    await index.add("user", "new", expire=100)
+
+    async with Redis(connection_pool=fake_redis_pool) as redis:
+        assert set(await redis.zrange(index._index_key("user"), 0, -1)) == {b"long", b"new"}
+
+
+@pytest.mark.asyncio
+async def test_key_index_without_redis() -> None:
+    index = KeyIndex()
+
+    await index.add("user", "key")
+
+    assert await index.get_keys("user") == set()
+    assert await index.invalidate("user") == 0
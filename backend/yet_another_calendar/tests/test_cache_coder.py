@@ -0,0 +1,29 @@
+"""Tests for compact cache coder."""
+from fastapi_cache.coder import JsonCoder
+
+from yet_another_calendar.web.api.bulk import schema as bulk_schema
+from yet_another_calendar.web.cache_coder import MAGIC, CompactCoder
+
+
+def test_calendar_round_trip(bulk_fixture_content: str) -> None:
+    calendar = bulk_schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+
+    encoded = CompactCoder.encode(calendar)
+
+    assert encoded.startswith(MAGIC)
+    assert len(encoded) < len(JsonCoder.encode(calendar))
+    decoded = bulk_schema.CalendarResponse.model_validate(CompactCoder.decode(encoded))
+    assert decoded == calendar
+    assert decoded.get_hash() == calendar.get_hash()
+
+
+def test_old_json_entries_are_decoded(bulk_fixture_content: str) -> None:
+    calendar = bulk_schema.CalendarResponse.model_validate_json(bulk_fixture_content)
+
+    decoded = bulk_schema.CalendarResponse.model_validate(CompactCoder.decode(JsonCoder.encode(calendar)))
+
+    assert decoded == calendar
+
+
+def test_plain_values() -> None:
+    assert CompactCoder.decode(CompactCoder.encode({"a": [1, 2]})) == {"a": [1, 2]}
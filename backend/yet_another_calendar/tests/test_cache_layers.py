@@ -0,0 +1,88 @@
+"""Tests for per-entity cache layers."""
+from collections.abc import Generator
+from typing import Any
+
+import pytest
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+
+from yet_another_calendar.web.api.lms import schema as lms_schema
+from yet_another_calendar.web.api.netology import schema as netology_schema
+from yet_another_calendar.web.cache_layers import CacheLayer, bypass_cache_layers
+
+
+@pytest.fixture(autouse=True)
+def _init_cache() -> Generator[Any, Any, None]:
+    FastAPICache.init(InMemoryBackend())
+    InMemoryBackend._store.clear()
+    yield
+    FastAPICache.reset()
+
+
+class CountingFetch:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def __call__(self, course_id: int, token: str) -> list[int]:
+        self.calls += 1
+        return [course_id, self.calls]
+
+
+def make_layer() -> CacheLayer:
+    return CacheLayer("test", list[int], expire=60, key=lambda course_id, token: (course_id,))
+
+
+@pytest.mark.asyncio
+async def test_entity_is_shared_between_arguments() -> None:
+    fetch = CountingFetch()
+    cached_fetch = make_layer()(fetch)
+
+    assert await cached_fetch(1, "first") == [1, 1]
+    assert await cached_fetch(1, token="second") == [1, 1]
+    assert await cached_fetch(2, "first") == [2, 2]
+    assert fetch.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_bypass_refetches_and_overwrites() -> None:
+    fetch = CountingFetch()
+    cached_fetch = make_layer()(fetch)
+    await cached_fetch(1, "token")
+
+    with bypass_cache_layers():
+        assert await cached_fetch(1, "token") == [1, 2]
+    assert await cached_fetch(1, "token") == [1, 2]
+    assert fetch.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_invalid_entry_and_missing_backend_go_to_upstream() -> None:
+    fetch = CountingFetch()
+    layer = make_layer()
+    cached_fetch = layer(fetch)
+    await FastAPICache.get_backend().set(layer.make_key(1, "token"), b'{"broken": true}', 60)
+
+    assert await cached_fetch(1, "token") == [1, 1]
+
+    FastAPICache.reset()
+    assert await cached_fetch(1, "token") == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_models_round_trip() -> None:
+    layer = CacheLayer("test_models", lms_schema.User, expire=60, key=lambda user_id: (user_id,))
+    user = lms_schema.User(token="token", id=1)
+    key = layer.make_key(1)
+
+    await layer.set(key, user)
+
+    assert await layer.get(key) == user
+
+
+def test_netology_digest_does_not_leak_session() -> None:
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "secret-session"})
+
+    assert "secret-session" not in cookies.get_digest()
+    assert cookies.get_digest() == netology_schema.NetologyCookies.model_validate(
+        {"_netology-on-rails_session": "secret-session"},
+    ).get_digest()
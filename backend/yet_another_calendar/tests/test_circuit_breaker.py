@@ -0,0 +1,141 @@
+"""Tests for Redis-backed circuit breakers."""
+import asyncio
+
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from redis.asyncio import ConnectionPool, Redis
+
+from yet_another_calendar.web.api.netology import integration as netology_integration
+from yet_another_calendar.web.api.netology import schema as netology_schema
+from yet_another_calendar.web.bulkhead import Bulkhead, bulkheads
+from yet_another_calendar.web.circuit_breaker import CircuitBreaker, circuit_breakers, is_upstream_failure
+from yet_another_calendar.web.http_clients import Upstream
+
+
+def make_breaker(redis_pool: ConnectionPool | None, open_time: float = 30) -> CircuitBreaker:
+    breaker = CircuitBreaker(
+        "Netology", Upstream.NETOLOGY, failure_rate=0.5, min_calls=4, window=60, open_time=open_time,
+    )
+    breaker.redis_pool = redis_pool
+    return breaker
+
+
+async def fail(breaker: CircuitBreaker) -> None:
+    with pytest.raises(httpx.ConnectError):
+        async with breaker.guard():
+            raise httpx.ConnectError("boom")
+
+
+async def succeed(breaker: CircuitBreaker) -> None:
+    async with breaker.guard():
+        pass
+
+
+def test_is_upstream_failure() -> None:
+    request = httpx.Request("GET", "https://netology.ru")
+
+    assert is_upstream_failure(httpx.ReadTimeout("timeout"))
+    assert is_upstream_failure(httpx.HTTPStatusError("", request=request, response=httpx.Response(502)))
+    assert not is_upstream_failure(httpx.HTTPStatusError("", request=request, response=httpx.Response(404)))
+    assert not is_upstream_failure(HTTPException(status_code=401))
+
+
+@pytest.mark.asyncio
+async def test_breaker_without_redis_passes_through() -> None:
+    breaker = make_breaker(None)
+    for _ in range(10):
+        await fail(breaker)
+    await succeed(breaker)
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_after_failure_rate(fake_redis_pool: ConnectionPool) -> None:
+    breaker = make_breaker(fake_redis_pool)
+    await succeed(breaker)
+    await succeed(breaker)
+    await fail(breaker)
+    await fail(breaker)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await succeed(breaker)
+    assert exc_info.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_breaker_ignores_client_errors(fake_redis_pool: ConnectionPool) -> None:
+    breaker = make_breaker(fake_redis_pool)
+    for _ in range(5):
+        with pytest.raises(HTTPException):
+            async with breaker.guard():
+                raise HTTPException(status_code=401)
+
+    await succeed(breaker)
+
+
+@pytest.mark.asyncio
+async def test_breaker_is_shared_between_workers(fake_redis_pool: ConnectionPool) -> None:
+    first_worker = make_breaker(fake_redis_pool)
+    second_worker = make_breaker(fake_redis_pool)
+    for _ in range(4):
+        await fail(first_worker)
+
+    with pytest.raises(HTTPException):
+        await succeed(second_worker)
+
+
+@pytest.mark.asyncio
+async def test_breaker_half_open_lets_single_probe(fake_redis_pool: ConnectionPool) -> None:
+    breaker = make_breaker(fake_redis_pool, open_time=0.01)
+    for _ in range(4):
+        await fail(breaker)
+    await asyncio.sleep(0.02)
+
+    probe_started = asyncio.Event()
+    release_probe = asyncio.Event()
+
+    async def probe() -> None:
+        async with breaker.guard():
+            probe_started.set()
+            await release_probe.wait()
+
+    probe_task = asyncio.create_task(probe())
+    await probe_started.wait()
+    with pytest.raises(HTTPException):
+        await succeed(breaker)
+
+    release_probe.set()
+    await probe_task
+    await succeed(breaker)
+
+
+@pytest.mark.asyncio
+async def test_breaker_failed_probe_opens_again(fake_redis_pool: ConnectionPool) -> None:
+    breaker = make_breaker(fake_redis_pool, open_time=0.01)
+    for _ in range(4):
+        await fail(breaker)
+    await asyncio.sleep(0.02)
+
+    await fail(breaker)
+    with pytest.raises(HTTPException):
+        await succeed(breaker)
+
+
+@pytest.mark.asyncio
+async def test_bulkhead_rejection_is_not_counted(fake_redis_pool: ConnectionPool) -> None:
+    breaker = make_breaker(fake_redis_pool)
+    bulkhead = Bulkhead("Netology", max_in_flight=1, max_queue=0)
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "test_session"})
+
+    with patch.dict(circuit_breakers, {Upstream.NETOLOGY: breaker}), \
+            patch.dict(bulkheads, {Upstream.NETOLOGY: bulkhead}):
+        async with bulkhead.acquire():
+            with pytest.raises(HTTPException) as exc_info:
+                await netology_integration._send_request(cookies, {"method": "GET", "url": "/"}, 1)
+
+    assert exc_info.value.status_code == 503
+    assert bulkhead.stats().rejected == 1
+    async with Redis(connection_pool=fake_redis_pool) as redis:
+        assert [key async for key in redis.scan_iter(match="*:calls:*")] == []
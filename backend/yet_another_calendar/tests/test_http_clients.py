@@ -0,0 +1,49 @@
+"""Tests for shared upstream HTTP clients."""
+import httpx
+import pytest
+
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.api.netology import schema as netology_schema
+from yet_another_calendar.web.http_clients import HttpClients, Upstream, create_client
+
+
+@pytest.mark.asyncio
+async def test_registry_reuses_client_per_upstream() -> None:
+    registry = HttpClients()
+    registry.start()
+
+    assert set(registry.clients) == set(Upstream)
+    assert registry.get(Upstream.LMS) is registry.get(Upstream.LMS)
+    assert registry.get(Upstream.LMS) is not registry.get(Upstream.NETOLOGY)
+    assert str(registry.get(Upstream.NETOLOGY).base_url).startswith(settings.netology_base_url)
+
+    await registry.close()
+    assert registry.clients == {}
+
+
+@pytest.mark.asyncio
+async def test_registry_recreates_closed_client() -> None:
+    registry = HttpClients()
+    client = registry.get(Upstream.UTMN)
+    await client.aclose()
+
+    assert registry.get(Upstream.UTMN) is not client
+    await registry.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_client_does_not_store_cookies() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"Set-Cookie": "_netology-on-rails_session=leaked; Path=/"})
+
+    client = create_client(Upstream.NETOLOGY)
+    client._transport = httpx.MockTransport(handler)
+    async with client:
+        await client.get("/")
+        assert not client.cookies
+
+
+def test_netology_cookies_to_header() -> None:
+    cookies = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "aboba"})
+
+    assert cookies.to_header() == "_netology-on-rails_session=aboba"
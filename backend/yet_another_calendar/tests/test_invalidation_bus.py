@@ -0,0 +1,72 @@
+"""Tests for cross-worker invalidation bus."""
+import asyncio
+import json
+
+import pytest
+from redis.asyncio import ConnectionPool
+
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.invalidation_bus import InvalidationBus
+from yet_another_calendar.web.l1_cache import L1Cache
+
+
+def make_bus() -> InvalidationBus:
+    return InvalidationBus(L1Cache("prefix", {"calendar": 1024, "donor": 1024}, settings.l1_cache_time_live))
+
+
+async def wait_connected(*buses: InvalidationBus) -> None:
+    for _ in range(100):
+        if all(bus.connected for bus in buses):
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Bus isn't connected")
+
+
+@pytest.mark.asyncio
+async def test_other_workers_drop_published_keys(fake_redis_pool: ConnectionPool) -> None:
+    writer, reader = make_bus(), make_bus()
+    writer.start(fake_redis_pool)
+    reader.start(fake_redis_pool)
+    try:
+        await wait_connected(writer, reader)
+        for bus in (writer, reader):
+            bus.cache.namespaces["calendar"].set("prefix:calendar:key", b"old")
+            bus.cache.namespaces["donor"].set("prefix:donor:key", b"old")
+
+        await writer.publish("prefix:calendar:key")
+        await writer.publish(namespace="donor")
+        for _ in range(100):
+            if reader.cache.stats()["donor"].items == 0:
+                break
+            await asyncio.sleep(0.01)
+
+        assert reader.cache.namespaces["calendar"].get("prefix:calendar:key") is None
+        assert reader.cache.namespaces["donor"].get("prefix:donor:key") is None
+        assert writer.cache.namespaces["calendar"].get("prefix:calendar:key") is not None
+    finally:
+        await writer.stop()
+        await reader.stop()
+
+
+def test_short_time_live_while_disconnected() -> None:
+    bus = make_bus()
+    namespace = bus.cache.namespaces["calendar"]
+
+    bus.set_connected(True)
+    namespace.set("prefix:calendar:key", b"value")
+    bus.set_connected(False)
+
+    assert namespace.get("prefix:calendar:key") is None
+    assert namespace.time_live == settings.l1_cache_degraded_time_live
+    bus.set_connected(True)
+    assert namespace.time_live == settings.l1_cache_time_live
+
+
+def test_apply_ignores_own_and_malformed_messages() -> None:
+    bus = make_bus()
+    bus.cache.namespaces["calendar"].set("prefix:calendar:key", b"value")
+
+    bus.apply(json.dumps({"origin": bus.origin, "keys": ["prefix:calendar:key"]}))
+    bus.apply(b"not json")
+
+    assert bus.cache.namespaces["calendar"].get("prefix:calendar:key") is not None
@@ -0,0 +1,88 @@
+"""Tests for in-process L1 cache."""
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi_cache.backends.inmemory import InMemoryBackend
+
+from yet_another_calendar.web.l1_cache import L1Backend, L1Cache, L1Namespace
+
+
+def test_lru_eviction_by_size() -> None:
+    namespace = L1Namespace("test", max_bytes=30, time_live=60)
+
+    namespace.set("a", b"x" * 14)
+    namespace.set("b", b"x" * 14)
+    assert namespace.get("a") is not None
+    namespace.set("c", b"x" * 14)
+
+    assert namespace.get("b") is None
+    assert namespace.get("a") is not None
+    assert namespace.get("c") is not None
+    stats = namespace.stats()
+    assert stats.evictions == 1
+    assert stats.size_bytes == 30
+    assert (stats.hits, stats.misses) == (3, 1)
+
+
+def test_too_big_entry_is_not_kept() -> None:
+    namespace = L1Namespace("test", max_bytes=10, time_live=60)
+
+    namespace.set("a", b"x" * 20)
+
+    assert namespace.get("a") is None
+    assert namespace.size_bytes == 0
+
+
+def test_entry_expires() -> None:
+    namespace = L1Namespace("test", max_bytes=100, time_live=60)
+    with patch("yet_another_calendar.web.l1_cache.time.monotonic", return_value=100):
+        namespace.set("short", b"1", expire=5)
+        namespace.set("long", b"1")
+    with patch("yet_another_calendar.web.l1_cache.time.monotonic", return_value=110):
+        assert namespace.get("short") is None
+        assert namespace.get("long") == (50, b"1")
+
+
+@pytest.mark.asyncio
+async def test_backend_serves_hot_keys_from_memory() -> None:
+    redis_backend = InMemoryBackend()
+    redis_backend.get_with_ttl = AsyncMock(wraps=redis_backend.get_with_ttl)  # type: ignore
+    cache = L1Cache("prefix", {"calendar": 1024}, time_live=30)
+    backend = L1Backend(redis_backend, cache)
+    await redis_backend.set("prefix:calendar:key", b"value", 600)
+    await redis_backend.set("prefix:other:key", b"value", 600)
+
+    for _ in range(3):
+        _, value = await backend.get_with_ttl("prefix:calendar:key")
+        assert value == b"value"
+        await backend.get_with_ttl("prefix:other:key")
+
+    calls = [call.args[0] for call in redis_backend.get_with_ttl.await_args_list]
+    assert calls.count("prefix:calendar:key") == 1
+    assert calls.count("prefix:other:key") == 3
+    assert cache.stats()["calendar"].hits == 2
+
+
+@pytest.mark.asyncio
+async def test_backend_writes_through_and_clears() -> None:
+    cache = L1Cache("prefix", {"calendar": 1024}, time_live=30)
+    backend = L1Backend(InMemoryBackend(), cache)
+
+    await backend.set("prefix:calendar:key", b"new", 600)
+    assert cache.namespaces["calendar"].get("prefix:calendar:key") is not None
+
+    await backend.clear(key="prefix:calendar:key")
+    assert await backend.get("prefix:calendar:key") is None
+
+
+@pytest.mark.asyncio
+async def test_backend_clears_only_given_namespace() -> None:
+    cache = L1Cache("prefix", {"calendar": 1024, "other": 1024}, time_live=30)
+    backend = L1Backend(InMemoryBackend(), cache)
+    await backend.set("prefix:calendar:key", b"calendar", 600)
+    await backend.set("prefix:other:key", b"other", 600)
+
+    await backend.clear(namespace="prefix:calendar")
+
+    assert cache.namespaces["calendar"].get("prefix:calendar:key") is None
+    assert cache.namespaces["other"].get("prefix:other:key") is not None
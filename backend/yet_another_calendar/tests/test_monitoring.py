@@ -1,6 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
 
+from yet_another_calendar.web.api.auth.utils import create_access_token
 from yet_another_calendar.web.application import get_app
 
 
@@ -13,3 +14,26 @@ def client() -> TestClient:
 def test_health(client: TestClient) -> None:
     response = client.get("api/health/")
     assert response.status_code == 200
+
+
+def test_upstreams_health(client: TestClient) -> None:
+    token = create_access_token()
+    response = client.get("api/health/upstreams", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"modeus", "netology", "lms", "utmn"}
+    assert response.json()["lms"]["in_flight"] == 0
+
+
+def test_upstreams_health_requires_tutor(client: TestClient) -> None:
+    response = client.get("api/health/upstreams")
+    assert response.status_code == 403
+
+
+def test_cache_health(client: TestClient) -> None:
+    token = create_access_token()
+    response = client.get("api/health/cache", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"calendar", "donor", "utmn_teachers"}
+    assert "hits" in response.json()["calendar"]
@@ -0,0 +1,101 @@
+"""Tests for background prefetch."""
+import asyncio
+import datetime
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from redis.asyncio import ConnectionPool, Redis
+
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.bulkhead import bulkheads
+from yet_another_calendar.web.http_clients import Upstream
+from yet_another_calendar.web.prefetch import Prefetcher
+
+
+def test_get_weeks_starts_from_monday() -> None:
+    weeks = Prefetcher.get_weeks(datetime.date(2025, 3, 13))
+
+    assert weeks == [datetime.date(2025, 3, 10), datetime.date(2025, 3, 17)][:settings.prefetch_weeks]
+
+
+def test_is_off_peak_uses_prefetch_timezone() -> None:
+    prefetcher = Prefetcher()
+    # 01:00 UTC is 04:00 in Moscow
+    assert prefetcher.is_off_peak(datetime.datetime(2025, 3, 13, 1, tzinfo=datetime.UTC))
+    assert not prefetcher.is_off_peak(datetime.datetime(2025, 3, 13, 12, tzinfo=datetime.UTC))
+
+
+@pytest.mark.asyncio
+async def test_schedule_skips_queued_users(fake_redis_pool: ConnectionPool) -> None:
+    prefetcher = Prefetcher()
+    assert not prefetcher.schedule("person")
+
+    async def hang(_: str) -> None:
+        await asyncio.Event().wait()
+
+    prefetcher.start(fake_redis_pool)
+    try:
+        with patch.object(prefetcher, "prefetch", hang):
+            assert prefetcher.schedule("person")
+            assert prefetcher.schedule("other")
+            await asyncio.sleep(0)
+            assert not prefetcher.schedule("person")
+    finally:
+        await prefetcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_sweep_runs_once_per_day(fake_redis_pool: ConnectionPool) -> None:
+    prefetcher = Prefetcher()
+    prefetcher.start(fake_redis_pool)
+    other_worker = Prefetcher()
+    other_worker.start(fake_redis_pool)
+    async with Redis(connection_pool=fake_redis_pool) as redis:
+        await redis.zadd(Prefetcher.get_active_users_key(), {
+            "first": time.time(), "second": time.time(), "gone": time.time() - settings.redis_week_live - 1,
+        })
+    now = datetime.datetime(2025, 3, 13, 1, tzinfo=datetime.UTC)
+    try:
+        with patch.object(Prefetcher, "prefetch", AsyncMock()) as prefetch:
+            assert await prefetcher.sweep(now) == 2
+            assert await other_worker.sweep(now) == 0
+            assert await prefetcher.sweep(now + datetime.timedelta(hours=1)) == 0
+            await prefetcher._queue.join()
+
+        assert sorted(call.args[0] for call in prefetch.await_args_list) == ["first", "second"]
+        assert await prefetcher.sweep(now + datetime.timedelta(days=1)) == 2
+    finally:
+        await prefetcher.stop()
+        await other_worker.stop()
+
+
+@pytest.mark.asyncio
+async def test_prefetch_runs_jobs_for_each_week() -> None:
+    prefetcher = Prefetcher()
+    job = AsyncMock(side_effect=[ValueError("upstream is down"), None])
+    prefetcher.register()(job)
+
+    with patch("yet_another_calendar.web.prefetch.settings.prefetch_weeks", 2):
+        await prefetcher.prefetch("person")
+
+    weeks = [call.args[1] for call in job.await_args_list]
+    assert len(weeks) == 2
+    assert weeks[1] - weeks[0] == datetime.timedelta(weeks=1)
+
+
+@pytest.mark.asyncio
+async def test_wait_for_yields_to_interactive_requests() -> None:
+    prefetcher = Prefetcher()
+    bulkhead = bulkheads[Upstream.MODEUS]
+
+    with patch("yet_another_calendar.web.prefetch.settings.prefetch_upstream_interval", 0.01):
+        await asyncio.wait_for(prefetcher.wait_for(Upstream.MODEUS), 1)
+        bulkhead.in_flight = settings.prefetch_max_in_flight
+        try:
+            waiter = asyncio.create_task(prefetcher.wait_for(Upstream.MODEUS))
+            await asyncio.sleep(0.05)
+            assert not waiter.done()
+        finally:
+            bulkhead.in_flight = 0
+        await asyncio.wait_for(waiter, 1)
@@ -0,0 +1,119 @@
+"""Tests for retry policies."""
+import httpx
+import pytest
+
+from yet_another_calendar.web.retry import RetryBudget, RetryPolicy, is_idempotent
+
+
+def make_policy(**kwargs) -> RetryPolicy:
+    return RetryPolicy("test", **{"tries": 5, "base_delay": 0, "max_delay": 0, "max_elapsed": 10, **kwargs})
+
+
+class FlakyCall:
+    def __init__(self, errors: list[Exception]) -> None:
+        self.errors = errors
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_is_idempotent() -> None:
+    assert is_idempotent("get")
+    assert is_idempotent("PUT")
+    assert not is_idempotent("POST")
+
+
+def test_backoff_is_jittered_and_capped() -> None:
+    policy = make_policy(base_delay=1, max_delay=4)
+    for attempt in range(1, 10):
+        delay = policy.backoff(attempt)
+        assert 0 <= delay <= min(4, 2 ** (attempt - 1))
+
+
+@pytest.mark.asyncio
+async def test_retries_transport_errors() -> None:
+    call = FlakyCall([httpx.ReadTimeout("timeout"), httpx.ReadError("error")])
+
+    assert await make_policy().run(call, idempotent=True) == "ok"
+    assert call.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_tries() -> None:
+    call = FlakyCall([httpx.ReadError("error")] * 5)
+
+    with pytest.raises(httpx.ReadError):
+        await make_policy(tries=3).run(call, idempotent=True)
+    assert call.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_other_errors() -> None:
+    call = FlakyCall([ValueError("bad")])
+
+    with pytest.raises(ValueError):
+        await make_policy().run(call)
+    assert call.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_non_idempotent_retries_only_unsent_requests() -> None:
+    read_error = FlakyCall([httpx.ReadError("error")])
+    with pytest.raises(httpx.ReadError):
+        await make_policy().run(read_error, idempotent=False)
+    assert read_error.calls == 1
+
+    connect_error = FlakyCall([httpx.ConnectError("error")])
+    assert await make_policy().run(connect_error, idempotent=False) == "ok"
+    assert connect_error.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_sent_requests_are_not_retried_by_default() -> None:
+    call = FlakyCall([httpx.ReadTimeout("timeout")])
+
+    with pytest.raises(httpx.ReadTimeout):
+        await make_policy().run(call)
+    assert call.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_respects_max_elapsed() -> None:
+    call = FlakyCall([httpx.ReadError("error")] * 5)
+
+    with pytest.raises(httpx.ReadError):
+        await make_policy(base_delay=1, max_delay=1, max_elapsed=0).run(call, idempotent=True)
+    assert call.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_budget_limits_retries() -> None:
+    budget = RetryBudget(ratio=0.5, max_tokens=1)
+    policy = make_policy(budget=budget)
+
+    call = FlakyCall([httpx.ReadError("error")] * 5)
+    with pytest.raises(httpx.ReadError):
+        await policy.run(call, idempotent=True)
+    assert call.calls == 2
+
+    call = FlakyCall([httpx.ReadError("error")])
+    with pytest.raises(httpx.ReadError):
+        await policy.run(call, idempotent=True)
+    assert call.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_decorator_and_options() -> None:
+    policy = make_policy(tries=1)
+    call = FlakyCall([httpx.ReadError("error")])
+
+    @policy.options(tries=2).retry(idempotent=True)
+    async def decorated() -> str:
+        return await call()
+
+    assert await decorated() == "ok"
+    assert call.calls == 2
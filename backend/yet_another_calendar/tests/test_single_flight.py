@@ -0,0 +1,100 @@
+"""Tests for single-flight request coalescing."""
+import asyncio
+import inspect
+
+import pytest
+from redis.asyncio import ConnectionPool
+
+from yet_another_calendar.web.api.netology import schema as netology_schema
+from yet_another_calendar.web.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_coalesced() -> None:
+    calls = 0
+
+    @SingleFlight("test")
+    async def fetch(program_id: int) -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return program_id * 2
+
+    results = await asyncio.gather(fetch(1), fetch(program_id=1), fetch(2))
+
+    assert results == [2, 2, 4]
+    assert calls == 2
+    assert await fetch(1) == 2
+    assert calls == 3
+
+
+@pytest.mark.asyncio
+async def test_key_depends_on_model_values() -> None:
+    flight = SingleFlight("test")
+
+    async def fetch(cookies: netology_schema.NetologyCookies) -> None:
+        """Signature only."""
+
+    signature = inspect.signature(fetch)
+    first = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "a"})
+    same = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "a"})
+    other = netology_schema.NetologyCookies.model_validate({"_netology-on-rails_session": "b"})
+
+    assert flight.make_key(signature, first) == flight.make_key(signature, same)
+    assert flight.make_key(signature, first) != flight.make_key(signature, other)
+
+
+@pytest.mark.asyncio
+async def test_error_is_shared_and_not_cached() -> None:
+    calls = 0
+
+    @SingleFlight("test")
+    async def fetch() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(fetch(), fetch(), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert calls == 1
+    with pytest.raises(ValueError):
+        await fetch()
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others() -> None:
+    @SingleFlight("test")
+    async def fetch() -> int:
+        await asyncio.sleep(0.02)
+        return 1
+
+    first = asyncio.create_task(fetch())
+    second = asyncio.create_task(fetch())
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == 1
+
+
+@pytest.mark.asyncio
+async def test_calls_are_coalesced_between_workers(fake_redis_pool: ConnectionPool) -> None:
+    calls = 0
+
+    async def fetch() -> dict[str, int]:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"a": 1}
+
+    first_worker = SingleFlight("test", result_type=dict[str, int])
+    second_worker = SingleFlight("test", result_type=dict[str, int])
+    for worker in (first_worker, second_worker):
+        worker.redis_pool = fake_redis_pool
+
+    results = await asyncio.gather(first_worker(fetch)(), second_worker(fetch)())
+
+    assert results == [{"a": 1}, {"a": 1}]
+    assert calls == 1
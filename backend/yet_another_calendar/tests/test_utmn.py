@@ -8,6 +8,7 @@ from collections.abc import Generator
 from yet_another_calendar.settings import settings
 from yet_another_calendar.web.api.utmn import integration, schema
 from yet_another_calendar.tests import handlers
+from yet_another_calendar.web.http_clients import Upstream, http_clients
 
 
 from fastapi_cache import FastAPICache
@@ -28,7 +29,7 @@ async def utmn_client():
         base_url=settings.utmn_base_url,
         transport=handlers.utmn_transport,
     ) as client:
-        with patch("yet_another_calendar.web.api.utmn.integration.AsyncClient.__aenter__", return_value=client):
+        with patch.dict(http_clients.clients, {Upstream.UTMN: client}):
             yield client
 
 @pytest.fixture  
@@ -39,7 +40,7 @@ async def utmn_bad_client():
         base_url=settings.utmn_base_url,
         transport=handlers.bad_request_transport,
     ) as client:
-        with patch("yet_another_calendar.web.api.utmn.integration.AsyncClient.__aenter__", return_value=client):
+        with patch.dict(http_clients.clients, {Upstream.UTMN: client}):
             yield client
 
 @pytest.mark.asyncio
@@ -0,0 +1,66 @@
+"""Tests for buffered Redis writes."""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from yet_another_calendar.web.write_buffer import WriteBuffer
+
+
+async def get_counter(redis_pool: ConnectionPool) -> int:
+    async with Redis(connection_pool=redis_pool) as redis:
+        return int(await redis.get("counter") or 0)
+
+
+@pytest.mark.asyncio
+async def test_writes_are_flushed_by_size_and_interval(fake_redis_pool: ConnectionPool) -> None:
+    buffer = WriteBuffer()
+    with patch("yet_another_calendar.web.write_buffer.settings.write_buffer_flush_interval", 0.05), \
+            patch("yet_another_calendar.web.write_buffer.settings.write_buffer_flush_size", 3):
+        buffer.start(fake_redis_pool)
+        try:
+            buffer.add(("INCR", "counter"), ("INCR", "counter"))
+            await asyncio.sleep(0)
+            assert await get_counter(fake_redis_pool) == 0
+
+            buffer.add(("INCR", "counter"))
+            await asyncio.sleep(0.01)
+            assert await get_counter(fake_redis_pool) == 3
+
+            buffer.add(("INCR", "counter"))
+            await asyncio.sleep(0.1)
+            assert await get_counter(fake_redis_pool) == 4
+        finally:
+            await buffer.stop()
+
+
+@pytest.mark.asyncio
+async def test_writes_are_flushed_on_stop(fake_redis_pool: ConnectionPool) -> None:
+    buffer = WriteBuffer()
+    buffer.add(("INCR", "counter"))
+    buffer.start(fake_redis_pool)
+    buffer.add(("INCR", "counter"), ("SET", "key", "value"), ("INCR", "key"))
+
+    await buffer.stop()
+    buffer.add(("INCR", "counter"))
+
+    assert await get_counter(fake_redis_pool) == 1
+    assert await buffer.flush() == 0
+
+
+@pytest.mark.asyncio
+async def test_writes_are_dropped_when_full_or_failed(fake_redis_pool: ConnectionPool) -> None:
+    buffer = WriteBuffer()
+    buffer.redis_pool = fake_redis_pool
+    with patch("yet_another_calendar.web.write_buffer.settings.write_buffer_max_size", 2):
+        buffer.add(("INCR", "counter"), ("INCR", "counter"))
+        buffer.add(("INCR", "counter"))
+    assert buffer.dropped == 1
+
+    with patch.object(Redis, "pipeline", side_effect=RedisConnectionError("down")):
+        assert await buffer.flush() == 0
+    assert buffer.dropped == 3
+    assert await buffer.flush() == 0
+    assert await get_counter(fake_redis_pool) == 0
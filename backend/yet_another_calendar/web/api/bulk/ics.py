@@ -0,0 +1,92 @@
+"""
+Incremental iCalendar (RFC 5545) writer.
+
+Output matches what icalendar library produced for the same events,
+but each VEVENT is written straight from values, without component tree.
+"""
+import datetime
+import functools
+import re
+from typing import Any
+
+from icalendar.timezone.tzid import tzid_from_tzinfo
+
+LINE_LIMIT = 75
+CRLF = "\r\n"
+QUOTABLE = re.compile("[,;:\u2019]")
+
+
+def escape_text(text: str) -> str:
+    """Escape TEXT value, order of replacements matters."""
+    return (
+        text.replace(r"\N", "\n")
+        .replace("\\", "\\\\")
+        .replace(";", r"\;")
+        .replace(",", r"\,")
+        .replace("\r\n", r"\n")
+        .replace("\n", r"\n")
+    )
+
+
+def fold_line(line: str) -> str:
+    """Split line longer than 75 octets, continuation lines start with a space."""
+    if line.isascii():
+        return f"{CRLF} ".join(line[i:i + LINE_LIMIT - 1] for i in range(0, len(line), LINE_LIMIT - 1))
+    chars = []
+    size = 0
+    for char in line:
+        char_size = len(char.encode())
+        size += char_size
+        if size >= LINE_LIMIT:
+            chars.append(f"{CRLF} ")
+            size = char_size
+        chars.append(char)
+    return "".join(chars)
+
+
+@functools.lru_cache(maxsize=64)
+def _get_tzid(tzinfo: datetime.tzinfo | None, tzname: str | None) -> str | None:
+    return tzid_from_tzinfo(tzinfo) or tzname
+
+
+def format_datetime(name: str, value: datetime.datetime) -> str:
+    """Property line with local time and TZID, or UTC time with Z suffix."""
+    tzid = _get_tzid(value.tzinfo, value.tzname())
+    local = f"{value.year:04}{value.month:02}{value.day:02}T{value.hour:02}{value.minute:02}{value.second:02}"
+    if tzid == "UTC":
+        return f"{name}:{local}Z"
+    if tzid:
+        parameter = f'"{tzid}"' if QUOTABLE.search(tzid) else tzid
+        return f"{name};TZID={parameter}:{local}"
+    return f"{name}:{local}"
+
+
+def format_text(name: str, value: Any) -> str:
+    return f"{name}:{escape_text(str(value))}"
+
+
+def write_header(prodid: str) -> bytes:
+    return f"BEGIN:VCALENDAR{CRLF}VERSION:2.0{CRLF}PRODID:{escape_text(prodid)}{CRLF}".encode()
+
+
+def write_footer() -> bytes:
+    return f"END:VCALENDAR{CRLF}".encode()
+
+
+def write_event(
+        title: str, starts_at: datetime.datetime, ends_at: datetime.datetime, lesson_id: Any,
+        dt_stamp: datetime.datetime, description: str | None = None, url: str | None = None,
+) -> bytes:
+    """One VEVENT with the same properties and order as icalendar event export had."""
+    lines = (
+        "BEGIN:VEVENT",
+        format_text("SUMMARY", title),
+        format_datetime("DTSTART", starts_at),
+        format_datetime("DTEND", ends_at),
+        format_datetime("DTSTAMP", dt_stamp.astimezone(datetime.UTC)),
+        format_text("UID", lesson_id),
+        format_text("DESCRIPTION", description),
+        format_text("LOCATION", url if url else "unknown location"),
+        "END:VEVENT",
+    )
+    return "".join(f"{fold_line(line)}{CRLF}" for line in lines).encode()
@@ -1,120 +1,272 @@
 import asyncio
 import datetime
-from collections.abc import Iterable
+import hashlib
+import math
+import secrets
+import struct
+import zlib
+from collections.abc import AsyncIterator, Awaitable, Callable, Collection, Iterator
 from typing import Any
 
-import icalendar
+import httpx
 from fastapi import HTTPException
 from fastapi_cache import FastAPICache
-from fastapi_cache.decorator import cache
 from starlette import status
 from pydantic import ValidationError
 from loguru import logger
 from redis.asyncio import ConnectionPool, Redis
 
 from yet_another_calendar.settings import settings
-from . import schema
+from . import ics, schema
 from ..lms import schema as lms_schema
 from ..lms import views as lms_views
+from ..modeus import integration as modeus_integration
 from ..modeus import schema as modeus_schema
 from ..modeus import views as modeus_views
 from ..netology import schema as netology_schema
 from ..netology import views as netology_views
-from ...cache_builder import key_builder
+from ...cache_builder import key_builder, key_index
+from ...cache_coder import CompactCoder, get_calendar_coder
+from ...cache_layers import bypass_cache_layers
+from ...invalidation_bus import invalidation_bus
+from ...http_clients import Upstream
+from ...l1_cache import L1Namespace
+from ...prefetch import prefetcher
+from ...write_buffer import RedisCommand, write_buffer
 
+projections = L1Namespace("projection", settings.projection_cache_max_bytes, settings.projection_cache_time_live)
+PROJECTION_HEADER = struct.Struct("!dd34s")
 
-async def count_keys_by_prefix(redis_pool: ConnectionPool, prefix: str = settings.redis_week_metrix_prefix) -> int:
-    """
-    Count Redis keys matching a given prefix pattern.
 
-    Uses scan_iter which is production-safe (non-blocking).
-    Similar to CLI: redis-cli KEYS "prefix*" | wc -l
+METRIX_WINDOWS = {"daily_users": 1, "weekly_users": 7, "monthly_users": 30}
 
-    :param redis_pool: Redis connection pool
-    :param prefix: Key prefix pattern (e.g., "calendar:*", "user:*")
-    :return: Number of keys matching the prefix
-    """
-    async with Redis(connection_pool=redis_pool) as redis:
-        count = 0
-        async for _ in redis.scan_iter(match=f"{prefix}*", count=1000):
-            count += 1
-        logger.debug(f"Found {count} keys matching prefix '{prefix}'")
-        return count
 
-async def save_user_was_there(
-    redis_pool: ConnectionPool, user_id: str,
-    prefix: str = settings.redis_week_metrix_prefix) -> None:
-    """
-    Mark that a user accessed the calendar by storing their ID in Redis.
+def get_metrix_key(day: datetime.date, source: schema.ActivitySource | None = None) -> str:
+    key = f"{settings.redis_prefix}:{settings.redis_metrix_prefix}:{day.isoformat()}"
+    return f"{key}:{source.value}" if source is not None else key
 
-    Creates a temporary key-value pair with automatic expiration to track
-    user visits. The key uses the user_id as name and stores a boolean True value.
 
-    This is useful for:
-    - Tracking unique visitors over a time period
-    - Monitoring user activity
-    - Analytics and usage statistics
+def save_user_was_there(user_id: str, source: schema.ActivitySource) -> None:
+    """
+    Count user as active today, in total and for source.
 
-    The key automatically expires after redis_events_time_live (14 days by default),
-    so it acts as a sliding window for recent user activity.
+    Users are added into daily HyperLogLogs, so memory doesn't grow with number of users
+    and any window of days is counted by one PFCOUNT. User is also kept in sorted set
+    of this week active users for prefetch. Writes are buffered, request doesn't wait for Redis.
 
-    :param redis_pool: Redis connection pool from get_redis_pool dependency
     :param user_id: Unique identifier for the user (e.g., email, person_id, etc.)
-    :return: None
+    :param source: endpoint user got calendar with
     """
-    async with Redis(connection_pool=redis_pool) as redis:
-        await redis.set(name=f"{prefix}:{user_id}", value=0, ex=settings.redis_week_live)
+    now = schema.now_dt_utc()
+    active_users_key = prefetcher.get_active_users_key()
+    commands: list[RedisCommand] = []
+    for key in (get_metrix_key(now.date()), get_metrix_key(now.date(), source)):
+        commands += [("PFADD", key, user_id), ("EXPIRE", key, settings.redis_metrix_time_live)]
+    write_buffer.add(
+        *commands,
+        ("ZADD", active_users_key, now.timestamp(), user_id),
+        ("ZREMRANGEBYSCORE", active_users_key, "-inf", now.timestamp() - settings.redis_week_live),
+        ("EXPIRE", active_users_key, settings.redis_week_live),
+    )
 
 
-def create_ics_event(title: str, starts_at: datetime.datetime, ends_at: datetime.datetime,
-                     lesson_id: Any, description: str | None = None,
-                     url: str | None = None) -> icalendar.Event:
-    event = icalendar.Event()
-    dt_now = datetime.datetime.now()
-    event.add('summary', title)
-    event.add('location', url if url else 'unknown location')
-    event.add('dtstart', starts_at)
-    event.add('dtend', ends_at)
-    event.add('dtstamp', dt_now)
-    event.add('uid', lesson_id)
-    event.add('DESCRIPTION', description)
-    return event
+async def get_user_metrix(redis_pool: ConnectionPool, today: datetime.date) -> schema.UserMetrix:
+    """Unique users for each window, in total and by source, counted in one round trip."""
+    sources: list[schema.ActivitySource | None] = [None, *schema.ActivitySource]
+    async with Redis(connection_pool=redis_pool) as redis:
+        async with redis.pipeline(transaction=False) as pipe:
+            for source in sources:
+                for days in METRIX_WINDOWS.values():
+                    keys = [get_metrix_key(today - datetime.timedelta(days=day), source) for day in range(days)]
+                    pipe.pfcount(*keys)
+            counts = iter(await pipe.execute())
+
+    def read_counts() -> schema.UsersCount:
+        return schema.UsersCount(**{window: next(counts) for window in METRIX_WINDOWS})
 
+    total = read_counts()
+    return schema.UserMetrix(
+        **total.model_dump(), sources={source: read_counts() for source in schema.ActivitySource},
+    )
 
-def export_to_ics(calendar: schema.CalendarResponse) -> Iterable[bytes]:
-    ics_calendar = icalendar.Calendar()
-    ics_calendar.add('version', '2.0')
-    ics_calendar.add('prodid', 'yet_another_calendar')
 
+def export_to_ics(calendar: schema.CalendarResponse) -> Iterator[bytes]:
+    """Header, then one chunk per event, then footer, so memory doesn't grow with calendar size."""
+    dt_stamp = datetime.datetime.now(tz=datetime.UTC)
+    yield ics.write_header("yet_another_calendar")
     for netology_lesson in calendar.netology.webinars:
         if not netology_lesson.starts_at or not netology_lesson.ends_at:
             continue
-        event = create_ics_event(title=f"Netology: {netology_lesson.block_title}", starts_at=netology_lesson.starts_at,
-                                 ends_at=netology_lesson.ends_at, lesson_id=netology_lesson.id,
-                                 description=netology_lesson.title,
-                                 url=netology_lesson.webinar_url)
-        ics_calendar.add_component(event)
+        yield ics.write_event(title=f"Netology: {netology_lesson.block_title}", starts_at=netology_lesson.starts_at,
+                              ends_at=netology_lesson.ends_at, lesson_id=netology_lesson.id, dt_stamp=dt_stamp,
+                              description=netology_lesson.title, url=netology_lesson.webinar_url)
     for netology_homework in calendar.netology.homework:
         if not netology_homework.deadline:
             continue
         dt_end = netology_homework.deadline + datetime.timedelta(hours=18)
         dt_start = dt_end - datetime.timedelta(hours=2)
-        event = create_ics_event(title=f"Netology ДЗ: {netology_homework.block_title}", starts_at=dt_start,
-                                 ends_at=dt_end, lesson_id=netology_homework.id,
-                                 description=netology_homework.title,
-                                 url=netology_homework.url)
-        ics_calendar.add_component(event)
+        yield ics.write_event(title=f"Netology ДЗ: {netology_homework.block_title}", starts_at=dt_start,
+                              ends_at=dt_end, lesson_id=netology_homework.id, dt_stamp=dt_stamp,
+                              description=netology_homework.title, url=netology_homework.url)
     for modeus_lesson in calendar.utmn.modeus_events:
-        event = create_ics_event(title=f"Modeus: {modeus_lesson.course_name}", starts_at=modeus_lesson.start_time,
-                                 ends_at=modeus_lesson.end_time, lesson_id=modeus_lesson.id,
-                                 description=modeus_lesson.name, url=modeus_lesson.mts_url)
-        ics_calendar.add_component(event)
+        yield ics.write_event(title=f"Modeus: {modeus_lesson.course_name}", starts_at=modeus_lesson.start_time,
+                              ends_at=modeus_lesson.end_time, lesson_id=modeus_lesson.id, dt_stamp=dt_stamp,
+                              description=modeus_lesson.name, url=modeus_lesson.mts_url)
     for lms_event in calendar.utmn.lms_events:
         dt_start = lms_event.dt_end - datetime.timedelta(hours=2)
-        event = create_ics_event(title=f"LMS: {lms_event.course_name}", starts_at=dt_start, ends_at=lms_event.dt_end,
-                                 lesson_id=lms_event.id, description=lms_event.name, url=lms_event.url)
-        ics_calendar.add_component(event)
-    yield ics_calendar.to_ical()
+        yield ics.write_event(title=f"LMS: {lms_event.course_name}", starts_at=dt_start, ends_at=lms_event.dt_end,
+                              lesson_id=lms_event.id, dt_stamp=dt_stamp, description=lms_event.name, url=lms_event.url)
+    yield ics.write_footer()
+
+
+def get_calendar_cache_key(body: modeus_schema.ModeusTimeBody, calendar_id: int, person_id: str) -> str:
+    """Same key as `get_cached_calendar` uses."""
+    cache_key = key_builder(get_cached_calendar, args=(body, calendar_id, person_id), kwargs={})
+    return f"{settings.redis_prefix}:{settings.redis_lesson_prefix}{cache_key}"
+
+
+def get_calendar_digests_key(body: modeus_schema.ModeusTimeBody, calendar_id: int, person_id: str) -> str:
+    return f"{get_calendar_cache_key(body, calendar_id, person_id)}:{settings.redis_digests_prefix}"
+
+
+async def save_cached_calendar(
+        body: modeus_schema.ModeusTimeBody,
+        calendar_id: int,
+        person_id: str,
+        calendar: schema.CalendarResponse,
+        digests: schema.CalendarDigests | None = None,
+        stats: schema.RefreshStats | None = None,
+) -> None:
+    """
+    Save calendar and its digests, pass digests and refresh stats if they are already known.
+
+    Calendar keeps time when its first source gets due, so it isn't revalidated before.
+    """
+    coder = get_calendar_coder()
+    backend = FastAPICache.get_backend()
+    key = get_calendar_cache_key(body, calendar_id, person_id)
+    digests_key = get_calendar_digests_key(body, calendar_id, person_id)
+    digests = digests or calendar.get_digests()
+    stats = stats or await read_refresh_stats(calendar_id, person_id)
+    calendar.refresh_at = stats.get_refresh_at(digests)
+    await backend.set(
+        key=key,
+        value=coder.encode(calendar),
+        expire=settings.redis_events_time_live)
+    await backend.set(
+        key=digests_key,
+        value=digests.model_dump_json().encode(),
+        expire=settings.redis_events_time_live)
+    await key_index.add(person_id, key, digests_key)
+    await invalidation_bus.publish(key, digests_key)
+
+
+def decode_calendar(cached: bytes) -> schema.CalendarResponse:
+    """Own compact entries are parsed and validated in one pass by pydantic-core, without dicts in between."""
+    raw = CompactCoder.decode_raw(cached)
+    if raw is not None:
+        return schema.CalendarResponse.model_validate_json(raw)
+    return schema.CalendarResponse.model_validate(get_calendar_coder().decode(cached))
+
+
+async def drop_cached_calendars(person_id: str) -> int:
+    """Delete cached calendars and upstream entries of person, returns number of deleted keys."""
+    return await key_index.invalidate(person_id)
+
+
+async def read_cached_calendar(
+        body: modeus_schema.ModeusTimeBody,
+        calendar_id: int,
+        person_id: str,
+) -> schema.CalendarResponse | None:
+    """Get calendar from cache without fetching it on miss."""
+    try:
+        cached = await FastAPICache.get_backend().get(get_calendar_cache_key(body, calendar_id, person_id))
+    except Exception as exception:
+        logger.error(f"Got redis {exception}")
+        return None
+    if cached is None:
+        return None
+    try:
+        return decode_calendar(cached)
+    except (ValidationError, ValueError, zlib.error):
+        logger.exception(f"Can't decode cached calendar: {cached[:100]!r}")
+        return None
+
+
+def project_calendar(calendar: schema.CalendarResponse, timezone: datetime.tzinfo) -> schema.CalendarProjection:
+    """
+    Serialize calendar in timezone, calendar is changed in place.
+
+    Age changes while projection is kept, so it isn't serialized and is sent per response.
+    """
+    schema.change_netology_timezone(calendar.netology, timezone)
+    schema.change_modeus_timezone(calendar.utmn.modeus_events, timezone)
+    schema.change_lms_timezone(calendar.utmn.lms_events, timezone)
+    payload = calendar.model_dump_json(by_alias=True, exclude={"age"}).encode()
+    return schema.CalendarProjection(calendar.cached_at, calendar.refresh_at, calendar.get_etag(timezone), payload)
+
+
+async def read_calendar_projection(
+        body: modeus_schema.ModeusTimeBody,
+        calendar_id: int,
+        person_id: str,
+        timezone: datetime.tzinfo,
+) -> schema.CalendarProjection | None:
+    """
+    Cached calendar serialized in timezone, None on cache miss.
+
+    Projections are kept per process by digest of cached entry, so repeated hits
+    in the same timezone don't decode or walk events at all.
+    """
+    try:
+        cached = await FastAPICache.get_backend().get(get_calendar_cache_key(body, calendar_id, person_id))
+    except Exception as exception:
+        logger.error(f"Got redis {exception}")
+        return None
+    if cached is None:
+        return None
+    projection_key = f"{hashlib.blake2b(cached, digest_size=16).hexdigest()}:{timezone}"
+    entry = projections.get(projection_key)
+    if entry is not None:
+        timestamp, refresh_timestamp, etag = PROJECTION_HEADER.unpack_from(entry[1])
+        cached_at = datetime.datetime.fromtimestamp(timestamp, tz=datetime.UTC)
+        # NaN stands for calendar saved without refresh time
+        refresh_at = (datetime.datetime.fromtimestamp(refresh_timestamp, tz=datetime.UTC)
+                      if not math.isnan(refresh_timestamp) else None)
+        return schema.CalendarProjection(cached_at, refresh_at, etag.decode(), entry[1][PROJECTION_HEADER.size:])
+    try:
+        projection = project_calendar(decode_calendar(cached), timezone)
+    except (ValidationError, ValueError, zlib.error):
+        logger.exception(f"Can't decode cached calendar: {cached[:100]!r}")
+        return None
+    header = PROJECTION_HEADER.pack(
+        projection.cached_at.timestamp(),
+        projection.refresh_at.timestamp() if projection.refresh_at is not None else math.nan,
+        projection.etag.encode(),
+    )
+    projections.set(projection_key, header + projection.payload)
+    return projection
+
+
+async def read_cached_digests(
+        body: modeus_schema.ModeusTimeBody,
+        calendar_id: int,
+        person_id: str,
+) -> schema.CalendarDigests | None:
+    """Digests of cached calendar, computed from calendar itself for entries saved without them."""
+    try:
+        cached = await FastAPICache.get_backend().get(get_calendar_digests_key(body, calendar_id, person_id))
+    except Exception as exception:
+        logger.error(f"Got redis {exception}")
+        return None
+    if cached is not None:
+        try:
+            return schema.CalendarDigests.model_validate_json(cached)
+        except ValidationError:
+            logger.exception(f"Can't decode cached digests: {cached[:100]!r}")
+    cached_calendar = await read_cached_calendar(body, calendar_id, person_id)
+    return cached_calendar.get_digests() if cached_calendar is not None else None
 
 
 async def refresh_events(
@@ -126,32 +278,27 @@ async def refresh_events(
         modeus_jwt_token: str,
         person_id: str,
 ) -> schema.RefreshedCalendarResponse:
-    """Clear events cache."""
-    cached_json = await get_cached_calendar(body, calendar_id, person_id,
-                                            lms_user=lms_user, cookies=cookies, modeus_jwt_token=modeus_jwt_token)
-    try:
-        cached_calendar = schema.CalendarResponse.model_validate(cached_json)
-    except ValidationError:
-        cached_calendar = None
-        logger.exception(f"Got validation error: {cached_json}")
-    calendar = await get_calendar(body, calendar_id, person_id,
-                                  lms_user=lms_user, cookies=cookies, modeus_jwt_token=modeus_jwt_token)
-    changed = cached_calendar.get_hash() != calendar.get_hash() if cached_calendar else True
+    """
+    Fetch all sources once, bypassing cache layers, and overwrite cached calendar.
+
+    Returns changed event ids, compared by digests stored with cached calendar.
+    """
+    cached_digests = await read_cached_digests(body, calendar_id, person_id)
+    with bypass_cache_layers():
+        calendar = await get_calendar(body, calendar_id, person_id,
+                                      lms_user=lms_user, cookies=cookies, modeus_jwt_token=modeus_jwt_token)
+    digests = calendar.get_digests()
+    delta = digests.get_delta(cached_digests)
+    changed = cached_digests is None or any(not source_delta.is_empty() for source_delta in delta.values())
+    stats = await record_refresh(calendar_id, person_id, delta) if cached_digests is not None else None
     try:
-        cache_key = key_builder(
-            get_cached_calendar, args=(body, calendar_id, person_id), kwargs={},
-        )
-        coder = FastAPICache.get_coder()
-        backend = FastAPICache.get_backend()
-        await backend.set(
-            key=f"{settings.redis_prefix}:{settings.redis_lesson_prefix}{cache_key}",
-            value=coder.encode(calendar),
-            expire=settings.redis_events_time_live)
+        if calendar.is_complete():
+            await save_cached_calendar(body, calendar_id, person_id, calendar, digests, stats)
     except Exception as exception:
         logger.error(f"Got redis {exception}")
         raise HTTPException(detail="Can't refresh redis", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR) from None
     return schema.RefreshedCalendarResponse(
-        **{**calendar.model_dump(by_alias=True), "changed": changed},
+        **{**calendar.model_dump(by_alias=True), "changed": changed, "delta": delta},
     ).change_timezone(timezone)
 
 
@@ -162,29 +309,53 @@ async def get_calendar(
         lms_user: lms_schema.User,
         cookies: netology_schema.NetologyCookies,
         modeus_jwt_token: str,
+        cached_calendar: schema.CalendarResponse | None = None,
+        fetched: Collection[schema.CalendarSource] = tuple(schema.CalendarSource),
 ) -> schema.CalendarResponse:
+    """
+    Fetch sources concurrently, each within its deadline.
+
+    Failed or late source is replaced by its cached section (stale) or an empty one (failed).
+    Sources which aren't in `fetched` are taken from `cached_calendar` as they are.
+    """
     full_body = modeus_schema.ModeusEventsBody.model_validate(
         {**body.create_dump_date(), 'attendeePersonId': [person_id]},
     )
-    async with asyncio.TaskGroup() as tg:
-        netology_response = tg.create_task(netology_views.get_calendar(body, calendar_id, cookies))
-        modeus_response = tg.create_task(modeus_views.get_calendar(full_body, modeus_jwt_token, person_id))
-        lms_response = tg.create_task(lms_views.get_events(lms_user, full_body))
-    lms_events = lms_response.result() if lms_response else []
-    return schema.CalendarResponse.model_validate(
-        {"netology": netology_response.result(), "utmn": {
-            "modeus_events": modeus_response.result(),
-            "lms_events": lms_events,
-        }},
-    )
+    fetchers: dict[schema.CalendarSource, Callable[[], Awaitable[Any]]] = {
+        schema.CalendarSource.NETOLOGY: lambda: netology_views.get_calendar(body, calendar_id, cookies),
+        schema.CalendarSource.MODEUS: lambda: modeus_views.get_calendar(full_body, modeus_jwt_token, person_id),
+        schema.CalendarSource.LMS: lambda: lms_views.get_events(lms_user, full_body),
+    }
+    if cached_calendar is None:
+        fetched = tuple(schema.CalendarSource)
+    results = await asyncio.gather(*(_fetch_section(source, fetchers[source]()) for source in fetched))
+    sections: dict[schema.CalendarSource, Any] = {}
+    sources = schema.all_fresh()
+    if cached_calendar is not None:
+        for source in schema.CalendarSource:
+            if source not in fetched:
+                sections[source] = cached_calendar.get_section(source)
+                sources[source] = cached_calendar.sources[source]
+    failed = []
+    for source, data, exception in results:
+        if exception is None:
+            sections[source] = data
+            continue
+        if not is_degradable(exception):
+            raise exception
+        logger.error(f"Can't get {source.value} events: {exception!r}")
+        failed.append(source)
+    if failed:
+        cached_calendar = cached_calendar or await read_cached_calendar(body, calendar_id, person_id)
+        for source in failed:
+            if cached_calendar is not None and cached_calendar.sources[source] == schema.SourceStatus.FRESH:
+                sections[source] = cached_calendar.get_section(source)
+                sources[source] = schema.SourceStatus.STALE
+            else:
+                sources[source] = schema.SourceStatus.FAILED
+    return schema.CalendarResponse.from_sections(sections, sources)
 
 
-# noinspection PyTypeChecker
-@cache(
-    expire=settings.redis_events_time_live,
-    key_builder=key_builder,
-    namespace=settings.redis_lesson_prefix,
-)  # type i
 async def get_cached_calendar(
         body: modeus_schema.ModeusTimeBody,
         calendar_id: int,
@@ -194,6 +365,440 @@ async def get_cached_calendar(
         cookies: netology_schema.NetologyCookies,
         modeus_jwt_token: str,
 ) -> schema.CalendarResponse:
-    """Only args are using for key_builder, so kwargs aren't"""
-    return await get_calendar(body, calendar_id, person_id,
-                              lms_user=lms_user, cookies=cookies, modeus_jwt_token=modeus_jwt_token)
+    """Only args are using for cache key, so kwargs aren't. Degraded calendar isn't cached."""
+    cached_calendar = await read_cached_calendar(body, calendar_id, person_id)
+    if cached_calendar is not None:
+        return cached_calendar
+    return await fetch_and_cache_calendar(body, calendar_id, person_id,
+                                          lms_user=lms_user, cookies=cookies, modeus_jwt_token=modeus_jwt_token)
+
+
+async def fetch_and_cache_calendar(
+        body: modeus_schema.ModeusTimeBody,
+        calendar_id: int,
+        person_id: str,
+        *,
+        lms_user: lms_schema.User,
+        cookies: netology_schema.NetologyCookies,
+        modeus_jwt_token: str,
+) -> schema.CalendarResponse:
+    calendar = await get_calendar(body, calendar_id, person_id,
+                                  lms_user=lms_user, cookies=cookies, modeus_jwt_token=modeus_jwt_token)
+    if calendar.is_complete():
+        try:
+            await save_cached_calendar(body, calendar_id, person_id, calendar)
+        except Exception as exception:
+            logger.error(f"Got redis {exception}")
+    return calendar
+
+
+def get_refresh_stats_key(calendar_id: int, person_id: str) -> str:
+    return f"{settings.redis_prefix}:{settings.refresh_stats_prefix}:{calendar_id}:{person_id}"
+
+
+async def read_refresh_stats(calendar_id: int, person_id: str) -> schema.RefreshStats:
+    try:
+        cached = await FastAPICache.get_backend().get(get_refresh_stats_key(calendar_id, person_id))
+    except Exception as exception:
+        logger.error(f"Got redis {exception}")
+        return schema.RefreshStats()
+    if cached is None:
+        return schema.RefreshStats()
+    try:
+        return schema.RefreshStats.model_validate_json(cached)
+    except ValidationError:
+        logger.exception(f"Can't decode refresh stats: {cached[:100]!r}")
+        return schema.RefreshStats()
+
+
+async def record_refresh(
+        calendar_id: int, person_id: str, delta: dict[schema.CalendarSource, schema.SourceDelta],
+) -> schema.RefreshStats:
+    """Adapt refresh intervals of refreshed sources to whether they changed, returns adapted stats."""
+    stats = await read_refresh_stats(calendar_id, person_id)
+    if not delta:
+        return stats
+    stats.record(delta)
+    try:
+        await FastAPICache.get_backend().set(
+            key=get_refresh_stats_key(calendar_id, person_id),
+            value=stats.model_dump_json().encode(),
+            expire=settings.redis_events_time_live,
+        )
+    except Exception as exception:
+        logger.error(f"Got redis {exception}")
+    return stats
+
+
+async def refresh_sources(
+        body: modeus_schema.ModeusTimeBody,
+        calendar_id: int,
+        person_id: str,
+        sources: Collection[schema.CalendarSource],
+        cached_digests: schema.CalendarDigests | None,
+        *,
+        lms_user: lms_schema.User,
+        cookies: netology_schema.NetologyCookies,
+        modeus_jwt_token: str,
+) -> schema.CalendarResponse:
+    """
+    Fetch given sources and keep others from cached calendar, all sources are fetched without it.
+
+    Due sources bypass cache layers, otherwise warm layer entry would be taken for fetched one.
+    """
+    cached_calendar = await read_cached_calendar(body, calendar_id, person_id) if cached_digests else None
+    if cached_calendar is None:
+        sources = tuple(schema.CalendarSource)
+    with bypass_cache_layers():
+        calendar = await get_calendar(body, calendar_id, person_id,
+                                      lms_user=lms_user, cookies=cookies, modeus_jwt_token=modeus_jwt_token,
+                                      cached_calendar=cached_calendar, fetched=sources)
+    digests = calendar.get_digests()
+    if cached_digests is not None:
+        digests.fetched_at.update({
+            source: fetched_at for source, fetched_at in cached_digests.fetched_at.items() if source not in sources
+        })
+    stats = None
+    if cached_digests is not None:
+        delta = digests.get_delta(cached_digests)
+        stats = await record_refresh(calendar_id, person_id, {
+            source: source_delta for source, source_delta in delta.items() if source in sources
+        })
+    if calendar.is_complete():
+        try:
+            await save_cached_calendar(body, calendar_id, person_id, calendar, digests, stats)
+        except Exception as exception:
+            logger.error(f"Got redis {exception}")
+    return calendar
+
+
+async def revalidate_calendar(
+        redis_pool: ConnectionPool,
+        body: modeus_schema.ModeusTimeBody,
+        calendar_id: int,
+        person_id: str,
+        *,
+        lms_user: lms_schema.User,
+        cookies: netology_schema.NetologyCookies,
+        modeus_jwt_token: str,
+) -> None:
+    """
+    Refresh sources of cached calendar due by their adaptive intervals in background.
+
+    One refresh per key between all workers. Intervals are shared by weeks, so refresh of other week
+    may put off due time, then only refresh time of cached calendar is moved.
+    """
+    cached_digests = await read_cached_digests(body, calendar_id, person_id)
+    stats = await read_refresh_stats(calendar_id, person_id)
+    due = stats.get_due(cached_digests, schema.now_dt_utc())
+    if not due:
+        logger.debug("No calendar sources are due to refresh")
+        cached_calendar = await read_cached_calendar(body, calendar_id, person_id)
+        if cached_calendar is not None and cached_digests is not None:
+            try:
+                await save_cached_calendar(body, calendar_id, person_id, cached_calendar, cached_digests, stats)
+            except Exception as exception:
+                logger.error(f"Got redis {exception}")
+        return
+    lock_key = f"{settings.redis_revalidate_prefix}:{get_calendar_cache_key(body, calendar_id, person_id)}"
+    async with Redis(connection_pool=redis_pool) as redis:
+        if not await redis.set(lock_key, 1, nx=True, ex=settings.redis_revalidate_lock_time_live):
+            logger.debug("Calendar is already revalidating")
+            return
+        try:
+            await refresh_sources(body, calendar_id, person_id, due, cached_digests,
+                                  lms_user=lms_user, cookies=cookies, modeus_jwt_token=modeus_jwt_token)
+        except Exception as exception:
+            logger.error(f"Can't revalidate calendar: {exception!r}")
+        finally:
+            await redis.delete(lock_key)
+
+
+async def get_calendar_range(
+        body: modeus_schema.ModeusTimeBody,
+        calendar_id: int,
+        person_id: str,
+        *,
+        lms_user: lms_schema.User,
+        cookies: netology_schema.NetologyCookies,
+        modeus_jwt_token: str,
+) -> schema.CalendarResponse:
+    """
+    Calendar for several weeks, every week is cached under the same key as single week.
+
+    Only weeks missing in cache are fetched, at most bulk_range_concurrency at a time.
+    """
+    if body.count_weeks() > settings.bulk_range_max_weeks:
+        raise HTTPException(detail=f"Range can't be longer than {settings.bulk_range_max_weeks} weeks.",
+                            status_code=status.HTTP_400_BAD_REQUEST)
+    weeks = body.split_weeks()
+    calendars = list(await asyncio.gather(*(read_cached_calendar(week, calendar_id, person_id) for week in weeks)))
+    semaphore = asyncio.Semaphore(settings.bulk_range_concurrency)
+
+    async def fetch_week(index: int) -> None:
+        async with semaphore:
+            calendars[index] = await fetch_and_cache_calendar(
+                weeks[index], calendar_id, person_id,
+                lms_user=lms_user, cookies=cookies, modeus_jwt_token=modeus_jwt_token,
+            )
+
+    missing = [index for index, calendar in enumerate(calendars) if calendar is None]
+    logger.debug(f"Range of {len(weeks)} weeks, {len(missing)} weeks aren't cached")
+    async with asyncio.TaskGroup() as tg:
+        for index in missing:
+            tg.create_task(fetch_week(index))
+    return schema.CalendarResponse.merge([calendar for calendar in calendars if calendar is not None])
+
+
+def is_degradable(exception: Exception) -> bool:
+    """Client errors (e.g. expired cookies) need user's action, so they aren't hidden."""
+    if isinstance(exception, HTTPException):
+        status_code = exception.status_code
+    elif isinstance(exception, httpx.HTTPStatusError):
+        status_code = exception.response.status_code
+    else:
+        return True
+    return not status.HTTP_400_BAD_REQUEST <= status_code < status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+SOURCE_DEADLINES = {
+    schema.CalendarSource.NETOLOGY: settings.bulk_netology_deadline,
+    schema.CalendarSource.MODEUS: settings.bulk_modeus_deadline,
+    schema.CalendarSource.LMS: settings.bulk_lms_deadline,
+}
+
+
+async def _fetch_section(
+        source: schema.CalendarSource, awaitable: Awaitable[Any],
+) -> tuple[schema.CalendarSource, Any, Exception | None]:
+    try:
+        async with asyncio.timeout(SOURCE_DEADLINES[source]):
+            return source, await awaitable, None
+    except Exception as exception:
+        return source, None, exception
+
+
+def _section_frame(source: schema.CalendarSource, data: Any, timezone: datetime.tzinfo) -> bytes:
+    """Timezone is changed on a copy, fetched data stays in UTC for cache and hash."""
+    match source:
+        case schema.CalendarSource.NETOLOGY:
+            data = schema.change_netology_timezone(data.model_copy(deep=True), timezone)
+        case schema.CalendarSource.MODEUS:
+            data = schema.change_modeus_timezone([event.model_copy(deep=True) for event in data], timezone)
+        case schema.CalendarSource.LMS:
+            data = schema.change_lms_timezone([event.model_copy(deep=True) for event in data], timezone)
+    return schema.SectionFrame(source=source, data=data).model_dump_json(by_alias=True).encode() + b"\n"
+
+
+def _error_detail(exception: Exception) -> str:
+    if isinstance(exception, HTTPException):
+        return str(exception.detail)
+    if isinstance(exception, TimeoutError):
+        return "Source timed out"
+    return "Source is unavailable"
+
+
+async def stream_calendar(
+        body: modeus_schema.ModeusTimeBody,
+        calendar_id: int,
+        person_id: str,
+        lms_user: lms_schema.User,
+        cookies: netology_schema.NetologyCookies,
+        modeus_jwt_token: str,
+        timezone: datetime.tzinfo,
+) -> AsyncIterator[bytes]:
+    """
+    NDJSON stream of calendar: every source is sent as soon as it's fetched.
+
+    Ends with summary frame. Calendar is cached only if all sources succeeded.
+    """
+    cached_calendar = await read_cached_calendar(body, calendar_id, person_id)
+    if cached_calendar is not None:
+        for source in schema.CalendarSource:
+            yield _section_frame(source, cached_calendar.get_section(source), timezone)
+        yield schema.SummaryFrame(
+            cached_at=cached_calendar.cached_at, hash=cached_calendar.get_hash(),
+        ).model_dump_json().encode() + b"\n"
+        return
+
+    full_body = modeus_schema.ModeusEventsBody.model_validate(
+        {**body.create_dump_date(), 'attendeePersonId': [person_id]},
+    )
+    tasks = [
+        asyncio.create_task(_fetch_section(
+            schema.CalendarSource.NETOLOGY, netology_views.get_calendar(body, calendar_id, cookies))),
+        asyncio.create_task(_fetch_section(
+            schema.CalendarSource.MODEUS, modeus_views.get_calendar(full_body, modeus_jwt_token, person_id))),
+        asyncio.create_task(_fetch_section(
+            schema.CalendarSource.LMS, lms_views.get_events(lms_user, full_body))),
+    ]
+    sections: dict[schema.CalendarSource, Any] = {}
+    failed: list[schema.CalendarSource] = []
+    try:
+        for next_section in asyncio.as_completed(tasks):
+            source, data, exception = await next_section
+            if exception is not None:
+                logger.error(f"Can't get {source.value} events: {exception!r}")
+                failed.append(source)
+                yield schema.ErrorFrame(
+                    source=source, detail=_error_detail(exception),
+                ).model_dump_json().encode() + b"\n"
+                continue
+            sections[source] = data
+            yield _section_frame(source, data, timezone)
+    finally:
+        # Client has gone, nobody needs the rest
+        for task in tasks:
+            task.cancel()
+
+    if failed:
+        summary = schema.SummaryFrame(cached_at=None, hash=None, failed=failed)
+    else:
+        calendar = schema.CalendarResponse.from_sections(sections)
+        try:
+            await save_cached_calendar(body, calendar_id, person_id, calendar)
+        except Exception as exception:
+            logger.error(f"Got redis {exception}")
+        summary = schema.SummaryFrame(cached_at=calendar.cached_at, hash=calendar.get_hash())
+    yield summary.model_dump_json().encode() + b"\n"
+
+
+def get_subscription_key(token: str) -> str:
+    """Only hash of token is stored, so Redis keys don't reveal subscription URLs."""
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    return f"{settings.redis_prefix}:{settings.redis_subscription_prefix}:{digest}"
+
+
+def get_person_subscription_key(person_id: str) -> str:
+    return f"{settings.redis_prefix}:{settings.redis_subscription_prefix}:person:{person_id}"
+
+
+async def create_subscription(redis_pool: ConnectionPool, credentials: schema.SubscriptionCredentials) -> str:
+    """Create subscription, the latest one of person is also used for prefetch."""
+    token = secrets.token_urlsafe(32)
+    key = get_subscription_key(token)
+    async with Redis(connection_pool=redis_pool) as redis:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.set(name=key, value=credentials.model_dump_json(by_alias=True), ex=settings.subscription_time_live)
+            pipe.set(name=get_person_subscription_key(credentials.person_id), value=key,
+                     ex=settings.subscription_time_live)
+            await pipe.execute()
+    return token
+
+
+async def get_person_subscription(
+        redis_pool: ConnectionPool, person_id: str,
+) -> schema.SubscriptionCredentials | None:
+    async with Redis(connection_pool=redis_pool) as redis:
+        key = await redis.get(get_person_subscription_key(person_id))
+        credentials = await redis.get(key) if key is not None else None
+    return schema.SubscriptionCredentials.model_validate_json(credentials) if credentials is not None else None
+
+
+async def delete_subscription(redis_pool: ConnectionPool, token: str) -> None:
+    key = get_subscription_key(token)
+    async with Redis(connection_pool=redis_pool) as redis:
+        await redis.delete(key, f"{key}:ics")
+
+
+async def get_subscription(redis_pool: ConnectionPool, token: str) -> schema.SubscriptionCredentials:
+    """Credentials of subscription, its time live starts again on every poll."""
+    async with Redis(connection_pool=redis_pool) as redis:
+        credentials = await redis.getex(get_subscription_key(token), ex=settings.subscription_time_live)
+    if credentials is None:
+        raise HTTPException(detail="Subscription is not found", status_code=status.HTTP_404_NOT_FOUND)
+    return schema.SubscriptionCredentials.model_validate_json(credentials)
+
+
+def get_subscription_body(today: datetime.date) -> modeus_schema.ModeusTimeBody:
+    """Whole weeks around today, from subscription_weeks_before to subscription_weeks_after."""
+    monday = today - datetime.timedelta(days=today.weekday())
+    time_min = monday - datetime.timedelta(weeks=settings.subscription_weeks_before)
+    time_max = monday + datetime.timedelta(weeks=settings.subscription_weeks_after, days=6)
+    return modeus_schema.ModeusTimeBody.model_validate({
+        "timeMin": datetime.datetime.combine(time_min, datetime.time.min),
+        "timeMax": datetime.datetime.combine(time_max, datetime.time.min),
+    })
+
+
+async def get_subscription_feed(
+        redis_pool: ConnectionPool,
+        token: str,
+        modeus_jwt_token: str,
+) -> schema.SubscriptionFeed:
+    """
+    ICS of rolling range built from cached weeks, rendered at most once per subscription_render_time_live.
+
+    Last-Modified is kept while ETag (content of calendar) doesn't change.
+    If calendar can't be fetched or some source of it failed, expired feed is served until it's rendered again,
+    feed with failed source isn't saved, so calendar apps don't drop its events.
+    """
+    credentials = await get_subscription(redis_pool, token)
+    feed_key = f"{get_subscription_key(token)}:ics"
+    async with Redis(connection_pool=redis_pool) as redis:
+        cached = await redis.hgetall(feed_key)  # type: ignore
+    feed = None
+    if cached:
+        try:
+            feed = schema.SubscriptionFeed.model_validate({key.decode(): value for key, value in cached.items()})
+        except ValidationError:
+            logger.exception("Can't decode cached subscription feed")
+    if feed is not None and not feed.is_expired():
+        return feed
+
+    timezone = schema.get_timezone(credentials.time_zone)
+    try:
+        calendar = await get_calendar_range(
+            get_subscription_body(datetime.datetime.now(tz=timezone).date()), credentials.calendar_id,
+            credentials.person_id, lms_user=credentials.lms_user, cookies=credentials.cookies,
+            modeus_jwt_token=modeus_jwt_token,
+        )
+    except Exception:
+        if feed is None:
+            raise
+        logger.exception("Can't render subscription feed, serving stale one")
+        return feed
+    if calendar.has_failed() and feed is not None:
+        logger.warning(f"Subscription feed has failed sources {calendar.sources}, serving stale one")
+        return feed
+    calendar.change_timezone(credentials.time_zone)
+    etag = calendar.get_etag(timezone, media_type="ics")
+    now = schema.now_dt_utc()
+    feed = schema.SubscriptionFeed(
+        ics=b"".join(export_to_ics(calendar)),
+        etag=etag,
+        last_modified=feed.last_modified if feed is not None and feed.etag == etag else now,
+        rendered_at=now,
+    )
+    if calendar.has_failed():
+        return feed
+    async with Redis(connection_pool=redis_pool) as redis:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hset(feed_key, mapping=feed.model_dump(mode="json") | {"ics": feed.ics})
+            pipe.expire(feed_key, settings.subscription_time_live)
+            await pipe.execute()
+    return feed
+
+
+@prefetcher.register(Upstream.MODEUS, Upstream.NETOLOGY, Upstream.LMS)
+async def prefetch_calendar(person_id: str, week: datetime.date) -> None:
+    """
+    Warm calendar of week for subscribers, other active users are skipped.
+
+    Sources of calendar due to refresh can be fetched only with credentials of person's subscription.
+    Calendar is saved for redis_events_time_live, so it's still there at peak, unlike Modeus
+    events layer alone, which expires in redis_modeus_events_time_live, before off-peak is over.
+    """
+    redis_pool = prefetcher.redis_pool
+    credentials = await get_person_subscription(redis_pool, person_id) if redis_pool is not None else None
+    if redis_pool is None or credentials is None:
+        return
+    body = modeus_schema.ModeusTimeBody.model_validate({
+        "timeMin": datetime.datetime.combine(week, datetime.time.min),
+        "timeMax": datetime.datetime.combine(week + datetime.timedelta(days=6), datetime.time.min),
+    })
+    donor_token = await modeus_integration.get_donor_token()
+    assert isinstance(donor_token, str), "Expected donor token, got cached response"
+    await revalidate_calendar(redis_pool, body, credentials.calendar_id, person_id,
+                              lms_user=credentials.lms_user, cookies=credentials.cookies,
+                              modeus_jwt_token=donor_token)
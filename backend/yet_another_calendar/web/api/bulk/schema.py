@@ -1,12 +1,16 @@
 import datetime
+import enum
+import functools
 import hashlib
-from typing import Self
+import zoneinfo
+from typing import Any, Literal, NamedTuple, Self
 
 import pytz
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
 from starlette import status
 from starlette.exceptions import HTTPException
 
+from yet_another_calendar.settings import settings
 from ..modeus import schema as modeus_schema
 from ..lms import schema as lms_schema
 from ..netology import schema as netology_schema
@@ -19,41 +23,380 @@ class UtmnResponse(BaseModel):
     lms_events: list[lms_schema.ModuleResponse]
 
 
+@functools.lru_cache(maxsize=256)
+def _load_timezone(timezone_name: str) -> zoneinfo.ZoneInfo:
+    # pytz resolves names case-insensitively, zoneinfo converts datetimes faster
+    return zoneinfo.ZoneInfo(str(pytz.timezone(timezone_name)))
+
+
+def get_timezone(timezone_name: str) -> datetime.tzinfo:
+    try:
+        return _load_timezone(timezone_name)
+    except (pytz.exceptions.UnknownTimeZoneError, zoneinfo.ZoneInfoNotFoundError):
+        raise HTTPException(detail="Wrong timezone", status_code=status.HTTP_400_BAD_REQUEST) from None
+
+
+def change_netology_timezone(
+        events: netology_schema.SerializedEvents, timezone: datetime.tzinfo,
+) -> netology_schema.SerializedEvents:
+    for homework in events.homework:
+        if homework.deadline:
+            homework.deadline = homework.deadline.astimezone(timezone)
+    for webinar in events.webinars:
+        if webinar.starts_at:
+            webinar.starts_at = webinar.starts_at.astimezone(timezone)
+        if webinar.ends_at:
+            webinar.ends_at = webinar.ends_at.astimezone(timezone)
+    return events
+
+
+def change_modeus_timezone(
+        events: list[modeus_schema.FullEvent], timezone: datetime.tzinfo,
+) -> list[modeus_schema.FullEvent]:
+    for modeus_event in events:
+        modeus_event.start_time = modeus_event.start_time.astimezone(timezone)
+        modeus_event.end_time = modeus_event.end_time.astimezone(timezone)
+    return events
+
+
+def change_lms_timezone(
+        events: list[lms_schema.ModuleResponse], timezone: datetime.tzinfo,
+) -> list[lms_schema.ModuleResponse]:
+    for lms_event in events:
+        lms_event.dt_start = lms_event.dt_start.astimezone(timezone)
+        lms_event.dt_end = lms_event.dt_end.astimezone(timezone)
+    return events
+
+
 class BulkResponse(BaseModel):
     netology: netology_schema.SerializedEvents
     utmn: UtmnResponse
 
     def change_timezone(self, timezone_name: str) -> Self:
-        try:
-            timezone = pytz.timezone(timezone_name)
-        except pytz.exceptions.UnknownTimeZoneError:
-            raise HTTPException(detail="Wrong timezone", status_code=status.HTTP_400_BAD_REQUEST) from None
-        for homework in self.netology.homework:
-            if homework.deadline:
-                homework.deadline = homework.deadline.astimezone(timezone)
-        for webinar in self.netology.webinars:
-            if webinar.starts_at:
-                webinar.starts_at = webinar.starts_at.astimezone(timezone)
-            if webinar.ends_at:
-                webinar.ends_at = webinar.ends_at.astimezone(timezone)
-
-        for modeus_event in self.utmn.modeus_events:
-            modeus_event.start_time = modeus_event.start_time.astimezone(timezone)
-            modeus_event.end_time = modeus_event.end_time.astimezone(timezone)
-
-        for lms_event in self.utmn.lms_events:
-            lms_event.dt_start = lms_event.dt_start.astimezone(timezone)
-            lms_event.dt_end = lms_event.dt_end.astimezone(timezone)
+        timezone = get_timezone(timezone_name)
+        change_netology_timezone(self.netology, timezone)
+        change_modeus_timezone(self.utmn.modeus_events, timezone)
+        change_lms_timezone(self.utmn.lms_events, timezone)
         return self
 
 
-class CalendarResponse(BulkResponse):
+class CalendarSource(str, enum.Enum):
+    """Sources of bulk calendar."""
+
+    NETOLOGY = "netology"
+    MODEUS = "modeus"
+    LMS = "lms"
+
+
+class ActivitySource(str, enum.Enum):
+    """Endpoint user got calendar with."""
+
+    EVENTS = "events"
+    RANGE = "range"
+    STREAM = "stream"
+
+
+class SourceStatus(str, enum.Enum):
+    """Fresh - fetched now, stale - taken from cache, failed - empty."""
+
+    FRESH = "fresh"
+    STALE = "stale"
+    FAILED = "failed"
+
+
+def all_fresh() -> dict[CalendarSource, SourceStatus]:
+    return dict.fromkeys(CalendarSource, SourceStatus.FRESH)
+
+
+def is_stale(cached_at: datetime.datetime, refresh_at: datetime.datetime | None) -> bool:
+    """Some source is due to refresh, entries saved without refresh time are stale after soft time live."""
+    if refresh_at is None:
+        return (now_dt_utc() - cached_at).total_seconds() > settings.redis_events_soft_time_live
+    return now_dt_utc() >= refresh_at
+
+
+class CalendarProjectionResponse(BulkResponse):
+    """Calendar of /events/, its projection is kept while age changes, so age is sent in Age header."""
+
     cached_at: datetime.datetime = Field(default_factory=now_dt_utc, alias="cached_at")
+    refresh_at: datetime.datetime | None = Field(default=None, alias="refresh_at")
+    sources: dict[CalendarSource, SourceStatus] = Field(default_factory=all_fresh)
+
+
+class CalendarResponse(CalendarProjectionResponse):
+    """Calendar with its age in body, as /events/range/ and /refresh_events/ send it."""
+
+    @classmethod
+    def from_sections(
+            cls, sections: dict[CalendarSource, Any], sources: dict[CalendarSource, SourceStatus] | None = None,
+    ) -> Self:
+        return cls.model_validate({
+            "netology": sections.get(CalendarSource.NETOLOGY, {"homework": [], "webinars": []}),
+            "utmn": {
+                "modeus_events": sections.get(CalendarSource.MODEUS, []),
+                "lms_events": sections.get(CalendarSource.LMS, []),
+            },
+            "sources": sources or all_fresh(),
+        })
+
+    def get_events_by_id(self, source: CalendarSource) -> dict[str, str]:
+        """JSON of source events by id, Netology ids are prefixed as homework and webinars may collide."""
+        match source:
+            case CalendarSource.NETOLOGY:
+                homework = {f"homework:{task.id}": task.model_dump_json(by_alias=True)
+                            for task in self.netology.homework}
+                webinars = {f"webinar:{webinar.id}": webinar.model_dump_json(by_alias=True)
+                            for webinar in self.netology.webinars}
+                return {**homework, **webinars}
+            case CalendarSource.MODEUS:
+                return {str(event.id): event.model_dump_json(by_alias=True) for event in self.utmn.modeus_events}
+            case CalendarSource.LMS:
+                return {str(event.id): event.model_dump_json(by_alias=True) for event in self.utmn.lms_events}
+
+    def get_digests(self) -> "CalendarDigests":
+        """
+        Digests of fresh sources and their events, other sources weren't fetched so they aren't compared.
+
+        Fresh sources are considered fetched at `cached_at`.
+        """
+        events = {}
+        for source, source_status in self.sources.items():
+            if source_status == SourceStatus.FRESH:
+                events[source] = {
+                    event_id: hashlib.md5(event.encode()).hexdigest()
+                    for event_id, event in self.get_events_by_id(source).items()
+                }
+        sources = {
+            source: hashlib.md5(",".join(f"{event_id}={digest}" for event_id, digest in digests.items()).encode())
+            .hexdigest()
+            for source, digests in events.items()
+        }
+        return CalendarDigests(sources=sources, events=events, fetched_at=dict.fromkeys(events, self.cached_at))
+
+    def get_section(self, source: CalendarSource) -> Any:
+        match source:
+            case CalendarSource.NETOLOGY:
+                return self.netology
+            case CalendarSource.MODEUS:
+                return self.utmn.modeus_events
+            case CalendarSource.LMS:
+                return self.utmn.lms_events
+
+    @classmethod
+    def merge(cls, calendars: list["CalendarResponse"]) -> Self:
+        """Join calendars of several weeks, the oldest cached_at and the worst status of each source win."""
+        severity = list(SourceStatus)
+        sources = all_fresh()
+        for calendar in calendars:
+            for source, source_status in calendar.sources.items():
+                sources[source] = max(sources[source], source_status, key=severity.index)
+        return cls.model_validate({
+            "netology": {
+                "homework": [homework for calendar in calendars for homework in calendar.netology.homework],
+                "webinars": [webinar for calendar in calendars for webinar in calendar.netology.webinars],
+            },
+            "utmn": {
+                "modeus_events": [event for calendar in calendars for event in calendar.utmn.modeus_events],
+                "lms_events": [event for calendar in calendars for event in calendar.utmn.lms_events],
+            },
+            "cached_at": min((calendar.cached_at for calendar in calendars), default=now_dt_utc()),
+            "refresh_at": min(
+                (calendar.refresh_at for calendar in calendars if calendar.refresh_at is not None), default=None,
+            ),
+            "sources": sources,
+        })
+
+    @computed_field  # type: ignore
+    @property
+    def age(self) -> int:
+        """Seconds since calendar was fetched."""
+        return int((now_dt_utc() - self.cached_at).total_seconds())
+
+    def is_stale(self) -> bool:
+        return is_stale(self.cached_at, self.refresh_at)
+
+    def is_complete(self) -> bool:
+        """All sources are fresh, so calendar can be cached."""
+        return all(status == SourceStatus.FRESH for status in self.sources.values())
+
+    def has_failed(self) -> bool:
+        """Some source is empty, as it wasn't fetched and isn't cached."""
+        return SourceStatus.FAILED in self.sources.values()
 
     def get_hash(self) -> str:
         dump = BulkResponse(**self.model_dump(by_alias=True)).model_dump_json(by_alias=True)
         return hashlib.md5(dump.encode()).hexdigest()
 
+    def get_etag(self, timezone: datetime.tzinfo, media_type: str = "json") -> str:
+        """Strong ETag of content in timezone, sources are included so recovered calendar isn't kept as stale."""
+        sources = ",".join(f"{source.value}={value.value}" for source, value in sorted(self.sources.items()))
+        digest = hashlib.md5(f"{self.get_hash()}:{sources}:{timezone}:{media_type}".encode()).hexdigest()
+        return f'"{digest}"'
+
+
+class SourceDelta(BaseModel):
+    """Event ids changed since cached calendar."""
+
+    added: list[str] = Field(default_factory=list)
+    removed: list[str] = Field(default_factory=list)
+    modified: list[str] = Field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.modified)
+
+
+class CalendarDigests(BaseModel):
+    """Digests of calendar computed once on write and cached next to it, to find changes without serialization."""
+
+    sources: dict[CalendarSource, str] = Field(default_factory=dict)
+    events: dict[CalendarSource, dict[str, str]] = Field(default_factory=dict)
+    fetched_at: dict[CalendarSource, datetime.datetime] = Field(default_factory=dict)
+
+    def get_delta(self, previous: "CalendarDigests | None") -> dict[CalendarSource, SourceDelta]:
+        """Changed event ids of own sources, events are compared only if source digest differs."""
+        delta = {}
+        for source, events in self.events.items():
+            if previous is not None and previous.sources.get(source) == self.sources[source]:
+                delta[source] = SourceDelta()
+                continue
+            old = previous.events.get(source, {}) if previous is not None else {}
+            delta[source] = SourceDelta(
+                added=[event_id for event_id in events if event_id not in old],
+                removed=[event_id for event_id in old if event_id not in events],
+                modified=[event_id for event_id, digest in events.items() if old.get(event_id, digest) != digest],
+            )
+        return delta
+
+
+class SourceRefreshStats(BaseModel):
+    """Refreshes of source and how many of them changed its digest."""
+
+    checks: int = 0
+    changes: int = 0
+    interval: int
+
+
+class RefreshStats(BaseModel):
+    """
+    Adaptive refresh intervals of user's sources for course.
+
+    Interval is halved by refresh which found changes and grows by `refresh_interval_growth`
+    by refresh which didn't, within `refresh_min_interval` and `refresh_max_interval`.
+    """
+
+    sources: dict[CalendarSource, SourceRefreshStats] = Field(default_factory=dict)
+
+    def get(self, source: CalendarSource) -> SourceRefreshStats:
+        return self.sources.get(source) or SourceRefreshStats(interval=settings.refresh_intervals[source.value])
+
+    def record(self, delta: dict[CalendarSource, SourceDelta]) -> None:
+        """Count refreshes of sources in delta, only refreshed sources must be given."""
+        for source, source_delta in delta.items():
+            stats = self.get(source)
+            stats.checks += 1
+            if source_delta.is_empty():
+                interval = stats.interval * settings.refresh_interval_growth
+            else:
+                stats.changes += 1
+                interval = stats.interval / 2
+            stats.interval = int(min(max(interval, settings.refresh_min_interval), settings.refresh_max_interval))
+            self.sources[source] = stats
+
+    def get_due(self, digests: CalendarDigests | None, now: datetime.datetime) -> list[CalendarSource]:
+        """Sources fetched longer than their interval ago, unknown fetch time makes source due."""
+        if digests is None:
+            return list(CalendarSource)
+        return [
+            source for source in CalendarSource
+            if source not in digests.fetched_at
+            or (now - digests.fetched_at[source]).total_seconds() >= self.get(source).interval
+        ]
+
+    def get_refresh_at(self, digests: CalendarDigests) -> datetime.datetime:
+        """When the first source gets due, unknown fetch time makes source due now."""
+        return min(
+            digests.fetched_at[source] + datetime.timedelta(seconds=self.get(source).interval)
+            if source in digests.fetched_at else now_dt_utc()
+            for source in CalendarSource
+        )
+
 
 class RefreshedCalendarResponse(CalendarResponse):
     changed: bool
+    delta: dict[CalendarSource, SourceDelta] = Field(default_factory=dict)
+
+
+class CalendarProjection(NamedTuple):
+    """Calendar already serialized in requested timezone."""
+
+    cached_at: datetime.datetime
+    refresh_at: datetime.datetime | None
+    etag: str
+    payload: bytes
+
+    def is_stale(self) -> bool:
+        return is_stale(self.cached_at, self.refresh_at)
+
+    def get_age(self) -> int:
+        """Seconds since calendar was fetched."""
+        return int((now_dt_utc() - self.cached_at).total_seconds())
+
+
+class SectionFrame(BaseModel):
+    """One source of calendar, sent as soon as it's ready."""
+    type: Literal["section"] = "section"
+    source: CalendarSource
+    data: Any
+
+
+class ErrorFrame(BaseModel):
+    type: Literal["error"] = "error"
+    source: CalendarSource
+    detail: str
+
+
+class SummaryFrame(BaseModel):
+    """Last frame of calendar stream, hash is None if some source failed."""
+    type: Literal["summary"] = "summary"
+    cached_at: datetime.datetime | None
+    hash: str | None
+    failed: list[CalendarSource] = Field(default_factory=list)
+
+
+class SubscriptionCredentials(BaseModel):
+    """Everything needed to build calendar without user, stored server-side by subscription token."""
+
+    person_id: str
+    calendar_id: int
+    time_zone: str
+    lms_user: lms_schema.User
+    cookies: netology_schema.NetologyCookies
+
+
+class SubscriptionResponse(BaseModel):
+    url: str
+    webcal_url: str
+
+
+class SubscriptionFeed(BaseModel):
+    """Rendered ICS of subscription, stored in Redis hash."""
+
+    ics: bytes
+    etag: str
+    last_modified: datetime.datetime
+    rendered_at: datetime.datetime
+
+    def is_expired(self) -> bool:
+        return (now_dt_utc() - self.rendered_at).total_seconds() > settings.subscription_render_time_live
+
+
+class UsersCount(BaseModel):
+    """Unique users today, for last 7 and 30 days, HyperLogLog standard error is 0.81%."""
+
+    daily_users: int
+    weekly_users: int
+    monthly_users: int
+
+
+class UserMetrix(UsersCount):
+    sources: dict[ActivitySource, UsersCount]
@@ -5,7 +5,7 @@ from typing import Annotated
 
 from fastapi import APIRouter, Header, BackgroundTasks
 from fastapi.params import Depends
-from starlette.responses import StreamingResponse
+from starlette.responses import Response, StreamingResponse
 from redis.asyncio import ConnectionPool
 
 from yet_another_calendar.settings import settings
@@ -15,12 +15,16 @@ from ..lms import schema as lms_schema
 from ..modeus import schema as modeus_schema
 from ..modeus import integration as modeus_integration
 from ..netology import schema as netology_schema
+from ...etag import etag_matches, format_http_date, not_modified, not_modified_since
 from ...lifespan import get_redis_pool
+from ...prefetch import prefetcher
 
 router = APIRouter()
 
 
-@router.get("/events/")
+@router.get("/events/", response_model=schema.CalendarProjectionResponse, responses={200: {"headers": {
+    "Age": {"description": "Seconds since calendar was fetched", "schema": {"type": "integer"}},
+}}})
 async def get_calendar(
         body: Annotated[modeus_schema.ModeusTimeBody, Depends(modeus_schema.get_time_from_query)],
         lms_user: Annotated[lms_schema.User, Depends(lms_schema.get_user)],
@@ -31,22 +35,92 @@ async def get_calendar(
         redis: Annotated[ConnectionPool, Depends(get_redis_pool)],
         calendar_id: int = settings.netology_default_course_id,
         time_zone: str = "Europe/Moscow",
-) -> schema.CalendarResponse:
+        if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
     """
     Get events from Netology and Modeus, cached.
+
+    Calendar older than soft time live is returned at once and refreshed in background.
+    Unchanged calendar is answered with 304 by If-None-Match. Seconds since calendar
+    was fetched are sent in Age header.
+    """
+    timezone = schema.get_timezone(time_zone)
+    integration.save_user_was_there(modeus_person_id, schema.ActivitySource.EVENTS)
+    projection = await integration.read_calendar_projection(body, calendar_id, modeus_person_id, timezone)
+    if projection is None:
+        cached_calendar = await integration.get_cached_calendar(
+            body, calendar_id, modeus_person_id,
+            cookies=cookies, lms_user=lms_user, modeus_jwt_token=donor_token,
+        )
+        projection = integration.project_calendar(cached_calendar, timezone)
+    if projection.is_stale():
+        background_tasks.add_task(
+            integration.revalidate_calendar, redis, body, calendar_id, modeus_person_id,
+            cookies=cookies, lms_user=lms_user, modeus_jwt_token=donor_token,
+        )
+    headers = {"Age": str(projection.get_age())}
+    if etag_matches(if_none_match, projection.etag):
+        return not_modified(projection.etag, headers)
+    # Already serialized in requested timezone, so FastAPI doesn't need to validate and serialize it again
+    return Response(projection.payload, media_type="application/json", headers={**headers, "ETag": projection.etag})
+
+
+@router.delete("/events/")
+async def drop_cached_calendar(
+        modeus_person_id: Annotated[str, Header()],
+) -> None:
+    """
+    Drop cached events of person, next request fetches them from upstreams.
+    """
+    await integration.drop_cached_calendars(modeus_person_id)
+
+
+@router.get("/events/range/")
+async def get_calendar_range(
+        body: Annotated[modeus_schema.ModeusTimeBody, Depends(modeus_schema.get_time_from_query)],
+        lms_user: Annotated[lms_schema.User, Depends(lms_schema.get_user)],
+        cookies: Annotated[netology_schema.NetologyCookies, Depends(netology_schema.get_cookies_from_headers)],
+        donor_token: Annotated[str, Depends(modeus_integration.get_donor_token)],
+        modeus_person_id: Annotated[str, Header()],
+        calendar_id: int = settings.netology_default_course_id,
+        time_zone: str = "Europe/Moscow",
+) -> schema.CalendarResponse:
     """
-    background_tasks.add_task(integration.save_user_was_there, redis, modeus_person_id)
-    cached_calendar = await integration.get_cached_calendar(
+    Get events for several whole weeks (from Monday to Sunday), cached per week.
+    """
+    integration.save_user_was_there(modeus_person_id, schema.ActivitySource.RANGE)
+    calendar = await integration.get_calendar_range(
         body, calendar_id, modeus_person_id,
         cookies=cookies, lms_user=lms_user, modeus_jwt_token=donor_token,
     )
-    if isinstance(cached_calendar, schema.CalendarResponse):
-        return cached_calendar.change_timezone(time_zone)
-    # else cached
-    return schema.CalendarResponse.model_validate(cached_calendar).change_timezone(time_zone)
+    return calendar.change_timezone(time_zone)
+
+
+@router.get("/events/stream/")
+async def stream_calendar(
+        body: Annotated[modeus_schema.ModeusTimeBody, Depends(modeus_schema.get_time_from_query)],
+        lms_user: Annotated[lms_schema.User, Depends(lms_schema.get_user)],
+        cookies: Annotated[netology_schema.NetologyCookies, Depends(netology_schema.get_cookies_from_headers)],
+        donor_token: Annotated[str, Depends(modeus_integration.get_donor_token)],
+        modeus_person_id: Annotated[str, Header()],
+        calendar_id: int = settings.netology_default_course_id,
+        time_zone: str = "Europe/Moscow",
+) -> StreamingResponse:
+    """
+    Get events as NDJSON: section frame per source as soon as it's ready, then summary frame.
+    """
+    timezone = schema.get_timezone(time_zone)
+    integration.save_user_was_there(modeus_person_id, schema.ActivitySource.STREAM)
+    return StreamingResponse(
+        integration.stream_calendar(
+            body, calendar_id, modeus_person_id,
+            lms_user=lms_user, cookies=cookies, modeus_jwt_token=donor_token, timezone=timezone,
+        ),
+        media_type="application/x-ndjson",
+    )
 
 
-@router.get("/refresh_events/")
+@router.get("/refresh_events/", response_model=schema.RefreshedCalendarResponse)
 async def refresh_calendar(
         body: Annotated[modeus_schema.ModeusTimeBody, Depends(modeus_schema.get_time_from_query)],
         lms_user: Annotated[lms_schema.User, Depends(lms_schema.get_user)],
@@ -54,13 +128,20 @@ async def refresh_calendar(
         donor_token: Annotated[str, Depends(modeus_integration.get_donor_token)],
         modeus_person_id: Annotated[str, Header()],        calendar_id: int = settings.netology_default_course_id,
         time_zone: str = "Europe/Moscow",
-) -> schema.RefreshedCalendarResponse:
+        if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
     """
     Refresh events in redis.
+
+    Calendar is fetched anyway, but unchanged one is answered with 304 by If-None-Match.
     """
-    return await integration.refresh_events(
+    calendar = await integration.refresh_events(
         body, lms_user, calendar_id, cookies, time_zone, donor_token, modeus_person_id,
     )
+    etag = calendar.get_etag(schema.get_timezone(time_zone))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return Response(calendar.model_dump_json(by_alias=True), media_type="application/json", headers={"ETag": etag})
 
 
 @router.get("/export_ics/")
@@ -72,25 +153,81 @@ async def export_ics(
         modeus_person_id: Annotated[str, Header()],
         calendar_id: int = settings.netology_default_course_id,
         time_zone: str = "Europe/Moscow",
-
-) -> StreamingResponse:
+        if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
     """
-    Export into .ics format
+    Export into .ics format, unchanged calendar is answered with 304 by If-None-Match.
     """
+    timezone = schema.get_timezone(time_zone)
     calendar = await integration.get_calendar(
         body, calendar_id, modeus_person_id,
         modeus_jwt_token=donor_token, lms_user=lms_user, cookies=cookies,
     )
     calendar_with_timezone = calendar.change_timezone(time_zone)
-    return StreamingResponse(integration.export_to_ics(calendar_with_timezone))
+    etag = calendar_with_timezone.get_etag(timezone, media_type="ics")
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return StreamingResponse(integration.export_to_ics(calendar_with_timezone), headers={"ETag": etag})
+
+
+@router.post("/subscription/")
+async def create_subscription(
+        lms_user: Annotated[lms_schema.User, Depends(lms_schema.get_user)],
+        cookies: Annotated[netology_schema.NetologyCookies, Depends(netology_schema.get_cookies_from_headers)],
+        modeus_person_id: Annotated[str, Header()],
+        redis: Annotated[ConnectionPool, Depends(get_redis_pool)],
+        calendar_id: int = settings.netology_default_course_id,
+        time_zone: str = "Europe/Moscow",
+) -> schema.SubscriptionResponse:
+    """
+    Create ICS subscription URL for calendar apps, credentials are kept server-side by its token.
+    """
+    schema.get_timezone(time_zone)
+    token = await integration.create_subscription(redis, schema.SubscriptionCredentials(
+        person_id=modeus_person_id, calendar_id=calendar_id, time_zone=time_zone, lms_user=lms_user, cookies=cookies,
+    ))
+    prefetcher.schedule(modeus_person_id)
+    url = f"{settings.app_domain}/api/bulk/subscription/{token}.ics"
+    return schema.SubscriptionResponse(url=url, webcal_url=f"webcal://{url.split('://', 1)[-1]}")
+
+
+@router.get("/subscription/{token}.ics")
+async def get_subscription_feed(
+        token: str,
+        donor_token: Annotated[str, Depends(modeus_integration.get_donor_token)],
+        redis: Annotated[ConnectionPool, Depends(get_redis_pool)],
+        if_none_match: Annotated[str | None, Header()] = None,
+        if_modified_since: Annotated[str | None, Header()] = None,
+) -> Response:
+    """
+    ICS feed of subscription for several weeks around today, built from cached calendars.
+    """
+    feed = await integration.get_subscription_feed(redis, token, donor_token)
+    headers = {"Last-Modified": format_http_date(feed.last_modified)}
+    # If-Modified-Since is only used without If-None-Match
+    if etag_matches(if_none_match, feed.etag) or (
+            if_none_match is None and not_modified_since(if_modified_since, feed.last_modified)):
+        return not_modified(feed.etag, headers)
+    return Response(feed.ics, media_type="text/calendar", headers={**headers, "ETag": feed.etag})
+
+
+@router.delete("/subscription/{token}.ics")
+async def delete_subscription(
+        token: str,
+        redis: Annotated[ConnectionPool, Depends(get_redis_pool)],
+) -> None:
+    """
+    Revoke subscription, its URL stops working.
+    """
+    await integration.delete_subscription(redis, token)
 
 
 @router.get("/user_metrix/")
 async def get_user_metrix(
     redis: Annotated[ConnectionPool, Depends(get_redis_pool)],
     _: Annotated[None, Depends(verify_tutor_token)],
-) -> int:
+) -> schema.UserMetrix:
     """
-    Get week users metrix
+    Get unique users for day, week and 30 days, in total and by endpoint.
     """
-    return await integration.count_keys_by_prefix(redis_pool=redis)
+    return await integration.get_user_metrix(redis, schema.now_dt_utc().date())
@@ -1,15 +1,19 @@
 """Netology API implementation."""
 import asyncio
-from typing import Any
+import functools
+from typing import Any, cast
 
-import httpx
-import reretry
 from fastapi import HTTPException
 from httpx import AsyncClient
 from pydantic import TypeAdapter
 from starlette import status
 
 from yet_another_calendar.settings import settings
+from yet_another_calendar.web.bulkhead import bulkheads
+from yet_another_calendar.web.cache_layers import cache_layer
+from yet_another_calendar.web.circuit_breaker import circuit_breakers
+from yet_another_calendar.web.http_clients import Upstream, http_clients
+from yet_another_calendar.web.retry import is_idempotent, retry_policies
 from . import schema
 from ..modeus.schema import ModeusTimeBody
 
@@ -23,7 +27,7 @@ def raise_error(serialized_response: dict[str, Any]) -> None:
                             status_code=status.HTTP_400_BAD_REQUEST)
 
 
-@reretry.retry(exceptions=httpx.TransportError, tries=settings.retry_tries, delay=settings.retry_delay)
+@retry_policies[Upstream.LMS].retry()
 async def get_token(creds: schema.LxpCreds, timeout: int = 15) -> str:
     """
     Auth in lms, required username and password.
@@ -41,22 +45,30 @@ async def get_token(creds: schema.LxpCreds, timeout: int = 15) -> str:
         return serialized_response['token']
 
 
-@reretry.retry(exceptions=httpx.TransportError, tries=settings.retry_tries, delay=settings.retry_delay)
 async def send_request(
-        request_settings: dict[str, Any], timeout: int = 15) -> dict[str, Any] | list[dict[str, Any]]:
-    """Send request from httpx."""
-    async with AsyncClient(
-        http2=True,
-        base_url=settings.lms_base_url,
-        timeout=timeout,
-    ) as session:
-        response = await session.request(**request_settings)
+        request_settings: dict[str, Any], timeout: int = 15,
+        idempotent: bool | None = None,
+) -> dict[str, Any] | list[dict[str, Any]]:
+    """Send request from httpx, retry idempotent requests."""
+    if idempotent is None:
+        idempotent = is_idempotent(request_settings['method'])
+    return await retry_policies[Upstream.LMS].run(
+        functools.partial(_send_request, request_settings, timeout), idempotent=idempotent,
+    )
+
+
+async def _send_request(
+        request_settings: dict[str, Any], timeout: int) -> dict[str, Any] | list[dict[str, Any]]:
+    """Single attempt of send_request."""
+    session = http_clients.get(Upstream.LMS)
+    async with bulkheads[Upstream.LMS].acquire(), circuit_breakers[Upstream.LMS].guard():
+        response = await session.request(**request_settings, timeout=timeout)
         response.raise_for_status()
-        serialized_response = response.json()
-        if isinstance(serialized_response, list):
-            return serialized_response
-        raise_error(serialized_response)
+    serialized_response = response.json()
+    if isinstance(serialized_response, list):
         return serialized_response
+    raise_error(serialized_response)
+    return serialized_response
 
 
 async def get_user_info(token: str, username: str) -> list[dict[str, Any]]:
@@ -69,8 +81,8 @@ async def get_user_info(token: str, username: str) -> list[dict[str, Any]]:
                        "values[0]": username,
                        "wstoken": token,
                        "moodlewsrestformat": "json"},
-        })
-    return response
+        }, idempotent=True)
+    return cast(list[dict[str, Any]], response)
 
 
 async def auth_lms(creds: schema.LxpCreds) -> schema.User:
@@ -97,6 +109,14 @@ async def get_courses(user: schema.User) -> list[schema.Course]:
     return adapter.validate_python(response)
 
 
+def _course_key(user: schema.User, course_id: int) -> tuple[Any, ...]:
+    # Modules have per-user completion state
+    return course_id, user.id
+
+
+@cache_layer(
+    "lms_course", list[schema.ExtendedCourse], expire=settings.redis_lms_course_time_live, key=_course_key,
+)
 async def get_extended_course(user: schema.User, course_id: int) -> list[schema.ExtendedCourse]:
     """Get extended course with modules and deadlines."""
     response = await send_request(
@@ -109,7 +129,7 @@ async def get_extended_course(user: schema.User, course_id: int) -> list[schema.
                 'courseid': course_id,
                 'moodlewsrestformat': 'json',
             },
-        })
+        }, idempotent=True)
     adapter = TypeAdapter(list[schema.ExtendedCourse])
     return adapter.validate_python(response)
 
@@ -1,10 +1,10 @@
 """Modeus API implementation."""
+import functools
 import re
 from secrets import token_hex
 from typing import Any
 
 import httpx
-import reretry
 from bs4 import BeautifulSoup, Tag
 from fastapi import HTTPException
 from fastapi_cache.decorator import cache
@@ -13,7 +13,13 @@ from starlette import status
 from loguru import logger
 
 from yet_another_calendar.settings import settings
+from yet_another_calendar.web.bulkhead import bulkheads
+from yet_another_calendar.web.cache_layers import cache_layer
+from yet_another_calendar.web.circuit_breaker import circuit_breakers
 from yet_another_calendar.web.cache_builder import key_builder
+from yet_another_calendar.web.http_clients import Upstream, http_clients
+from yet_another_calendar.web.invalidation_bus import invalidation_bus
+from yet_another_calendar.web.retry import retry_policies
 from .schema import (
     ModeusCalendar, Creds, get_person_id,
     FullEvent, FullModeusPersonSearch, SearchPeople, ExtendedPerson, ModeusEventsBody,
@@ -71,7 +77,7 @@ async def get_auth_form(session: AsyncClient, username: str, password: str) -> T
     return form
 
 
-@reretry.retry(exceptions=httpx.TransportError, tries=settings.retry_tries, delay=settings.retry_delay)
+@retry_policies[Upstream.MODEUS].retry()
 async def login(username: str, __password: str, timeout: int = 15) -> str:
     """
     Log in Modeus.
@@ -120,26 +126,49 @@ def _extract_token_from_url(url: str, match_index: int = 1) -> str | None:
     return match[match_index]
 
 
-@reretry.retry(exceptions=httpx.TransportError, tries=settings.retry_tries, delay=settings.retry_delay)
-async def post_modeus(__jwt: str, body: Any, url_part: str, timeout: int = 15) -> str:
+async def post_modeus(__jwt: str, body: Any, url_part: str, timeout: int = 15, idempotent: bool = False) -> str:
     """
-    Post into modeus.
+    Post into modeus, retried after it was sent only if `idempotent`, e.g. for searches.
     """
-    async with AsyncClient(
-        http2=True,
-        base_url=settings.modeus_base_url,
-        timeout=timeout,
-    ) as session:
-        session.headers["Authorization"] = f"Bearer {__jwt}"
-        session.headers["content-type"] = "application/json"
+    return await retry_policies[Upstream.MODEUS].run(
+        functools.partial(_post_modeus, __jwt, body, url_part, timeout), idempotent=idempotent,
+    )
+
+
+async def _post_modeus(__jwt: str, body: Any, url_part: str, timeout: int) -> str:
+    """Single attempt of post_modeus."""
+    session = http_clients.get(Upstream.MODEUS)
+    async with bulkheads[Upstream.MODEUS].acquire(), circuit_breakers[Upstream.MODEUS].guard():
         response = await session.post(
             url_part,
             content=body.model_dump_json(by_alias=True),
+            headers={
+                "Authorization": f"Bearer {__jwt}",
+                "content-type": "application/json",
+            },
+            timeout=timeout,
         )
         if response.status_code == status.HTTP_401_UNAUTHORIZED:
             raise HTTPException(detail='Modeus token expired!', status_code=response.status_code)
         response.raise_for_status()
-        return response.text
+    return response.text
+
+
+def _events_key(body: ModeusEventsBody, __jwt: str) -> tuple[Any, ...]:
+    person_ids = ",".join(sorted(str(person_id) for person_id in body.attendee_person_id))
+    return person_ids, body.time_min.date(), body.time_max.date()
+
+
+def _events_users(body: ModeusEventsBody, __jwt: str) -> list[str]:
+    return [str(person_id) for person_id in body.attendee_person_id]
+
+
+@cache_layer(
+    "modeus_events", str, expire=settings.redis_modeus_events_time_live, key=_events_key, users=_events_users,
+)
+async def search_events(body: ModeusEventsBody, __jwt: str) -> str:
+    """Raw events of persons for week, teachers are joined on serialization."""
+    return await post_modeus(__jwt, body, settings.modeus_search_events_part, idempotent=True)
 
 
 async def get_events(
@@ -149,7 +178,7 @@ async def get_events(
 ) -> list[FullEvent]:
     """Get events for student in modeus"""
 
-    response = await post_modeus(__jwt, body, settings.modeus_search_events_part)
+    response = await search_events(body, __jwt)
     modeus_calendar = ModeusCalendar.model_validate_json(response)
     teachers = await utmn_integration.get_all_teachers()
     return modeus_calendar.serialize_modeus_response(teachers_profiles=teachers)
@@ -161,12 +190,12 @@ async def get_people(
 ) -> list[ExtendedPerson]:
     """Get people from modeus"""
 
-    response = await post_modeus(__jwt, body, settings.modeus_search_people_part)
+    response = await post_modeus(__jwt, body, settings.modeus_search_people_part, idempotent=True)
     search_people = SearchPeople.model_validate_json(response)
     return search_people.serialize_modeus_response()
 
 
-@cache(expire=settings.redis_jwt_time_live, key_builder=key_builder)  # 12 hours
+@cache(expire=settings.redis_jwt_time_live, key_builder=key_builder, namespace=settings.redis_donor_prefix)  # 12 hours
 async def get_donor_token() -> str:
     """Get donor account token (cached for 12 hours)."""
     if not settings.modeus_username or not settings.modeus_password:
@@ -181,6 +210,8 @@ async def get_donor_token() -> str:
         settings.modeus_password,
     )
     logger.info("Donor account authenticated successfully")
+    # Other workers may still hold the old token in L1
+    await invalidation_bus.publish(namespace=settings.redis_donor_prefix)
     return token
 
 
@@ -190,8 +221,9 @@ async def get_day_events(jwt: str, payload: dict[str, str]) -> list[FullEvent]:
         "Accept": "application/json",
         "Content-Type": "application/json",
     }
-    async with AsyncClient(base_url=settings.modeus_base_url, timeout=30) as client:
-        resp = await client.post(settings.modeus_search_events_part, json=payload, headers=headers)
+    client = http_clients.get(Upstream.MODEUS)
+    async with bulkheads[Upstream.MODEUS].acquire(), circuit_breakers[Upstream.MODEUS].guard():
+        resp = await client.post(settings.modeus_search_events_part, json=payload, headers=headers, timeout=30)
         resp.raise_for_status()
 
     calendar = ModeusCalendar.model_validate_json(resp.text)
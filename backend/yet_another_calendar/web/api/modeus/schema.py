@@ -67,6 +67,22 @@ class ModeusTimeBody(BaseModel):
         """Create dump with date."""
         return {'timeMax': self.time_max.date(), 'timeMin': self.time_min.date()}
 
+    def count_weeks(self) -> int:
+        """Number of Monday-Sunday weeks, without building them."""
+        return (self.time_max - self.time_min).days // 7 + 1
+
+    def split_weeks(self) -> list["ModeusTimeBody"]:
+        """Split into Monday-Sunday weeks, equal to bodies of single week requests."""
+        weeks = []
+        week_start = self.time_min
+        while week_start < self.time_max:
+            weeks.append(ModeusTimeBody.model_validate({
+                "timeMin": week_start,
+                "timeMax": week_start + datetime.timedelta(days=6),
+            }))
+            week_start += datetime.timedelta(days=7)
+        return weeks
+
 
 # noinspection PyNestedDecorators
 class ModeusEventsBody(ModeusTimeBody):
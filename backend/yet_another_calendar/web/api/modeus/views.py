@@ -7,6 +7,7 @@ from fastapi import APIRouter, Depends, Header
 
 from yet_another_calendar.web.api.auth.rate_limiter import rate_limited_dependency
 from yet_another_calendar.web.api.auth.utils import verify_tutor_token
+from yet_another_calendar.web.prefetch import prefetcher
 from . import integration
 from . import schema
 
@@ -44,8 +45,9 @@ async def get_modeus_person_id(
     _: None = Depends(rate_limited_dependency),
 ) -> str:
     """
-    Get modeus person id.
+    Get modeus person id, upcoming weeks of person are prefetched in background.
     """
+    prefetcher.schedule(person_id)
     return person_id
 
 @router.post(
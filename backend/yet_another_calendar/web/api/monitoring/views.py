@@ -1,4 +1,10 @@
-from fastapi import APIRouter
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
+
+from yet_another_calendar.web.api.auth.utils import verify_tutor_token
+from yet_another_calendar.web.bulkhead import BulkheadStats, get_bulkheads_stats
+from yet_another_calendar.web.l1_cache import L1Stats, get_l1_stats
 
 router = APIRouter()
 
@@ -10,3 +16,23 @@ def health_check() -> None:
 
     It returns 200 if the project is healthy.
     """
+
+
+@router.get("/health/upstreams")
+def upstreams_health(
+        _: Annotated[None, Depends(verify_tutor_token)],
+) -> dict[str, BulkheadStats]:
+    """
+    Get in-flight requests, queue length and wait time for every upstream.
+    """
+    return get_bulkheads_stats()
+
+
+@router.get("/health/cache")
+def cache_health(
+        _: Annotated[None, Depends(verify_tutor_token)],
+) -> dict[str, L1Stats]:
+    """
+    Get hits, misses and memory of in-process cache for every namespace.
+    """
+    return get_l1_stats()
@@ -6,6 +6,7 @@ from starlette import status
 from loguru import logger
 
 from yet_another_calendar.settings import settings
+from yet_another_calendar.web.write_buffer import write_buffer
 
 LINK_KEY_PREFIX: str = "mtslink"
 
@@ -26,6 +27,8 @@ async def get_link(redis_pool: ConnectionPool, lesson_id: uuid.UUID) -> str:
         url = (await redis.get(_key(lesson_id)))
     if not url:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="URL for this lesson is not found")
+    # Opened link is kept while it's used, touch is buffered
+    write_buffer.add(("EXPIRE", _key(lesson_id), settings.redis_events_time_live))
     return url.decode()
 
 
@@ -1,20 +1,25 @@
 """Netology API implementation."""
 import asyncio
+import functools
 from collections import defaultdict
 from typing import Any
 
-import httpx
-import reretry
 from fastapi import HTTPException
 from httpx import AsyncClient
 from starlette import status
 
 from yet_another_calendar.settings import settings
+from yet_another_calendar.web.bulkhead import bulkheads
+from yet_another_calendar.web.cache_layers import cache_layer
+from yet_another_calendar.web.circuit_breaker import circuit_breakers
+from yet_another_calendar.web.http_clients import Upstream, http_clients
+from yet_another_calendar.web.retry import is_idempotent, retry_policies
+from yet_another_calendar.web.single_flight import single_flight
 from . import schema
 from ..modeus.schema import ModeusTimeBody
 
 
-@reretry.retry(exceptions=httpx.TransportError, tries=settings.retry_tries, delay=settings.retry_delay)
+@retry_policies[Upstream.NETOLOGY].retry()
 async def auth_netology(username: str, password: str, timeout: int = 15) -> schema.NetologyCookies:
     """
     Auth in Netology, required username and password.
@@ -45,19 +50,32 @@ async def auth_netology(username: str, password: str, timeout: int = 15) -> sche
         return schema.NetologyCookies(**session.cookies)
 
 
-@reretry.retry(exceptions=httpx.TransportError, tries=settings.retry_tries, delay=settings.retry_delay)
 async def send_request(
-        cookies: schema.NetologyCookies, request_settings: dict[str, Any], timeout: int = 15) -> dict[str, Any]:
-    """Send request from httpx."""
-    async with AsyncClient(
-            http2=True, base_url=settings.netology_base_url, timeout=timeout,
-    ) as session:
-        session.cookies = httpx.Cookies(cookies.model_dump(by_alias=True))
-        response = await session.request(**request_settings)
+        cookies: schema.NetologyCookies, request_settings: dict[str, Any], timeout: int = 15,
+        idempotent: bool | None = None,
+) -> dict[str, Any]:
+    """Send request from httpx, retry idempotent requests."""
+    if idempotent is None:
+        idempotent = is_idempotent(request_settings['method'])
+    return await retry_policies[Upstream.NETOLOGY].run(
+        functools.partial(_send_request, cookies, request_settings, timeout), idempotent=idempotent,
+    )
+
+
+async def _send_request(
+        cookies: schema.NetologyCookies, request_settings: dict[str, Any], timeout: int) -> dict[str, Any]:
+    """Single attempt of send_request."""
+    session = http_clients.get(Upstream.NETOLOGY)
+    async with bulkheads[Upstream.NETOLOGY].acquire(), circuit_breakers[Upstream.NETOLOGY].guard():
+        response = await session.request(
+            **request_settings,
+            headers={"Cookie": cookies.to_header()},
+            timeout=timeout,
+        )
         if response.status_code == status.HTTP_401_UNAUTHORIZED:
             raise HTTPException(detail='Netology error. Cookies expired.', status_code=response.status_code)
         response.raise_for_status()
-        return response.json()
+    return response.json()
 
 
 async def get_netology_courses(cookies: schema.NetologyCookies) -> schema.CoursesResponse:
@@ -82,6 +100,15 @@ async def get_utmn_course(cookies: schema.NetologyCookies) -> schema.NetologyPro
 
 
 
+def _program_key(cookies: schema.NetologyCookies, program_id: int) -> tuple[Any, ...]:
+    # Lessons have per-user `passed`, so schedule is shared only within session
+    return program_id, cookies.get_digest()
+
+
+@cache_layer(
+    "netology_program", schema.CalendarResponse, expire=settings.redis_netology_program_time_live, key=_program_key,
+)
+@single_flight("netology_events")
 async def get_events_by_id(
         cookies: schema.NetologyCookies,
         program_id: int,
@@ -97,6 +124,7 @@ async def get_events_by_id(
     return schema.CalendarResponse.model_validate(response)
 
 
+@single_flight("netology_program_ids")
 async def get_program_ids(
         cookies: schema.NetologyCookies,
         calendar_id: int,
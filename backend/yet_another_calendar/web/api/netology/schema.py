@@ -1,4 +1,5 @@
 import datetime
+import hashlib
 import re
 from typing import Annotated, Any
 from urllib.parse import urljoin
@@ -23,6 +24,14 @@ class NetologyCreds(BaseModel):
 class NetologyCookies(BaseModel):
     rails_session: str = Field(alias="_netology-on-rails_session")
 
+    def to_header(self) -> str:
+        """Cookie header value, shared client doesn't keep per-user cookies."""
+        return "; ".join(f"{name}={value}" for name, value in self.model_dump(by_alias=True).items())
+
+    def get_digest(self) -> str:
+        """Identifies session in cache keys without storing it."""
+        return hashlib.sha256(self.rails_session.encode()).hexdigest()[:16]
+
 
 async def get_cookies_from_headers(
         rails_session: Annotated[str, Header(alias="_netology-on-rails_session")],
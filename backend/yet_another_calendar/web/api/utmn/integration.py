@@ -1,19 +1,21 @@
 """UTMN API implementation."""
 import asyncio
 
-import httpx
-import reretry
 from bs4 import BeautifulSoup
-from httpx import AsyncClient
 from fastapi_cache.decorator import cache
 from loguru import logger
 from pydantic import TypeAdapter
 
 from yet_another_calendar.settings import settings
+from yet_another_calendar.web.bulkhead import bulkheads
+from yet_another_calendar.web.circuit_breaker import circuit_breakers
+from yet_another_calendar.web.http_clients import Upstream, http_clients
+from yet_another_calendar.web.retry import retry_policies
+from yet_another_calendar.web.single_flight import single_flight
 from yet_another_calendar.web.api.utmn import schema
 
 
-@reretry.retry(exceptions=httpx.TransportError, tries=settings.retry_tries, delay=settings.retry_delay)
+@retry_policies[Upstream.UTMN].retry(idempotent=True)
 async def get_teachers_by_page(timeout: int = 30, page: int = 1) -> dict[str, schema.Teacher]:
     """
     Fetch teacher information from UTMN website.
@@ -22,8 +24,9 @@ async def get_teachers_by_page(timeout: int = 30, page: int = 1) -> dict[str, sc
         Dict[str, Teacher]: Dictionary where keys are teacher names (ФИО)
         and values are Teacher objects with avatar_profile and profile_url.
     """
-    async with AsyncClient(http2=True, base_url=settings.utmn_base_url, timeout=timeout) as client:
-        response = await client.get(settings.utmn_get_teachers_part.format(page=page))
+    client = http_clients.get(Upstream.UTMN)
+    async with bulkheads[Upstream.UTMN].acquire(), circuit_breakers[Upstream.UTMN].guard():
+        response = await client.get(settings.utmn_get_teachers_part.format(page=page), timeout=timeout)
         response.raise_for_status()
 
     soup = BeautifulSoup(response.text, 'html.parser')
@@ -49,7 +52,8 @@ async def get_teachers_by_page(timeout: int = 30, page: int = 1) -> dict[str, sc
 
     return teachers
 
-@cache(expire=settings.redis_utmn_teachers_time_live)
+@cache(expire=settings.redis_utmn_teachers_time_live, namespace=settings.redis_utmn_teachers_prefix)
+@single_flight("utmn_teachers", result_type=dict[str, schema.Teacher])
 async def get_all_teachers_cached(timeout: int = 30, per_page: int = 5) -> dict[str, schema.Teacher]:
     """
     Fetch teacher information from UTMN website.
@@ -0,0 +1,94 @@
+"""Per-upstream concurrency limits (bulkheads)."""
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+from loguru import logger
+from pydantic import BaseModel
+from starlette import status
+
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.http_clients import Upstream
+
+
+class BulkheadStats(BaseModel):
+    """Current load of one upstream bulkhead."""
+
+    in_flight: int
+    queued: int
+    max_in_flight: int
+    max_queue: int
+    rejected: int
+    last_wait: float
+    max_wait: float
+
+
+class Bulkhead:
+    """
+    Limits in-flight requests to one upstream.
+
+    Requests above `max_in_flight` wait in queue, requests above `max_queue`
+    are rejected at once, so one slow upstream can't eat all sockets and tasks.
+    """
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int) -> None:
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncGenerator[None, None]:
+        """Hold a slot while making request."""
+        if self._semaphore.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"Bulkhead {self.name} is full: {self.in_flight} in flight, {self.queued} queued")
+            raise HTTPException(
+                detail=f"{self.name} is overloaded, try again later.",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        self.queued += 1
+        started_at = time.monotonic()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.last_wait = time.monotonic() - started_at
+        self.max_wait = max(self.max_wait, self.last_wait)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> BulkheadStats:
+        return BulkheadStats(
+            in_flight=self.in_flight,
+            queued=self.queued,
+            max_in_flight=self.max_in_flight,
+            max_queue=self.max_queue,
+            rejected=self.rejected,
+            last_wait=self.last_wait,
+            max_wait=self.max_wait,
+        )
+
+
+bulkheads = {
+    Upstream.MODEUS: Bulkhead("Modeus", settings.modeus_max_in_flight, settings.modeus_max_queue),
+    Upstream.NETOLOGY: Bulkhead("Netology", settings.netology_max_in_flight, settings.netology_max_queue),
+    Upstream.LMS: Bulkhead("LMS", settings.lms_max_in_flight, settings.lms_max_queue),
+    Upstream.UTMN: Bulkhead("UTMN", settings.utmn_max_in_flight, settings.utmn_max_queue),
+}
+
+
+def get_bulkheads_stats() -> dict[str, BulkheadStats]:
+    """Load of all upstream bulkheads."""
+    return {upstream.value: bulkhead.stats() for upstream, bulkhead in bulkheads.items()}
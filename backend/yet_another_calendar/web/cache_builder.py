@@ -1,10 +1,47 @@
+import functools
 import hashlib
+import json
+import time
+import typing
 from typing import Any
 from collections.abc import Callable
 
+from loguru import logger
+from pydantic import TypeAdapter
+from pydantic_core import to_jsonable_python
+from redis.asyncio import ConnectionPool, Redis
 from starlette.requests import Request
 from starlette.responses import Response
 
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.invalidation_bus import invalidation_bus
+from yet_another_calendar.web.l1_cache import l1_cache
+
+
+def canonical_dump(value: Any) -> str:
+    """JSON of field values with sorted keys, doesn't depend on reprs and field order."""
+    return json.dumps(
+        to_jsonable_python(value, by_alias=True, fallback=str),
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+
+
+@functools.cache
+def get_schema_version(func: Callable[..., Any]) -> str:
+    """
+    Manual cache_schema_version plus digest of return type JSON schema.
+
+    Any change of cached model gives new keys instead of reading entries of old shape.
+    """
+    try:
+        return_type = typing.get_type_hints(func).get("return", Any)
+        schema = canonical_dump(TypeAdapter(return_type).json_schema())
+    except Exception as exception:
+        logger.warning(f"Can't build schema of {func.__qualname__}: {exception!r}")
+        schema = ""
+    digest = hashlib.md5(schema.encode()).hexdigest()[:8]
+    return f"v{settings.cache_schema_version}.{digest}"
+
 
 def key_builder(
     func: Callable[..., Any],
@@ -16,7 +53,63 @@ def key_builder(
     kwargs: dict[str, Any],
 ) -> str:
     cache_key = hashlib.md5(
-        f"{func.__module__}:{func.__name__}:{args}".encode(),
+        f"{func.__module__}:{func.__qualname__}:{canonical_dump(args)}".encode(),
     ).hexdigest()
-    return f"{namespace}:{cache_key}"
+    return f"{namespace}:{get_schema_version(func)}:{cache_key}"
+
+
+class KeyIndex:
+    """
+    Reverse index from user to his cache keys, for targeted invalidation.
+
+    Keys are scored by their expiry time, expired ones are trimmed on every add,
+    so index of active user doesn't grow. Without Redis it's a no-op.
+    """
+
+    def __init__(self) -> None:
+        self.redis_pool: ConnectionPool | None = None
+
+    @staticmethod
+    def _index_key(user_id: str) -> str:
+        return f"{settings.redis_prefix}:{settings.redis_key_index_prefix}:{user_id}"
+
+    async def add(self, user_id: str, *keys: str, expire: int = settings.redis_events_time_live) -> None:
+        """Index keys which expire in `expire` seconds."""
+        if self.redis_pool is None or not keys:
+            return
+        index_key = self._index_key(user_id)
+        now = time.time()
+        async with Redis(connection_pool=self.redis_pool) as redis:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.zadd(index_key, dict.fromkeys(keys, now + expire))
+                pipe.zremrangebyscore(index_key, "-inf", now)
+                pipe.expire(index_key, settings.redis_events_time_live)
+                await pipe.execute()
+
+    async def get_keys(self, user_id: str) -> set[str]:
+        """Keys of user which aren't expired yet."""
+        if self.redis_pool is None:
+            return set()
+        async with Redis(connection_pool=self.redis_pool) as redis:
+            keys = await redis.zrangebyscore(self._index_key(user_id), time.time(), "+inf")
+        return {key.decode() if isinstance(key, bytes) else key for key in keys}
+
+    async def invalidate(self, user_id: str) -> int:
+        """Delete all cached entries of user, returns number of deleted keys."""
+        keys = await self.get_keys(user_id)
+        if self.redis_pool is None:
+            return 0
+        async with Redis(connection_pool=self.redis_pool) as redis:
+            deleted = await redis.delete(*keys) if keys else 0
+            await redis.delete(self._index_key(user_id))
+        l1_cache.discard(*keys)
+        await invalidation_bus.publish(*keys)
+        logger.info(f"Invalidated {deleted} cached keys of {user_id}")
+        return int(deleted)
+
+
+key_index = KeyIndex()
+
 
+def init_key_index(redis_pool: ConnectionPool | None) -> None:
+    key_index.redis_pool = redis_pool
@@ -0,0 +1,54 @@
+"""Compact coder for large cached values."""
+import json
+import zlib
+from typing import Any
+
+from fastapi_cache.coder import Coder, JsonCoder
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from yet_another_calendar.settings import settings
+
+MAGIC = b"YAC\x01"
+
+
+class CompactCoder(Coder):
+    """
+    Compact JSON compressed with zlib, prefixed with magic header.
+
+    Computed fields aren't stored, they are computed again on validation.
+    Values without header are decoded as JsonCoder did, so old entries stay readable.
+    """
+
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        if isinstance(value, BaseModel):
+            payload = value.model_dump_json(by_alias=True, exclude_computed_fields=True).encode()
+        else:
+            payload = to_json(value, by_alias=True)
+        return MAGIC + zlib.compress(payload, settings.cache_compression_level)
+
+    @classmethod
+    def decode(cls, value: bytes) -> Any:
+        raw = cls.decode_raw(value)
+        if raw is None:
+            return JsonCoder.decode(value)
+        return json.loads(raw)
+
+    @staticmethod
+    def decode_raw(value: bytes) -> bytes | None:
+        """JSON of own entry to validate straight from bytes, None for old entries."""
+        if not value.startswith(MAGIC):
+            return None
+        return zlib.decompress(value[len(MAGIC):])
+
+
+coders: dict[str, type[Coder]] = {
+    "json": JsonCoder,
+    "compact": CompactCoder,
+}
+
+
+def get_calendar_coder() -> type[Coder]:
+    """Coder for cached calendars, chosen by calendar_cache_coder setting."""
+    return coders[settings.calendar_cache_coder]
@@ -0,0 +1,109 @@
+"""Per-entity caches of upstream responses."""
+import contextlib
+import functools
+from collections.abc import Callable, Coroutine, Iterable, Iterator
+from contextvars import ContextVar
+from typing import Any, ParamSpec, TypeVar
+
+from fastapi_cache import FastAPICache
+from loguru import logger
+from pydantic import TypeAdapter, ValidationError
+
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.cache_builder import key_index
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+# Explicit refresh must reach upstreams, fetched values are still stored
+_bypass_reads: ContextVar[bool] = ContextVar("bypass_cache_layers", default=False)
+
+
+@contextlib.contextmanager
+def bypass_cache_layers() -> Iterator[None]:
+    """Fetch everything from upstreams and overwrite cached entities."""
+    token = _bypass_reads.set(True)
+    try:
+        yield
+    finally:
+        _bypass_reads.reset(token)
+
+
+class CacheLayer:
+    """
+    Caches one upstream entity (e.g. program schedule) with its own time live.
+
+    `key` maps call arguments to entity identity, so callers with different
+    arguments share an entry. `users` maps them to users the entry belongs to,
+    so it can be invalidated with their other keys. Cache errors are logged
+    and the call goes to upstream.
+    """
+
+    def __init__(
+            self,
+            namespace: str,
+            result_type: Any,
+            expire: int,
+            key: Callable[..., tuple[Any, ...]],
+            users: Callable[..., Iterable[str]] | None = None,
+    ) -> None:
+        self.namespace = namespace
+        self.adapter: TypeAdapter[Any] = TypeAdapter(result_type)
+        self.expire = expire
+        self.key = key
+        self.users = users
+
+    def make_key(self, *args: Any, **kwargs: Any) -> str:
+        parts = ":".join(str(part) for part in self.key(*args, **kwargs))
+        return f"{settings.redis_prefix}:{settings.cache_layers_prefix}:{self.namespace}:{parts}"
+
+    async def get(self, key: str) -> Any | None:
+        try:
+            cached = await FastAPICache.get_backend().get(key)
+        except Exception as exception:
+            logger.warning(f"Cache layer {self.namespace} can't read: {exception!r}")
+            return None
+        if cached is None:
+            return None
+        try:
+            return self.adapter.validate_json(cached)
+        except ValidationError:
+            logger.exception(f"Cache layer {self.namespace} has invalid entry")
+            return None
+
+    async def set(self, key: str, value: Any, users: Iterable[str] = ()) -> None:
+        try:
+            await FastAPICache.get_backend().set(key, self.adapter.dump_json(value, by_alias=True), self.expire)
+            for user_id in users:
+                await key_index.add(user_id, key, expire=self.expire)
+        except Exception as exception:
+            logger.warning(f"Cache layer {self.namespace} can't write: {exception!r}")
+
+    def __call__(self, func: Callable[P, Coroutine[Any, Any, T]]) -> Callable[P, Coroutine[Any, Any, T]]:
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            key = self.make_key(*args, **kwargs)
+            if not _bypass_reads.get():
+                cached = await self.get(key)
+                if cached is not None:
+                    return cached
+            value = await func(*args, **kwargs)
+            await self.set(key, value, self.users(*args, **kwargs) if self.users else ())
+            return value
+        return wrapper
+
+
+cache_layers: dict[str, CacheLayer] = {}
+
+
+def cache_layer(
+        namespace: str,
+        result_type: Any,
+        expire: int,
+        key: Callable[..., tuple[Any, ...]],
+        users: Callable[..., Iterable[str]] | None = None,
+) -> CacheLayer:
+    """Create cache layer, namespace must be unique."""
+    layer = CacheLayer(namespace, result_type, expire, key, users)
+    cache_layers[namespace] = layer
+    return layer
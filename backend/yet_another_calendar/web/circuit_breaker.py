@@ -0,0 +1,161 @@
+"""Per-upstream circuit breakers shared between workers through Redis."""
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import HTTPException
+from loguru import logger
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import RedisError
+from starlette import status
+
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.http_clients import Upstream
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """Upstream is broken, not the user's request."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR
+    return isinstance(exc, httpx.TransportError)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one upstream.
+
+    Closed: calls go through, results are counted in a rolling window.
+    Open: calls fail at once with 503 until `open_time` passes.
+    Half-open: a single probe call is let through by all workers,
+    its result closes or opens circuit again.
+
+    State lives in Redis, so all uvicorn workers trip together.
+    Without Redis breaker does nothing.
+    """
+
+    def __init__(
+            self, name: str, upstream: Upstream,
+            failure_rate: float = settings.circuit_breaker_failure_rate,
+            min_calls: int = settings.circuit_breaker_min_calls,
+            window: int = settings.circuit_breaker_window,
+            open_time: float = settings.circuit_breaker_open_time,
+            probe_timeout: int = settings.circuit_breaker_probe_timeout,
+    ) -> None:
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_time = open_time
+        self.probe_timeout = probe_timeout
+        self.redis_pool: ConnectionPool | None = None
+        self._key = f"{settings.circuit_breaker_prefix}:{upstream.value}"
+
+    @property
+    def _state_key(self) -> str:
+        return f"{self._key}:open_until"
+
+    @property
+    def _probe_key(self) -> str:
+        return f"{self._key}:probe"
+
+    def _calls_key(self, bucket: int) -> str:
+        return f"{self._key}:calls:{bucket}"
+
+    def _unavailable(self) -> HTTPException:
+        return HTTPException(
+            detail=f"{self.name} is unavailable, try again later.",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    async def _before_call(self, redis: Redis) -> bool:
+        """Raise if circuit is open, return True if this call is a half-open probe."""
+        open_until = await redis.get(self._state_key)
+        if open_until is None:
+            return False
+        if time.time() < float(open_until):
+            raise self._unavailable()
+        if not await redis.set(self._probe_key, 1, nx=True, ex=self.probe_timeout):
+            raise self._unavailable()
+        logger.info(f"Circuit {self.name} is half-open, sending probe")
+        return True
+
+    async def _open(self, redis: Redis) -> None:
+        bucket = int(time.time() // self.window)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._state_key, time.time() + self.open_time)
+            pipe.delete(self._probe_key, self._calls_key(bucket), self._calls_key(bucket - 1))
+            await pipe.execute()
+        logger.warning(f"Circuit {self.name} is open for {self.open_time} seconds")
+
+    async def _close(self, redis: Redis) -> None:
+        await redis.delete(self._state_key, self._probe_key)
+        logger.info(f"Circuit {self.name} is closed")
+
+    async def _record(self, redis: Redis, failed: bool, probe: bool) -> None:
+        if probe:
+            await (self._open(redis) if failed else self._close(redis))
+            return
+        bucket = int(time.time() // self.window)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hincrby(self._calls_key(bucket), "total", 1)
+            if failed:
+                pipe.hincrby(self._calls_key(bucket), "failures", 1)
+            pipe.expire(self._calls_key(bucket), self.window * 2)
+            pipe.hgetall(self._calls_key(bucket))
+            pipe.hgetall(self._calls_key(bucket - 1))
+            *_, current, previous = await pipe.execute()
+        if not failed:
+            return
+        total = sum(int(calls.get(b"total", 0)) for calls in (current, previous))
+        failures = sum(int(calls.get(b"failures", 0)) for calls in (current, previous))
+        if total >= self.min_calls and failures / total >= self.failure_rate:
+            await self._open(redis)
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncGenerator[None, None]:
+        """
+        Fail fast while circuit is open, count result of the call otherwise.
+
+        Guard is entered inside bulkhead slot, so local bulkhead rejections aren't counted as calls.
+        """
+        if self.redis_pool is None:
+            yield
+            return
+        async with Redis(connection_pool=self.redis_pool) as redis:
+            try:
+                probe = await self._before_call(redis)
+            except RedisError as exception:
+                logger.warning(f"Circuit {self.name} can't read state: {exception}")
+                probe = False
+            try:
+                yield
+            except asyncio.CancelledError:
+                if probe:
+                    await redis.delete(self._probe_key)
+                raise
+            except BaseException as exception:
+                await self._safe_record(redis, failed=is_upstream_failure(exception), probe=probe)
+                raise
+            await self._safe_record(redis, failed=False, probe=probe)
+
+    async def _safe_record(self, redis: Redis, failed: bool, probe: bool) -> None:
+        try:
+            await self._record(redis, failed, probe)
+        except RedisError as exception:
+            logger.warning(f"Circuit {self.name} can't save state: {exception}")
+
+
+circuit_breakers = {
+    Upstream.MODEUS: CircuitBreaker("Modeus", Upstream.MODEUS),
+    Upstream.NETOLOGY: CircuitBreaker("Netology", Upstream.NETOLOGY),
+    Upstream.LMS: CircuitBreaker("LMS", Upstream.LMS),
+    Upstream.UTMN: CircuitBreaker("UTMN", Upstream.UTMN),
+}
+
+
+def init_circuit_breakers(redis_pool: ConnectionPool | None) -> None:
+    """Share circuit state through Redis, None disables breakers."""
+    for circuit_breaker in circuit_breakers.values():
+        circuit_breaker.redis_pool = redis_pool
@@ -0,0 +1,45 @@
+"""Conditional responses by ETag and Last-Modified."""
+import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+
+from starlette import status
+from starlette.responses import Response
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Weak comparison of If-None-Match header with ETag, as RFC 9110 requires for it.
+
+    :param if_none_match: header value, "*" or comma separated ETags.
+    :param etag: quoted ETag of current representation.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def not_modified_since(if_modified_since: str | None, last_modified: datetime.datetime) -> bool:
+    """
+    Compare If-Modified-Since header with modification time, up to seconds as HTTP dates are.
+
+    Invalid date is ignored, as RFC 9110 requires.
+    """
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.UTC)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def format_http_date(value: datetime.datetime) -> str:
+    return format_datetime(value.astimezone(datetime.UTC), usegmt=True)
+
+
+def not_modified(etag: str, headers: dict[str, str] | None = None) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**(headers or {}), "ETag": etag})
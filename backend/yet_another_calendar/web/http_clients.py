@@ -0,0 +1,83 @@
+"""Shared HTTP clients for upstream services."""
+import enum
+from http.cookiejar import DefaultCookiePolicy
+
+import httpx
+from loguru import logger
+
+from yet_another_calendar.settings import settings
+
+
+class Upstream(str, enum.Enum):
+    """Upstream services we talk to."""
+
+    MODEUS = "modeus"
+    NETOLOGY = "netology"
+    LMS = "lms"
+    UTMN = "utmn"
+
+
+def create_client(upstream: Upstream) -> httpx.AsyncClient:
+    """Create long-lived client with its own pool for upstream."""
+    base_urls = {
+        Upstream.MODEUS: settings.modeus_base_url,
+        Upstream.NETOLOGY: settings.netology_base_url,
+        Upstream.LMS: settings.lms_base_url,
+        Upstream.UTMN: settings.utmn_base_url,
+    }
+    max_connections = {
+        Upstream.MODEUS: settings.modeus_max_connections,
+        Upstream.NETOLOGY: settings.netology_max_connections,
+        Upstream.LMS: settings.lms_max_connections,
+        Upstream.UTMN: settings.utmn_max_connections,
+    }
+    limits = httpx.Limits(
+        max_connections=max_connections[upstream],
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry,
+    )
+    client = httpx.AsyncClient(
+        http2=True,
+        base_url=base_urls[upstream],
+        limits=limits,
+        timeout=settings.http_default_timeout,
+    )
+    # Shared client serves many users at once, so Set-Cookie from one user's
+    # response must not leak into another user's request.
+    client.cookies.jar.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return client
+
+
+class HttpClients:
+    """
+    Registry of shared clients, one per upstream.
+
+    Started in lifespan and stored in app.state, integrations access it by
+    module-level `http_clients`, same as FastAPICache.
+    """
+
+    def __init__(self) -> None:
+        self.clients: dict[Upstream, httpx.AsyncClient] = {}
+
+    def start(self) -> None:
+        """Open clients for all upstreams."""
+        for upstream in Upstream:
+            self.get(upstream)
+
+    def get(self, upstream: Upstream) -> httpx.AsyncClient:
+        """Get client for upstream, creates it lazily if registry wasn't started."""
+        client = self.clients.get(upstream)
+        if client is None or client.is_closed:
+            client = create_client(upstream)
+            self.clients[upstream] = client
+        return client
+
+    async def close(self) -> None:
+        """Close all clients and their connection pools."""
+        for upstream, client in self.clients.items():
+            await client.aclose()
+            logger.debug(f"HTTP client for {upstream.value} closed")
+        self.clients.clear()
+
+
+http_clients = HttpClients()
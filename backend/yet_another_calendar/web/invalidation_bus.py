@@ -0,0 +1,106 @@
+"""Invalidation of in-process caches between workers over Redis pub/sub."""
+import asyncio
+import contextlib
+import json
+import uuid
+
+from loguru import logger
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import RedisError
+
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.l1_cache import L1Cache, l1_cache
+
+
+class InvalidationBus:
+    """
+    Publishes rewritten cache keys, every worker drops them from its L1.
+
+    Writer keeps its own L1 up to date, so own messages are skipped.
+    While subscription is down L1 is cleared and keeps entries only
+    `l1_cache_degraded_time_live` seconds. Without Redis it's a no-op.
+    """
+
+    def __init__(self, cache: L1Cache = l1_cache) -> None:
+        self.cache = cache
+        self.redis_pool: ConnectionPool | None = None
+        self.origin = uuid.uuid4().hex
+        self.connected = False
+        self._task: asyncio.Task[None] | None = None
+
+    @staticmethod
+    def get_channel() -> str:
+        return f"{settings.redis_prefix}:{settings.redis_invalidation_channel}"
+
+    async def publish(self, *keys: str, namespace: str | None = None) -> None:
+        """Tell other workers to drop keys or the whole L1 namespace."""
+        if self.redis_pool is None or not (keys or namespace):
+            return
+        message = json.dumps({"origin": self.origin, "keys": keys, "namespace": namespace})
+        try:
+            async with Redis(connection_pool=self.redis_pool) as redis:
+                await redis.publish(self.get_channel(), message)
+        except RedisError as exception:
+            logger.warning(f"Can't publish invalidation: {exception}")
+
+    def apply(self, data: bytes | str) -> None:
+        try:
+            message = json.loads(data)
+        except ValueError:
+            logger.warning(f"Got malformed invalidation: {data!r}")
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.cache.discard(*message.get("keys", ()))
+        if message.get("namespace"):
+            self.cache.clear_namespace(message["namespace"])
+
+    def set_connected(self, connected: bool) -> None:
+        """Messages may be missed around reconnect, so L1 is dropped on every change."""
+        if connected == self.connected:
+            return
+        self.connected = connected
+        self.cache.clear()
+        self.cache.set_time_live(
+            settings.l1_cache_time_live if connected else settings.l1_cache_degraded_time_live,
+        )
+        if connected:
+            logger.info("Invalidation bus subscribed")
+        else:
+            logger.warning("Invalidation bus disconnected, L1 uses short time live")
+
+    async def listen(self) -> None:
+        """Subscribe and apply messages, reconnect with exponential backoff."""
+        delay = settings.invalidation_reconnect_delay
+        while True:
+            try:
+                async with Redis(connection_pool=self.redis_pool) as redis, redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.get_channel())
+                    self.set_connected(True)
+                    delay = settings.invalidation_reconnect_delay
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.apply(message["data"])
+            except (RedisError, OSError) as exception:
+                logger.warning(f"Invalidation subscription failed: {exception}")
+            self.set_connected(False)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.invalidation_reconnect_max_delay)
+
+    def start(self, redis_pool: ConnectionPool) -> None:
+        self.redis_pool = redis_pool
+        self.cache.set_time_live(settings.l1_cache_degraded_time_live)
+        self._task = asyncio.create_task(self.listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        self.redis_pool = None
+        self.set_connected(False)
+        self.cache.set_time_live(settings.l1_cache_time_live)
+
+
+invalidation_bus = InvalidationBus()
@@ -0,0 +1,180 @@
+"""In-process L1 cache in front of the fastapi_cache backend."""
+import time
+from collections import OrderedDict
+
+from fastapi_cache.backends import Backend
+from pydantic import BaseModel
+
+from yet_another_calendar.settings import settings
+
+
+class L1Stats(BaseModel):
+    """Counters of one L1 namespace."""
+
+    hits: int
+    misses: int
+    evictions: int
+    items: int
+    size_bytes: int
+    max_bytes: int
+
+
+class L1Namespace:
+    """
+    LRU of raw cached bytes, limited by total size and entry time live.
+
+    Entry bigger than the whole namespace isn't kept at all.
+    """
+
+    def __init__(self, name: str, max_bytes: int, time_live: float) -> None:
+        self.name = name
+        self.max_bytes = max_bytes
+        self.time_live = time_live
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> tuple[int, bytes] | None:
+        """Remaining time live and value."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            self.discard(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return int(remaining), value
+
+    def set(self, key: str, value: bytes, expire: float | None = None) -> None:
+        self.discard(key)
+        size = len(key) + len(value)
+        time_live = self.time_live if expire is None else min(self.time_live, expire)
+        if size > self.max_bytes or time_live <= 0:
+            return
+        while self.size_bytes + size > self.max_bytes:
+            oldest_key, (_, oldest_value) = self._entries.popitem(last=False)
+            self.size_bytes -= len(oldest_key) + len(oldest_value)
+            self.evictions += 1
+        self._entries[key] = (time.monotonic() + time_live, value)
+        self.size_bytes += size
+
+    def discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_bytes -= len(key) + len(entry[1])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> L1Stats:
+        return L1Stats(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            items=len(self._entries),
+            size_bytes=self.size_bytes,
+            max_bytes=self.max_bytes,
+        )
+
+
+class L1Cache:
+    """Namespaces of L1, keys are matched by `{redis_prefix}:{namespace}:` prefix."""
+
+    def __init__(self, prefix: str, limits: dict[str, int], time_live: float) -> None:
+        self.prefix = prefix
+        self.namespaces = {name: L1Namespace(name, max_bytes, time_live) for name, max_bytes in limits.items()}
+
+    def get_namespace(self, key: str) -> L1Namespace | None:
+        for name, namespace in self.namespaces.items():
+            if key.startswith(f"{self.prefix}:{name}:"):
+                return namespace
+        return None
+
+    def clear_namespace(self, name: str) -> None:
+        namespace = self.namespaces.get(name)
+        if namespace is not None:
+            namespace.clear()
+
+    def set_time_live(self, time_live: float) -> None:
+        """Time live of new entries, e.g. shorter one while invalidations may be missed."""
+        for namespace in self.namespaces.values():
+            namespace.time_live = time_live
+
+    def discard(self, *keys: str) -> None:
+        for key in keys:
+            namespace = self.get_namespace(key)
+            if namespace is not None:
+                namespace.discard(key)
+
+    def clear(self) -> None:
+        for namespace in self.namespaces.values():
+            namespace.clear()
+
+    def stats(self) -> dict[str, L1Stats]:
+        return {name: namespace.stats() for name, namespace in self.namespaces.items()}
+
+
+l1_cache = L1Cache(settings.redis_prefix, settings.l1_cache_max_bytes, settings.l1_cache_time_live)
+
+
+class L1Backend(Backend):
+    """
+    Serves hot keys from process memory, everything else goes to wrapped backend.
+
+    Other workers may keep an old entry up to `l1_cache_time_live` seconds.
+    """
+
+    def __init__(self, backend: Backend, cache: L1Cache = l1_cache) -> None:
+        self.backend = backend
+        self.cache = cache
+
+    async def get_with_ttl(self, key: str) -> tuple[int, bytes | None]:
+        namespace = self.cache.get_namespace(key)
+        if namespace is None:
+            return await self.backend.get_with_ttl(key)
+        entry = namespace.get(key)
+        if entry is not None:
+            return entry
+        ttl, value = await self.backend.get_with_ttl(key)
+        if value is not None:
+            # Redis ttl is -1 for keys without expiration
+            namespace.set(key, value, ttl if ttl >= 0 else None)
+        return ttl, value
+
+    async def get(self, key: str) -> bytes | None:
+        namespace = self.cache.get_namespace(key)
+        if namespace is None:
+            return await self.backend.get(key)
+        entry = namespace.get(key)
+        if entry is not None:
+            return entry[1]
+        value = await self.backend.get(key)
+        if value is not None:
+            namespace.set(key, value)
+        return value
+
+    async def set(self, key: str, value: bytes, expire: int | None = None) -> None:
+        await self.backend.set(key, value, expire)
+        namespace = self.cache.get_namespace(key)
+        if namespace is not None:
+            namespace.set(key, value, expire)
+
+    async def clear(self, namespace: str | None = None, key: str | None = None) -> int:
+        if namespace:
+            # Namespace of fastapi_cache is prefix of its keys, e.g. `{redis_prefix}:calendar`
+            self.cache.clear_namespace(namespace.removeprefix(f"{self.cache.prefix}:").split(":", 1)[0])
+        elif key:
+            self.cache.discard(key)
+        return await self.backend.clear(namespace, key)
+
+
+def get_l1_stats() -> dict[str, L1Stats]:
+    return l1_cache.stats()
@@ -11,6 +11,14 @@ import rollbar
 from rollbar.contrib.fastapi import ReporterMiddleware as RollbarMiddleware
 
 from yet_another_calendar.settings import settings
+from yet_another_calendar.web.cache_builder import init_key_index
+from yet_another_calendar.web.circuit_breaker import init_circuit_breakers
+from yet_another_calendar.web.http_clients import http_clients
+from yet_another_calendar.web.invalidation_bus import invalidation_bus
+from yet_another_calendar.web.prefetch import prefetcher
+from yet_another_calendar.web.write_buffer import write_buffer
+from yet_another_calendar.web.l1_cache import L1Backend
+from yet_another_calendar.web.single_flight import init_single_flights
 
 
 def init_redis(app: FastAPI) -> None:  # pragma: no cover
@@ -33,6 +41,25 @@ async def shutdown_redis(app: FastAPI) -> None:  # pragma: no cover
     await app.state.redis_pool.disconnect()
 
 
+def init_http_clients(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Opens shared HTTP clients for upstreams.
+
+    :param app: current fastapi application.
+    """
+    http_clients.start()
+    app.state.http_clients = http_clients
+
+
+async def shutdown_http_clients(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Closes shared HTTP clients.
+
+    :param app: current FastAPI app.
+    """
+    await app.state.http_clients.close()
+
+
 @asynccontextmanager
 async def lifespan_setup(
         app: FastAPI,
@@ -47,16 +74,28 @@ async def lifespan_setup(
     :return: function that actually performs actions.
     """
     init_redis(app)
+    init_http_clients(app)
+    init_circuit_breakers(app.state.redis_pool)
+    init_single_flights(app.state.redis_pool)
+    init_key_index(app.state.redis_pool)
     redis = await Redis(
         host=settings.redis_host,
         port=settings.redis_port,
         encoding='utf-8',
     )
-    FastAPICache.init(RedisBackend(redis), prefix=settings.redis_prefix)
+    FastAPICache.init(L1Backend(RedisBackend(redis)), prefix=settings.redis_prefix)
+    invalidation_bus.start(app.state.redis_pool)
+    write_buffer.start(app.state.redis_pool)
+    if settings.prefetch_enabled:
+        prefetcher.start(app.state.redis_pool)
 
     try:
         yield
     finally:
+        await prefetcher.stop()
+        await write_buffer.stop()
+        await invalidation_bus.stop()
+        await shutdown_http_clients(app)
         await redis.close()
 
 
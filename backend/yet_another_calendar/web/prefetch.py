@@ -0,0 +1,148 @@
+"""Background prefetch of upcoming weeks for recently active users."""
+import asyncio
+import contextlib
+import datetime
+import time
+import zoneinfo
+from collections.abc import Awaitable, Callable
+
+from loguru import logger
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import RedisError
+
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.bulkhead import bulkheads
+from yet_another_calendar.web.http_clients import Upstream
+
+PrefetchJob = Callable[[str, datetime.date], Awaitable[None]]
+
+
+class Prefetcher:
+    """
+    Warms caches of active users for current and next weeks.
+
+    Users active this week are queued once per off-peak window,
+    a single worker process takes the sweep by Redis lock. Users are also queued
+    right after login. Each upstream gets at most one prefetch call per
+    `prefetch_upstream_interval` and only while it has less than
+    `prefetch_max_in_flight` interactive requests, so prefetch yields to users.
+    """
+
+    def __init__(self) -> None:
+        self.redis_pool: ConnectionPool | None = None
+        self.jobs: list[tuple[PrefetchJob, tuple[Upstream, ...]]] = []
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=settings.prefetch_queue_size)
+        self._queued: set[str] = set()
+        self._last_calls: dict[Upstream, float] = {}
+        self._tasks: list[asyncio.Task[None]] = []
+
+    def register(self, *upstreams: Upstream) -> Callable[[PrefetchJob], PrefetchJob]:
+        """Register job run for every queued user and week, it calls given upstreams."""
+        def decorator(job: PrefetchJob) -> PrefetchJob:
+            self.jobs.append((job, upstreams))
+            return job
+        return decorator
+
+    def schedule(self, person_id: str) -> bool:
+        """Queue user, returns False if user is already queued or queue is full."""
+        if not self._tasks or person_id in self._queued:
+            return False
+        try:
+            self._queue.put_nowait(person_id)
+        except asyncio.QueueFull:
+            logger.warning("Prefetch queue is full")
+            return False
+        self._queued.add(person_id)
+        return True
+
+    async def wait_for(self, upstream: Upstream) -> None:
+        """Pace prefetch calls to upstream and let interactive requests go first."""
+        bulkhead = bulkheads[upstream]
+        while True:
+            wait = self._last_calls.get(upstream, 0.0) + settings.prefetch_upstream_interval - time.monotonic()
+            if wait <= 0 and bulkhead.in_flight < settings.prefetch_max_in_flight and not bulkhead.queued:
+                self._last_calls[upstream] = time.monotonic()
+                return
+            await asyncio.sleep(max(wait, settings.prefetch_upstream_interval))
+
+    @staticmethod
+    def get_weeks(today: datetime.date) -> list[datetime.date]:
+        monday = today - datetime.timedelta(days=today.weekday())
+        return [monday + datetime.timedelta(weeks=week) for week in range(settings.prefetch_weeks)]
+
+    async def prefetch(self, person_id: str) -> None:
+        today = datetime.datetime.now(tz=zoneinfo.ZoneInfo(settings.prefetch_timezone)).date()
+        for week in self.get_weeks(today):
+            for job, upstreams in self.jobs:
+                for upstream in upstreams:
+                    await self.wait_for(upstream)
+                try:
+                    await job(person_id, week)
+                except Exception as exception:
+                    logger.warning(f"Prefetch of {week} for {person_id} failed: {exception!r}")
+
+    async def work(self) -> None:
+        while True:
+            person_id = await self._queue.get()
+            try:
+                await self.prefetch(person_id)
+            finally:
+                self._queued.discard(person_id)
+                self._queue.task_done()
+
+    def is_off_peak(self, now: datetime.datetime) -> bool:
+        return now.astimezone(zoneinfo.ZoneInfo(settings.prefetch_timezone)).hour in settings.prefetch_hours
+
+    @staticmethod
+    def get_active_users_key() -> str:
+        """Sorted set of users by last activity time, written with user metrix."""
+        return f"{settings.redis_prefix}:{settings.prefetch_prefix}:active"
+
+    async def get_active_users(self) -> list[str]:
+        if self.redis_pool is None:
+            return []
+        async with Redis(connection_pool=self.redis_pool) as redis:
+            users = await redis.zrangebyscore(
+                self.get_active_users_key(), time.time() - settings.redis_week_live, "+inf",
+            )
+        return [user.decode() for user in users]
+
+    async def sweep(self, now: datetime.datetime) -> int:
+        """Queue active users once per day, returns number of queued users."""
+        if self.redis_pool is None:
+            return 0
+        day = now.astimezone(zoneinfo.ZoneInfo(settings.prefetch_timezone)).date()
+        async with Redis(connection_pool=self.redis_pool) as redis:
+            taken = await redis.set(
+                f"{settings.redis_prefix}:{settings.prefetch_prefix}:{day}", 1, nx=True, ex=60 * 60 * 24,
+            )
+        if not taken:
+            return 0
+        queued = sum(self.schedule(person_id) for person_id in await self.get_active_users())
+        logger.info(f"Prefetch of {queued} active users is queued")
+        return queued
+
+    async def run_sweeps(self) -> None:
+        while True:
+            now = datetime.datetime.now(tz=datetime.UTC)
+            if self.is_off_peak(now):
+                try:
+                    await self.sweep(now)
+                except RedisError as exception:
+                    logger.warning(f"Prefetch sweep failed: {exception}")
+            await asyncio.sleep(settings.prefetch_check_interval)
+
+    def start(self, redis_pool: ConnectionPool) -> None:
+        self.redis_pool = redis_pool
+        self._tasks = [asyncio.create_task(self.work()), asyncio.create_task(self.run_sweeps())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        self.redis_pool = None
+
+
+prefetcher = Prefetcher()
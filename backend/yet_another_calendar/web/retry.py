@@ -0,0 +1,148 @@
+"""Retry policies for upstream requests."""
+import asyncio
+import functools
+import random
+import time
+from collections.abc import Awaitable, Callable, Coroutine
+from typing import Any, ParamSpec, Self, TypeVar
+
+import httpx
+from loguru import logger
+
+from yet_another_calendar.settings import settings
+from yet_another_calendar.web.http_clients import Upstream
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# Request surely didn't reach upstream, so it's safe to repeat any method
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def is_idempotent(method: str) -> bool:
+    return method.upper() in IDEMPOTENT_METHODS
+
+
+class RetryBudget:
+    """
+    Token bucket which caps retries to a share of normal traffic.
+
+    Every call deposits `ratio` tokens, every retry spends one token,
+    so during an outage upstream gets at most `1 + ratio` times usual load.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float) -> None:
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+
+    Gives up after `tries` attempts or when next sleep would exceed
+    `max_elapsed` seconds since first attempt, whichever comes first.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            tries: int = settings.retry_tries,
+            base_delay: float = settings.retry_base_delay,
+            max_delay: float = settings.retry_delay,
+            max_elapsed: float = settings.retry_max_elapsed,
+            exceptions: tuple[type[Exception], ...] = (httpx.TransportError,),
+            budget: RetryBudget | None = None,
+    ) -> None:
+        self.name = name
+        self.tries = tries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        self.exceptions = exceptions
+        self.budget = budget
+
+    def options(self, **changes: Any) -> Self:
+        """Copy of policy for a single call site, budget stays shared."""
+        params = {
+            "name": self.name,
+            "tries": self.tries,
+            "base_delay": self.base_delay,
+            "max_delay": self.max_delay,
+            "max_elapsed": self.max_elapsed,
+            "exceptions": self.exceptions,
+            "budget": self.budget,
+        }
+        return type(self)(**{**params, **changes})
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _can_retry(
+            self, exception: Exception, attempt: int, delay: float, started_at: float, idempotent: bool,
+    ) -> bool:
+        if attempt >= self.tries:
+            return False
+        if not idempotent and not isinstance(exception, NOT_SENT_ERRORS):
+            return False
+        if time.monotonic() - started_at + delay > self.max_elapsed:
+            return False
+        if self.budget and not self.budget.withdraw():
+            logger.warning(f"{self.name} retry budget is exhausted")
+            return False
+        return True
+
+    async def run(self, func: Callable[[], Awaitable[T]], idempotent: bool = False) -> T:
+        """
+        Call func, retrying transient errors.
+
+        Call which may have reached upstream is repeated only if it's `idempotent`.
+        """
+        if self.budget:
+            self.budget.deposit()
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await func()
+            except self.exceptions as exception:
+                delay = self.backoff(attempt)
+                if not self._can_retry(exception, attempt, delay, started_at, idempotent):
+                    raise
+                logger.warning(f"{self.name}: {exception!r}, retrying in {delay:.2f} seconds...")
+                await asyncio.sleep(delay)
+
+    def retry(
+            self, idempotent: bool = False,
+    ) -> Callable[[Callable[P, Coroutine[Any, Any, T]]], Callable[P, Coroutine[Any, Any, T]]]:
+        """Decorator version of `run`."""
+        def decorator(func: Callable[P, Coroutine[Any, Any, T]]) -> Callable[P, Coroutine[Any, Any, T]]:
+            @functools.wraps(func)
+            async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+                return await self.run(functools.partial(func, *args, **kwargs), idempotent=idempotent)
+            return wrapper
+        return decorator
+
+
+def _policy(name: str) -> RetryPolicy:
+    return RetryPolicy(name, budget=RetryBudget(settings.retry_budget_ratio, settings.retry_budget_max_tokens))
+
+
+retry_policies = {
+    Upstream.MODEUS: _policy("Modeus"),
+    Upstream.NETOLOGY: _policy("Netology"),
+    Upstream.LMS: _policy("LMS"),
+    Upstream.UTMN: _policy("UTMN"),
+}
@@ -0,0 +1,123 @@
+"""Coalescing of identical in-flight upstream calls."""
+import asyncio
+import functools
+import hashlib
+import inspect
+from collections.abc import Awaitable, Callable, Coroutine
+from typing import Any, ParamSpec, TypeVar
+
+from loguru import logger
+from pydantic import BaseModel, TypeAdapter
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import RedisError
+
+from yet_another_calendar.settings import settings
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+def _normalize(value: Any) -> str:
+    if isinstance(value, BaseModel):
+        return value.model_dump_json(by_alias=True)
+    return repr(value)
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time, concurrent callers await its result.
+
+    With `result_type` and Redis configured, calls are coalesced between
+    workers too: one worker takes a Redis lock and publishes result for
+    `single_flight_result_ttl` seconds, others poll for it.
+    """
+
+    def __init__(self, namespace: str, result_type: Any = None) -> None:
+        self.namespace = namespace
+        self.adapter: TypeAdapter[Any] | None = TypeAdapter(result_type) if result_type is not None else None
+        self.redis_pool: ConnectionPool | None = None
+        self._flights: dict[str, asyncio.Task[Any]] = {}
+
+    def make_key(self, signature: inspect.Signature, *args: Any, **kwargs: Any) -> str:
+        """Hash of call arguments, pydantic models are compared by field values."""
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        normalized = ",".join(f"{name}={_normalize(value)}" for name, value in bound.arguments.items())
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Run func or join already running call with the same key."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.create_task(self._call(key, func))
+            self._flights[key] = flight
+            flight.add_done_callback(functools.partial(self._land, key))
+        else:
+            logger.debug(f"Joined in-flight {self.namespace} call")
+        return await asyncio.shield(flight)
+
+    def _land(self, key: str, flight: asyncio.Task[Any]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            # Mark exception as retrieved, callers could have gone already
+            flight.exception()
+
+    async def _call(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        if self.redis_pool is None or self.adapter is None:
+            return await func()
+        try:
+            return await self._call_distributed(key, func)
+        except RedisError as exception:
+            logger.warning(f"Single flight {self.namespace} can't use redis: {exception}")
+            return await func()
+
+    async def _call_distributed(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        assert self.adapter is not None
+        lock_key = f"{settings.single_flight_prefix}:{self.namespace}:{key}:lock"
+        result_key = f"{settings.single_flight_prefix}:{self.namespace}:{key}:result"
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.single_flight_lock_timeout
+        async with Redis(connection_pool=self.redis_pool) as redis:
+            while loop.time() < deadline:
+                result = await redis.get(result_key)
+                if result is not None:
+                    return self.adapter.validate_json(result)
+                if await redis.set(lock_key, 1, nx=True, ex=settings.single_flight_lock_timeout):
+                    try:
+                        value = await func()
+                        await redis.set(
+                            result_key, self.adapter.dump_json(value), ex=settings.single_flight_result_ttl,
+                        )
+                        return value
+                    finally:
+                        await redis.delete(lock_key)
+                await asyncio.sleep(settings.single_flight_poll_interval)
+        logger.warning(f"Single flight {self.namespace} waited too long for other worker")
+        return await func()
+
+    def __call__(self, func: Callable[P, Coroutine[Any, Any, T]]) -> Callable[P, Coroutine[Any, Any, T]]:
+        """Decorator, key is built from all call arguments."""
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            key = self.make_key(signature, *args, **kwargs)
+            return await self.do(key, functools.partial(func, *args, **kwargs))
+        return wrapper
+
+
+single_flights: list[SingleFlight] = []
+
+
+def single_flight(namespace: str, result_type: Any = None) -> SingleFlight:
+    """Create single flight, result_type enables coalescing between workers."""
+    flight = SingleFlight(namespace, result_type)
+    single_flights.append(flight)
+    return flight
+
+
+def init_single_flights(redis_pool: ConnectionPool | None) -> None:
+    """Coalesce calls between workers through Redis, None keeps it in-process."""
+    for flight in single_flights:
+        flight.redis_pool = redis_pool
@@ -0,0 +1,91 @@
+"""Buffered fire-and-forget Redis writes, flushed as one pipeline."""
+import asyncio
+import contextlib
+
+from loguru import logger
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import RedisError
+
+from yet_another_calendar.settings import settings
+
+RedisCommand = tuple[str | bytes | int | float, ...]
+
+
+class WriteBuffer:
+    """
+    Collects writes nobody waits for, so requests don't make Redis round trips for them.
+
+    Commands are flushed as one pipeline every `write_buffer_flush_interval` seconds,
+    as soon as `write_buffer_flush_size` commands are collected and on shutdown.
+    Writes are only marks and counters, so they are dropped without Redis,
+    when buffer holds `write_buffer_max_size` commands or when flush fails.
+    """
+
+    def __init__(self) -> None:
+        self.redis_pool: ConnectionPool | None = None
+        self.dropped = 0
+        self._commands: list[RedisCommand] = []
+        self._full: asyncio.Event | None = None
+        self._running = False
+        self._task: asyncio.Task[None] | None = None
+
+    def add(self, *commands: RedisCommand) -> None:
+        if self.redis_pool is None:
+            return
+        if len(self._commands) + len(commands) > settings.write_buffer_max_size:
+            self.dropped += len(commands)
+            return
+        self._commands.extend(commands)
+        if self._full is not None and len(self._commands) >= settings.write_buffer_flush_size:
+            self._full.set()
+
+    async def flush(self) -> int:
+        """Send buffered commands, returns number of sent ones."""
+        commands, self._commands = self._commands, []
+        if self._full is not None:
+            self._full.clear()
+        if not commands or self.redis_pool is None:
+            return 0
+        try:
+            async with Redis(connection_pool=self.redis_pool) as redis:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for command in commands:
+                        pipe.execute_command(*command)
+                    results = await pipe.execute(raise_on_error=False)
+        except (RedisError, OSError) as exception:
+            self.dropped += len(commands)
+            logger.warning(f"Can't flush {len(commands)} buffered writes: {exception}")
+            return 0
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"Buffered write failed: {result}")
+        return len(commands)
+
+    async def run(self) -> None:
+        """Flush until stopped, the last flush runs after stop, so started one isn't cancelled."""
+        assert self._full is not None, "Write buffer isn't started"
+        while self._running:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._full.wait(), settings.write_buffer_flush_interval)
+            await self.flush()
+
+    def start(self, redis_pool: ConnectionPool) -> None:
+        self.redis_pool = redis_pool
+        self._running = True
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop flushing by interval and flush what is left."""
+        self._running = False
+        if self._full is not None:
+            self._full.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+        self._full = None
+        self.redis_pool = None
+
+
+write_buffer = WriteBuffer()